@@ -1,6 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, status
 from pydantic import BaseModel
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
@@ -10,12 +9,26 @@ SECRET_KEY = "egypt-market-secret-key-mvp" # In prod, use env var
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Mock Database
-import json
+import hmac
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from passwords import hash_password, ahash_password, averify_password
+from user_store import open_user_store
+
+# Failed logins allowed per username and per client IP within the window
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", 5))
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", 300))
+# Most keys the throttle tracks at once; the least recently failing are dropped first
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", 100000))
+# Shared secret for the /api/admin endpoints (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+logger = logging.getLogger(__name__)
 
 auth_router = APIRouter()
-pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
 
 # Persistence
 # Models
@@ -35,24 +48,12 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-# Persistence
-USERS_FILE = os.path.join(os.path.dirname(__file__), "users.json")
-
-def load_users():
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, "r") as f:
-            data = json.load(f)
-            # Reconstruct User objects
-            return {u: User(**d) for u, d in data.items()}
-    return {}
+# Persistence (SQLite by default, USER_STORE=json for the legacy file)
+USER_STORE = open_user_store()
 
-def save_users():
-    # Save as dicts
-    data = {u: d.dict() for u, d in USERS_DB.items()}
-    with open(USERS_FILE, "w") as f:
-        json.dump(data, f)
-
-USERS_DB = load_users()
+def get_user(username):
+    data = USER_STORE.get(username)
+    return User(**data) if data else None
 
 class UserCreate(BaseModel):
     username: str
@@ -66,11 +67,64 @@ class Token(BaseModel):
     token_type: str
 
 # Helpers
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password(password)
+
+class LoginThrottle:
+    """
+    Sliding-window count of failed logins per key ("user:<name>", "ip:<addr>").
+    A blocked key is rejected before any password hashing happens. Keys are kept in
+    order of their last failure, so expired ones are dropped from the front and the
+    table never grows past max_keys however many usernames / IPs are tried.
+    """
+    def __init__(self, max_failures=LOGIN_MAX_FAILURES, window=LOGIN_FAILURE_WINDOW_SECONDS,
+                 max_keys=LOGIN_THROTTLE_MAX_KEYS, clock=time.monotonic):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_keys = max_keys
+        self.clock = clock
+        self.failures = OrderedDict()  # key -> deque of failure timestamps, least recently failed first
+        self.lock = threading.Lock()
+
+    def _recent(self, key, now):
+        times = self.failures.get(key)
+        while times and now - times[0] > self.window:
+            times.popleft()
+        if times is not None and not times:
+            del self.failures[key]
+            return None
+        return times
+
+    def retry_after(self, *keys):
+        """Seconds until every key may try again; 0 if none is blocked."""
+        now = self.clock()
+        wait = 0
+        with self.lock:
+            for key in keys:
+                times = self._recent(key, now)
+                if times and len(times) >= self.max_failures:
+                    wait = max(wait, self.window - (now - times[0]))
+        return wait
+
+    def fail(self, *keys):
+        now = self.clock()
+        with self.lock:
+            for key in keys:
+                self._recent(key, now)
+                self.failures.setdefault(key, deque()).append(now)
+                self.failures.move_to_end(key)
+            # The front key failed longest ago: once its last failure expires, so have all of its
+            while self.failures:
+                times = next(iter(self.failures.values()))
+                if now - times[-1] <= self.window and len(self.failures) <= self.max_keys:
+                    break
+                self.failures.popitem(last=False)
+
+    def reset(self, key):
+        with self.lock:
+            self.failures.pop(key, None)
+
+login_throttle = LoginThrottle()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -108,23 +162,28 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    # In a real DB, we'd fetch the user object. Here we check the dict.
-    user = USERS_DB.get(username)
+    user = get_user(username)
     if user is None:
         raise credentials_exception
     return user
 
+def get_admin_user(current_user: User = Depends(get_current_user), x_admin_token: Optional[str] = Header(None)):
+    """A signed-in user who also presents the admin token."""
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 # Endpoints
 @auth_router.post("/signup", response_model=Token)
 async def signup(user: UserCreate):
-    if user.username in USERS_DB:
+    if USER_STORE.get(user.username):
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
-    # Store as User object
+    hashed_password = await ahash_password(user.password)
     new_user = User(username=user.username, password_hash=hashed_password)
-    USERS_DB[user.username] = new_user
-    save_users()
+    # The insert itself rejects a username taken by a concurrent signup
+    if not USER_STORE.create(new_user.dict()):
+        raise HTTPException(status_code=400, detail="Username already registered")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -133,18 +192,25 @@ async def signup(user: UserCreate):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @auth_router.post("/login", response_model=Token)
-async def login(form_data: UserCreate):
-    print(f"Login attempt for: {form_data.username} with password: {form_data.password}")
-    user = USERS_DB.get(form_data.username)
-    if user:
-        print(f"User found: {user.username}, Hash: {user.password_hash}")
-        chk = verify_password(form_data.password, user.password_hash)
-        print(f"Password check result: {chk}")
-    else:
-        print("User not found in USERS_DB")
-    
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login(form_data: UserCreate, request: Request):
+    keys = (f"user:{form_data.username}", f"ip:{request.client.host if request.client else 'unknown'}")
+    retry_after = login_throttle.retry_after(*keys)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed login attempts. Try again later.",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
+    user = get_user(form_data.username)
+    # One verification per attempt, in the hashing pool rather than on the event loop
+    valid = user is not None and await averify_password(form_data.password, user.password_hash)
+    logger.info("Login attempt for %s: %s", form_data.username, "ok" if valid else "failed")
+
+    if not valid:
+        login_throttle.fail(*keys)
         raise HTTPException(status_code=400, detail="Incorrect username or password")
+    login_throttle.reset(keys[0])
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -155,6 +221,5 @@ async def login(form_data: UserCreate):
 @auth_router.post("/profile")
 async def update_profile(profile: ProfileUpdate, current_user: User = Depends(get_current_user)):
     current_user.industry = profile.industry
-    USERS_DB[current_user.username] = current_user
-    save_users()
+    USER_STORE.upsert(current_user.dict())
     return {"message": "Profile updated", "industry": current_user.industry}
@@ -0,0 +1,236 @@
+"""
+Microbenchmarks for the data engines on synthetic data at 1x/10x/100x/1000x the
+bundled complex CSV. Network (Google Sheets, World Bank) is stubbed; no model calls
+are made. Results are written as JSON so runs can be compared between commits:
+
+    python bench_engines.py                         # all scales
+    python bench_engines.py --scales 1 10 --output before.json
+    python bench_engines.py --scales 1 10 --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import engine_macro
+import engine_micro
+import snapshot
+from cube import MetricCube
+from scenario import ScenarioEngine
+from engine_micro import DATA_PATH, MicroData, MicroEngine
+
+SCALES = [1, 10, 100, 1000]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "cache", "bench")
+
+# Wall-clock budget per benchmark; repeats stop early once it is spent
+TIME_BUDGET_SECONDS = 2.0
+MAX_REPEATS = 200
+
+FILTERS = {
+    "districts": ["Maadi", "Zamalek", "Dokki #2", "Smouha #5"],
+    "min_rent": 2000,
+    "max_rent": 3200,
+    "min_traffic": 1500,
+}
+SEARCH_QUERIES = ["rent in Maadi", "cheap rent high traffic", "Zamalek competitors", "foot traffic Dokki"]
+CUBE_QUERIES = [
+    (["Governorate", "Year"], {"Industry": "Agriculture"}),
+    (["Sector", "Quarter"], {"Year": 2024, "Governorate": "Cairo"}),
+    (["Indicator", "Year", "Quarter"], {"District": "Maadi"}),
+]
+# 25 x 20 x 20 = 10k scenarios, and a Monte Carlo run of the same size
+SCENARIO_GRID = {
+    "inflation": list(np.linspace(-5, 20, 25)),
+    "lending_rate": list(np.linspace(-5, 5, 20)),
+    "exchange_rate": list(np.linspace(0, 50, 20)),
+}
+SCENARIO_DISTRIBUTIONS = {"inflation": {"mean": 5, "std": 3}, "exchange_rate": {"low": 0, "high": 30}}
+SCENARIO_MACRO = {"inflation": {"latest_value": 33.9}, "lending_rate": {"latest_value": 27.4}}
+
+class OfflineSheetsClient:
+    """Stands in for GoogleSheetsClient: no credentials lookup, no network."""
+    client = None
+
+    def get_data(self, sheet_id_or_url):
+        return None
+
+class StubResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+class StubSession:
+    """World Bank API stand-in returning `points` yearly values per indicator."""
+    def __init__(self, points):
+        self.points = points
+
+    def get(self, url, headers=None, timeout=None):
+        entries = [{"date": str(2024 - i), "value": 10.0 + i % 7} for i in range(self.points)]
+        return StubResponse([{"page": 1}, entries])
+
+def make_source(path, scale):
+    """Writes the bundled CSV replicated `scale` times, with a new district name per copy."""
+    base = pd.read_csv(DATA_PATH)
+    copies = []
+    for k in range(scale):
+        copy = base.copy()
+        if k:
+            copy["District"] = copy["District"] + f" #{k}"
+        copies.append(copy)
+    df = pd.concat(copies, ignore_index=True)
+    df.to_csv(path, index=False)
+    return len(df)
+
+def measure(fn, setup=None, max_repeats=MAX_REPEATS):
+    """
+    Runs fn until max_repeats or the time budget; returns timing stats in ms.
+    With setup, fn receives setup()'s result and setup time is not counted.
+    """
+    times = []
+    deadline = time.perf_counter() + TIME_BUDGET_SECONDS
+    while len(times) < max_repeats and (not times or time.perf_counter() < deadline):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "repeats": len(times),
+        "mean_ms": round(statistics.fmean(times), 4),
+        "median_ms": round(statistics.median(times), 4),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 4),
+        "min_ms": round(times[0], 4),
+    }
+
+def bench_scale(scale, workdir):
+    source = os.path.join(workdir, f"bench_{scale}x_complex_data.csv")
+    source_rows = make_source(source, scale)
+    engine_micro.DATA_PATH = source
+    snapshot.SNAPSHOT_DIR = os.path.join(workdir, f"snapshots_{scale}x")
+
+    results = {"source_rows": source_rows}
+    engine = MicroEngine()
+    results["pivot_rows"] = len(engine.df)
+
+    def drop_snapshots():
+        shutil.rmtree(snapshot.SNAPSHOT_DIR, ignore_errors=True)
+
+    # Cold: CSV parse + pivot + TF-IDF / cube build + snapshot write; warm: snapshot (mmap) attach
+    results["load_complex_data_csv"] = measure(
+        lambda _: engine._load_complex_data(source, MicroData()), setup=drop_snapshots, max_repeats=5)
+    results["load_complex_data_snapshot"] = measure(lambda: engine._load_complex_data(source, MicroData()))
+
+    def fresh_state():
+        data = MicroData()
+        data.df = engine.df.copy()
+        return data
+
+    results["init_vector_search"] = measure(engine.init_vector_search, setup=fresh_state, max_repeats=50)
+    results["filter_data"] = measure(lambda: engine.filter_data(FILTERS))
+    results["filter_data_all_rows"] = measure(lambda: engine.filter_data({}))
+    results["search"] = measure(lambda: [engine.search(q) for q in SEARCH_QUERIES])
+    results["search_many"] = measure(lambda: engine.search_many(SEARCH_QUERIES))
+    results["keyword_search"] = measure(lambda: [engine._keyword_search(q) for q in SEARCH_QUERIES])
+    results["cube_build"] = measure(lambda: MetricCube(engine.raw_df), max_repeats=5)
+    results["cube_query"] = measure(lambda: [engine.query_cube(g, f) for g, f in CUBE_QUERIES])
+
+    scenarios = ScenarioEngine(engine.df, SCENARIO_MACRO)
+    results["scenario_run"] = measure(lambda: scenarios.run({"inflation": 5, "lending_rate": 2}))
+    results["scenario_grid_10k"] = measure(lambda: scenarios.grid(SCENARIO_GRID), max_repeats=20)
+    results["scenario_monte_carlo_10k"] = measure(
+        lambda: scenarios.monte_carlo(SCENARIO_DISTRIBUTIONS, samples=10_000, seed=0), max_repeats=20)
+
+    macro = engine_macro.MacroEngine(cache_path=":memory:")
+    macro.session = StubSession(points=5 * scale)
+
+    def expire_macro():
+        while macro._inflight is not None:  # let the previous refresh finish clearing itself
+            time.sleep(0.001)
+        macro.last_fetch = None
+        macro.fetched_at = {}
+
+    results["get_sector_data_cold"] = measure(lambda _: macro.get_sector_data(), setup=expire_macro, max_repeats=50)
+    results["get_sector_data_warm"] = measure(macro.get_sector_data)
+    macro.executor.shutdown()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(current, baseline):
+    """Prints median-time ratios (current / baseline) for benchmarks present in both runs."""
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('timestamp')}): ratio of median times, >1 is slower")
+    for scale, benches in current["results"].items():
+        old = baseline.get("results", {}).get(scale, {})
+        for name, stats in benches.items():
+            if isinstance(stats, dict) and isinstance(old.get(name), dict) and old[name]["median_ms"]:
+                ratio = stats["median_ms"] / old[name]["median_ms"]
+                # Ignore sub-10us differences: timer noise, not regressions
+                slower = stats["median_ms"] - old[name]["median_ms"] > 0.01
+                flag = "  <-- regression" if ratio > 1.2 and slower else ""
+                print(f"{scale:>6} {name:<28} {ratio:>6.2f}x{flag}")
+
+def run(scales, output=None, baseline_path=None):
+    engine_micro.GoogleSheetsClient = OfflineSheetsClient
+    os.environ.pop("GOOGLE_SHEET_ID", None)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench-engines-") as workdir:
+        for scale in scales:
+            # Engine diagnostics go to stdout; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = bench_scale(scale, workdir)
+            report["results"][f"{scale}x"] = results
+            print(f"\n{scale}x: {results['source_rows']} source rows, {results['pivot_rows']} districts")
+            for name, stats in results.items():
+                if isinstance(stats, dict):
+                    print(f"  {name:<28} median {stats['median_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms  (n={stats['repeats']})")
+
+    output = output or os.path.join(RESULTS_DIR, f"engines_{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            compare(report, json.load(f))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    parser.add_argument("--output", help="JSON results path (default: cache/bench/engines_<commit>.json)")
+    parser.add_argument("--compare", dest="baseline", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+    run(args.scales, args.output, args.baseline)
@@ -0,0 +1,78 @@
+import time
+import numpy as np
+import pandas as pd
+from engine_micro import FilterIndex
+
+# Row count of the bundled wide pivot, scaled 1x -> 100x
+BASE_ROWS = 17
+SCALES = [1, 10, 100]
+REPEATS = 200
+
+def make_frame(n_rows, seed=0):
+    """Synthetic wide-format frame with the columns filter_data works on."""
+    rng = np.random.default_rng(seed)
+    traffic = rng.uniform(500, 4000, n_rows)
+    return pd.DataFrame({
+        "District": [f"District {i}" for i in range(n_rows)],
+        "Avg_Rent_Sqm_EGP": rng.uniform(1500, 3500, n_rows),
+        "Foot_Traffic_Score": traffic,
+        "Competitor_Density": np.select(
+            [traffic > 3000, traffic > 2000, traffic > 1000],
+            ["Very High", "High", "Medium"],
+            "Low",
+        ),
+        "Source_ID": [f"FS_LOC_{i+1:03d}" for i in range(n_rows)],
+    })
+
+def legacy_filter(df, filters):
+    """The pre-index filter_data body: copy, mask, convert."""
+    filtered_df = df.copy()
+    if filters.get('districts'):
+        filtered_df = filtered_df[filtered_df['District'].isin(filters['districts'])]
+    if filters.get('min_rent') is not None:
+        filtered_df = filtered_df[filtered_df['Avg_Rent_Sqm_EGP'] >= filters['min_rent']]
+    if filters.get('max_rent') is not None:
+        filtered_df = filtered_df[filtered_df['Avg_Rent_Sqm_EGP'] <= filters['max_rent']]
+    if filters.get('min_traffic') is not None:
+        filtered_df = filtered_df[filtered_df['Foot_Traffic_Score'] >= filters['min_traffic']]
+    if filters.get('max_traffic') is not None:
+        filtered_df = filtered_df[filtered_df['Foot_Traffic_Score'] <= filters['max_traffic']]
+    if filters.get('competitor_density'):
+        filtered_df = filtered_df[filtered_df['Competitor_Density'].isin(filters['competitor_density'])]
+    filtered_df = filtered_df.astype(object).where(pd.notnull(filtered_df), None)
+    return filtered_df.to_dict('records')
+
+def timed(fn, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def run():
+    print(f"{'rows':>8} {'build ms':>10} {'index ms':>10} {'scan ms':>10} {'matches':>8}")
+    for scale in SCALES:
+        n_rows = BASE_ROWS * scale
+        df = make_frame(n_rows)
+
+        start = time.perf_counter()
+        index = FilterIndex(df)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # A typical dashboard selection: a handful of districts plus slider ranges
+        filters = {
+            "districts": ["District 1", "District 5", "District 9", "District 13"],
+            "min_rent": 1800,
+            "max_rent": 3200,
+            "min_traffic": 800,
+            "competitor_density": ["Low", "Medium", "High", "Very High"],
+        }
+
+        matches = index.rows(index.query(filters))
+        assert matches == legacy_filter(df, filters), "Index and scan results differ"
+
+        index_ms = timed(lambda: index.rows(index.query(filters)))
+        scan_ms = timed(lambda: legacy_filter(df, filters), repeats=max(5, REPEATS // scale))
+        print(f"{n_rows:>8} {build_ms:>10.2f} {index_ms:>10.4f} {scan_ms:>10.4f} {len(matches):>8}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# Storage type per column of the long-format micro data. Dimensions are dictionary-encoded
+# (category: small int codes + one copy of each label); Value stays float64 because the
+# cube sums it and the pivot averages it.
+RAW_SCHEMA = {
+    "Industry": "category",
+    "Sector": "category",
+    "Sub_Sector": "category",
+    "Indicator": "category",
+    "Governorate": "category",
+    "District": "category",
+    "Date": "category",
+    "Year": "int16",
+    "Quarter": "category",
+    "Value": "float64",
+    "Unit": "category",
+    "Confidence_Score": "category",
+    "Source_Verified": "bool",
+    "YoY_Change": "float32",
+    "Source_ID": "category",
+}
+
+# Columns not in the schema become categorical when at most this share of rows is distinct
+CATEGORY_MAX_DISTINCT_RATIO = 0.5
+
+def _convert(series, kind):
+    if kind == "category":
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+    if kind == "bool":
+        if series.dtype == bool:
+            return series
+        mapped = series.map({True: True, False: False, "True": True, "False": False, "true": True, "false": False})
+        return mapped.astype(bool) if mapped.notna().all() else series
+    if series.isna().any() and kind.startswith("int"):
+        return series  # NaN needs a float (or nullable) column; keep as loaded
+    return series.astype(kind)
+
+def _infer(series):
+    """Storage type for a column outside the schema, or None to keep it as is."""
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return None
+    if pd.api.types.is_integer_dtype(series):
+        return str(pd.to_numeric(series, downcast="integer").dtype)
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        if len(series) and series.nunique(dropna=True) <= CATEGORY_MAX_DISTINCT_RATIO * len(series):
+            return "category"
+    return None
+
+def compact_frame(df, schema=RAW_SCHEMA):
+    """
+    Returns df with every column in its compact storage type: schema columns as listed,
+    other low-cardinality strings as categoricals and integers downcast. Values are
+    unchanged except for the float32 columns in the schema. A column that cannot take
+    its type (e.g. mixed values from a sheet) is kept as loaded. Columns already in
+    their type are not copied, so a memory-mapped frame stays mapped.
+    """
+    columns = {}
+    for col in df.columns:
+        kind = schema.get(col) or _infer(df[col])
+        try:
+            columns[col] = _convert(df[col], kind) if kind else df[col]
+        except (TypeError, ValueError):
+            columns[col] = df[col]
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+def frame_bytes(df):
+    """Deep memory use of a DataFrame (strings and category labels included)."""
+    if df is None:
+        return 0
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def sparse_bytes(matrix):
+    if matrix is None:
+        return 0
+    return int(sum(getattr(matrix, part).nbytes for part in ("data", "indices", "indptr") if hasattr(matrix, part)))
+
+def array_bytes(arrays):
+    return int(sum(a.nbytes for a in arrays if isinstance(a, np.ndarray)))
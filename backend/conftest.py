@@ -0,0 +1,12 @@
+import pytest
+
+import main
+from auth import User, get_current_user
+
+@pytest.fixture
+def signed_in():
+    """Requests to main.app are made as a Retail user for the duration of the test."""
+    user = User(username="t", password_hash="x", industry="Retail")
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    yield user
+    main.app.dependency_overrides.clear()
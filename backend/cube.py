@@ -0,0 +1,263 @@
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Dimension hierarchies of the long-format micro data, coarsest level first
+HIERARCHIES = {
+    "geography": ["Governorate", "District"],
+    "product": ["Industry", "Sector", "Sub_Sector", "Indicator"],
+    "time": ["Year", "Quarter"],
+}
+LEVEL_OF = {col: (name, depth + 1) for name, cols in HIERARCHIES.items() for depth, col in enumerate(cols)}
+
+MEASURE_COLUMN = "Value"
+MEASURES = ["sum", "mean", "count", "min", "max"]
+
+# Rollups larger than this are not kept; queries on them re-aggregate a finer stored cuboid.
+# The base (finest) cuboid is always kept.
+CUBE_MAX_CELLS = int(os.getenv("CUBE_MAX_CELLS", 2_000_000))
+
+# Most cells one query returns
+CUBE_MAX_RESULT_CELLS = int(os.getenv("CUBE_MAX_RESULT_CELLS", 10_000))
+
+def _code_dtype(n):
+    return np.int8 if n < 127 else np.int16 if n < 32767 else np.int32
+
+def _group_key(codes):
+    """
+    One int64 key per row over several code columns, ordered like the columns
+    (first column most significant). Re-densified whenever the mixed radix would overflow.
+    """
+    n = len(codes[0]) if codes else 0
+    key = np.zeros(n, dtype=np.int64)
+    span = 1
+    for col_codes in codes:
+        card = int(col_codes.max()) + 2 if len(col_codes) else 1  # +1 shifts the -1 (missing) code to 0
+        if span * card >= 2 ** 62:
+            uniques, key = np.unique(key, return_inverse=True)
+            span = len(uniques)
+        key = key * card + (col_codes.astype(np.int64) + 1)
+        span *= card
+    return key
+
+class Cuboid:
+    """One rollup: dimension codes plus sum / count / min / max of the measure per cell, sorted by the codes."""
+    def __init__(self, levels, codes, stats):
+        self.levels = levels  # depth per hierarchy, e.g. (1, 0, 2) = Governorate x Year x Quarter
+        self.columns = [c for (name, cols), depth in zip(HIERARCHIES.items(), levels) for c in cols[:depth]]
+        self.codes = codes    # column -> code array
+        self.stats = stats    # "sum" / "count" / "min" / "max" -> array
+
+    def __len__(self):
+        return len(self.stats["count"])
+
+    def nbytes(self):
+        return sum(a.nbytes for a in self.codes.values()) + sum(a.nbytes for a in self.stats.values())
+
+    def covers(self, levels):
+        return all(mine >= wanted for mine, wanted in zip(self.levels, levels))
+
+def rollup(codes, stats, columns):
+    """Aggregates cells (or source rows) up to `columns`; the result is sorted by them in that order."""
+    n = len(stats["count"])
+    if not columns:
+        if n == 0:
+            return {}, {"sum": np.zeros(1), "count": np.zeros(1, dtype=np.int32),
+                        "min": np.full(1, np.nan), "max": np.full(1, np.nan)}
+        starts, order = np.zeros(1, dtype=np.intp), np.arange(n)
+    else:
+        key = _group_key([codes[c] for c in columns])
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]]) if n else np.zeros(0, dtype=np.intp)
+    if n == 0:
+        return ({c: codes[c][:0] for c in columns},
+                {k: v[:0] for k, v in stats.items()})
+    first = order[starts]
+    return (
+        {c: codes[c][first] for c in columns},
+        {
+            "sum": np.add.reduceat(stats["sum"][order], starts),
+            "count": np.add.reduceat(stats["count"][order], starts).astype(np.int32),
+            # fmin / fmax skip NaN, so an all-missing cell stays NaN
+            "min": np.fmin.reduceat(stats["min"][order], starts),
+            "max": np.fmax.reduceat(stats["max"][order], starts),
+        },
+    )
+
+class MetricCube:
+    """
+    Pre-aggregated rollups of the long-format micro data over every combination of
+    hierarchy levels (Governorate/District x Industry/Sector/Sub_Sector/Indicator x
+    Year/Quarter). Each rollup is computed from its smallest finer one, so the source
+    rows are only grouped once. A query is answered from the smallest stored cuboid
+    that contains its columns: slicing stored cells, re-aggregating only when the
+    cuboid is finer than the requested grouping.
+    """
+    def __init__(self, raw_df, max_cells=CUBE_MAX_CELLS):
+        start = time.perf_counter()
+        self.source_rows = len(raw_df)
+        self.labels = {}   # column -> array of labels, indexed by code
+        self.code_of = {}  # column -> {str(label): code}
+
+        dims = [c for cols in HIERARCHIES.values() for c in cols]
+        missing = [c for c in dims + [MEASURE_COLUMN] if c not in raw_df.columns]
+        if missing:
+            raise ValueError(f"Cube needs columns {missing}")
+
+        codes = {}
+        for col in dims:
+            col_codes, uniques = pd.factorize(raw_df[col], sort=True)
+            codes[col] = col_codes.astype(_code_dtype(len(uniques)))
+            self.labels[col] = np.asarray(uniques, dtype=object)
+            self.code_of[col] = {str(label): code for code, label in enumerate(uniques)}
+        values = pd.to_numeric(raw_df[MEASURE_COLUMN], errors="coerce").to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        stats = {"sum": np.where(present, values, 0.0), "count": present.astype(np.int32), "min": values, "max": values}
+
+        full = tuple(len(cols) for cols in HIERARCHIES.values())
+        built = {full: Cuboid(full, *rollup(codes, stats, dims))}
+
+        # Finest first, so every rollup has all its finer candidates already built
+        lattice = sorted(itertools.product(*(range(n + 1) for n in full)), key=lambda levels: -sum(levels))
+        for levels in lattice:
+            if levels in built:
+                continue
+            parent = min((c for c in built.values() if c.covers(levels)), key=len)
+            cuboid = Cuboid(levels, {}, {})
+            cuboid.codes, cuboid.stats = rollup(parent.codes, parent.stats, cuboid.columns)
+            built[levels] = cuboid
+        self.cuboids = {levels: c for levels, c in built.items() if levels == full or len(c) <= max_cells}
+        self.build_seconds = round(time.perf_counter() - start, 3)
+
+    def to_arrays(self):
+        """
+        Splits the cube into numpy arrays and a small picklable description, so it can be
+        saved next to a snapshot and re-attached (memory-mapped) with from_arrays.
+        """
+        arrays = {}
+        cuboids = []
+        for i, (levels, cuboid) in enumerate(self.cuboids.items()):
+            for col, codes in cuboid.codes.items():
+                arrays[f"{i}.codes.{col}"] = codes
+            for stat, values in cuboid.stats.items():
+                arrays[f"{i}.stats.{stat}"] = values
+            cuboids.append((levels, i))
+        meta = {
+            "source_rows": self.source_rows,
+            "build_seconds": self.build_seconds,
+            "labels": {col: labels.tolist() for col, labels in self.labels.items()},
+            "cuboids": cuboids,
+        }
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Rebuilds a cube from to_arrays output without copying the arrays."""
+        cube = cls.__new__(cls)
+        cube.source_rows = meta["source_rows"]
+        cube.build_seconds = meta["build_seconds"]
+        cube.labels = {col: np.asarray(labels, dtype=object) for col, labels in meta["labels"].items()}
+        cube.code_of = {col: {str(label): code for code, label in enumerate(labels)} for col, labels in meta["labels"].items()}
+        cube.cuboids = {}
+        for levels, i in meta["cuboids"]:
+            levels = tuple(levels)
+            cuboid = Cuboid(levels, {}, {})
+            cuboid.codes = {col: arrays[f"{i}.codes.{col}"] for col in cuboid.columns}
+            cuboid.stats = {stat: arrays[f"{i}.stats.{stat}"] for stat in ("sum", "count", "min", "max")}
+            cube.cuboids[levels] = cuboid
+        return cube
+
+    def dimensions(self):
+        """Hierarchies with the members of each level, for building slice / drill-down UIs."""
+        return {
+            name: [{"level": col, "members": [self._json(v) for v in self.labels[col]]} for col in cols]
+            for name, cols in HIERARCHIES.items()
+        }
+
+    def report(self):
+        return {
+            "source_rows": self.source_rows,
+            "cuboids": len(self.cuboids),
+            "cells": int(sum(len(c) for c in self.cuboids.values())),
+            "bytes": int(sum(c.nbytes() for c in self.cuboids.values())),
+            "build_seconds": self.build_seconds,
+        }
+
+    def query(self, group_by=(), filters=None, measures=None, limit=CUBE_MAX_RESULT_CELLS):
+        """
+        Aggregates of the measure grouped by `group_by` columns, restricted to `filters`
+        ({column: label or [labels]}). Returns cells sorted by the group columns.
+        Raises ValueError on unknown columns or measures.
+        """
+        group_by = list(dict.fromkeys(group_by or []))
+        filters = filters or {}
+        measures = list(measures or MEASURES)
+
+        unknown = [c for c in group_by + list(filters) if c not in LEVEL_OF]
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {', '.join(map(str, unknown))}")
+        bad = [m for m in measures if m not in MEASURES]
+        if bad:
+            raise ValueError(f"Unknown measures: {', '.join(bad)}")
+
+        names = list(HIERARCHIES)
+        wanted = [0] * len(names)
+        for col in group_by + list(filters):
+            name, depth = LEVEL_OF[col]
+            wanted[names.index(name)] = max(wanted[names.index(name)], depth)
+        cuboid = min((c for c in self.cuboids.values() if c.covers(wanted)), key=len)
+
+        codes, stats = cuboid.codes, cuboid.stats
+        mask = None
+        for col, value in filters.items():
+            accepted = value if isinstance(value, (list, tuple, set)) else [value]
+            wanted_codes = [self.code_of[col][str(v)] for v in accepted if str(v) in self.code_of[col]]
+            keep = np.isin(codes[col], wanted_codes)
+            mask = keep if mask is None else mask & keep
+        if mask is not None:
+            idx = np.flatnonzero(mask)
+            codes = {c: codes[c][idx] for c in group_by}
+            stats = {k: v[idx] for k, v in stats.items()}
+
+        # Stored cells are already sorted by the cuboid's columns; re-aggregate otherwise
+        if group_by != cuboid.columns:
+            codes, stats = rollup(codes, stats, group_by)
+
+        total = len(stats["count"])
+        counts = stats["count"][:limit]
+        empty = counts == 0  # all-missing cells have no sum / mean / min / max
+        out = {col: self.labels[col][codes[col][:limit]].tolist() for col in group_by}
+        for col in group_by:
+            if (codes[col][:limit] < 0).any():
+                out[col] = [None if c < 0 else label for c, label in zip(codes[col][:limit], out[col])]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = {
+                "sum": stats["sum"][:limit],
+                "mean": stats["sum"][:limit] / counts,
+                "min": stats["min"][:limit],
+                "max": stats["max"][:limit],
+            }
+        for m in measures:
+            if m == "count":
+                out[m] = counts.tolist()
+                continue
+            column = np.round(values[m], 4).astype(object)
+            if empty.any():
+                column[empty] = None
+            out[m] = column.tolist()
+
+        cells = [dict(zip(out, row)) for row in zip(*out.values())]
+        return {
+            "cells": cells,
+            "total_cells": total,
+            "truncated": total > len(cells),
+            "cuboid": cuboid.columns,
+        }
+
+    @staticmethod
+    def _json(value):
+        return value.item() if isinstance(value, np.generic) else value
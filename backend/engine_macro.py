@@ -1,6 +1,17 @@
 import requests
+import logging
+import threading
+import sqlite3
+import json
+import os
+import time
 import pandas as pd
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from metrics import WORLDBANK_FETCH_SECONDS, DATA_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
 
 # World Bank API Base URL
 WB_API_URL = "http://api.worldbank.org/v2/country/egy/indicator/"
@@ -16,16 +27,149 @@ INDICATORS = {
     "exports_gdp": "NE.EXP.GNFS.ZS"
 }
 
+# How long a fetched series is served before a background refresh is triggered
+CACHE_TTL = timedelta(days=1)
+
+# Per-indicator overrides: sector shares are annual and revised rarely
+INDICATOR_TTLS = {
+    "agriculture_gdp": timedelta(days=7),
+    "manufacturing_gdp": timedelta(days=7),
+    "services_gdp": timedelta(days=7),
+    "exports_gdp": timedelta(days=7),
+}
+
+# Durable cache file, kept next to mock_data so restarts and workers share it
+CACHE_PATH = os.getenv("MACRO_CACHE_PATH", os.path.join(os.path.dirname(__file__), "cache", "macro_cache.sqlite"))
+
+class IndicatorCache:
+    """
+    SQLite-backed store of indicator series with their fetch time and HTTP validators
+    (ETag / Last-Modified) for conditional revalidation.
+    """
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+        self.connect()
+
+    def connect(self):
+        try:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS indicators (
+                    code TEXT PRIMARY KEY,
+                    series TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                )"""
+            )
+            self.conn.commit()
+        except Exception as e:
+            print(f"Macro cache unavailable ({self.path}): {e}")
+            self.conn = None
+
+    def load_all(self):
+        """Returns {code: (series, fetched_at)} for every stored indicator."""
+        if not self.conn:
+            return {}
+        with self.lock:
+            rows = self.conn.execute("SELECT code, series, fetched_at FROM indicators").fetchall()
+        return {code: (json.loads(series), fetched_at) for code, series, fetched_at in rows}
+
+    def validators(self, code):
+        """Returns conditional request headers for a stored indicator."""
+        if not self.conn:
+            return {}
+        with self.lock:
+            row = self.conn.execute("SELECT etag, last_modified FROM indicators WHERE code = ?", (code,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def put(self, code, series, etag=None, last_modified=None):
+        if not self.conn:
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO indicators (code, series, fetched_at, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                (code, json.dumps(series), time.time(), etag, last_modified),
+            )
+            self.conn.commit()
+
+    def touch(self, code):
+        """Marks a stored series as fresh (upstream answered 304) and returns it."""
+        if not self.conn:
+            return []
+        with self.lock:
+            self.conn.execute("UPDATE indicators SET fetched_at = ? WHERE code = ?", (time.time(), code))
+            self.conn.commit()
+            row = self.conn.execute("SELECT series FROM indicators WHERE code = ?", (code,)).fetchone()
+        return json.loads(row[0]) if row else []
+
 class MacroEngine:
-    def __init__(self):
+    def __init__(self, base_url=WB_API_URL, max_workers=len(INDICATORS), cache_path=CACHE_PATH):
+        self.base_url = base_url
         self.cache = {}
+        self.fetched_at = {}  # indicator name -> datetime of last fetch attempt
         self.last_fetch = None
+        self.version = 0  # bumped whenever a changed summary is published
+        self.store = IndicatorCache(cache_path)
+        self.load_from_disk()
+
+        # Pooled HTTP session shared by all indicator fetches
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wb-fetch")
+
+        # Single-flight refresh: at most one refresh runs at a time, callers share its Future
+        self._refresh_lock = threading.Lock()
+        self._inflight = None
+
+    def load_from_disk(self):
+        """Serves whatever the durable cache holds, without touching the network."""
+        stored = self.store.load_all()
+        for name, code in INDICATORS.items():
+            if code in stored:
+                series, fetched_at = stored[code]
+                self.fetched_at[name] = datetime.fromtimestamp(fetched_at)
+                if series:
+                    self.cache[name] = self._summarize(series)
+        if self.cache:
+            self.version += 1
+            self.last_fetch = max(self.fetched_at[name] for name in self.cache)
+            print(f"Macro cache loaded from disk: {len(self.cache)} indicators.")
+
+    @staticmethod
+    def _summarize(series):
+        return {
+            "latest_value": series[-1]['value'], # Last item is latest due to sort
+            "latest_year": series[-1]['year'],
+            "trend": series # Full series for charts
+        }
 
     def fetch_indicator(self, indicator_code):
-        """Fetches the last 5 years of data for a given indicator."""
-        url = f"{WB_API_URL}{indicator_code}?format=json&per_page=5"
+        """
+        Fetches the last 5 years of data for a given indicator.
+        Sends the stored validators so an unchanged series costs a 304 instead of a download.
+        """
+        url = f"{self.base_url}{indicator_code}?format=json&per_page=5"
+        start = time.perf_counter()
+        fetched = False
         try:
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, headers=self.store.validators(indicator_code), timeout=10)
+            WORLDBANK_FETCH_SECONDS.observe(time.perf_counter() - start, status=response.status_code)
+            fetched = True
+            if response.status_code == 304:
+                return self.store.touch(indicator_code)
             response.raise_for_status()
             data = response.json()
             
@@ -42,9 +186,13 @@ class MacroEngine:
                     })
             # Sort by year ascending for charts
             series.sort(key=lambda x: x['year'])
+            if series:
+                self.store.put(indicator_code, series, response.headers.get("ETag"), response.headers.get("Last-Modified"))
             return series
         except Exception as e:
-            print(f"Error fetching {indicator_code}: {e}")
+            if not fetched:
+                WORLDBANK_FETCH_SECONDS.observe(time.perf_counter() - start, status="error")
+            logger.warning("Error fetching %s: %s", indicator_code, e)
             return []
 
     def fetch_data360(self, indicator_code, country_code="EGY"):
@@ -60,7 +208,7 @@ class MacroEngine:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             
@@ -79,43 +227,91 @@ class MacroEngine:
             print(f"Data360 Error: {e}")
             return []
 
+    def stale_indicators(self):
+        """Names of indicators that are missing or older than their TTL."""
+        now = datetime.now()
+        return [
+            name for name in INDICATORS
+            if name not in self.fetched_at or now - self.fetched_at[name] >= INDICATOR_TTLS.get(name, CACHE_TTL)
+        ]
+
+    def is_stale(self):
+        return bool(self.stale_indicators())
+
     def get_macro_summary(self):
-        """Returns a summary of key macro indicators."""
-        # Simple in-memory caching (refresh if older than 1 day - for MVP)
-        if self.last_fetch and (datetime.now() - self.last_fetch).days < 1:
-            return self.cache
+        """
+        Returns a summary of key macro indicators.
+        A cold cache waits for the (shared) refresh; an expired cache is served
+        immediately while a single background refresh replaces it.
+        """
+        if self.last_fetch is None:
+            return self.refresh().result()
 
-        summary = {}
-        for name, code in INDICATORS.items():
-            data = self.fetch_indicator(code)
+        if self.is_stale():
+            self.refresh()
+        return self.cache
+
+    def refresh(self):
+        """Starts a refresh unless one is already running. Returns the in-flight Future."""
+        with self._refresh_lock:
+            if self._inflight is None:
+                self._inflight = Future()
+                threading.Thread(
+                    target=self._run_refresh, args=(self._inflight,), name="macro-refresh", daemon=True
+                ).start()
+            return self._inflight
+
+    def _run_refresh(self, future):
+        try:
+            with DATA_LOAD_SECONDS.time(source="macro"):
+                self._fetch_summary(self.stale_indicators())
+            self.last_fetch = datetime.now()
+            future.set_result(self.cache)
+        except Exception as e:
+            logger.error("Macro refresh error: %s", e)
+            future.set_exception(e)
+        finally:
+            with self._refresh_lock:
+                self._inflight = None
+
+    def _fetch_summary(self, names):
+        """
+        Fetches the given indicators in parallel over the pooled session.
+        An indicator that fails keeps its previous series until its next TTL expiry.
+        """
+        results = self.executor.map(self.fetch_indicator, [INDICATORS[n] for n in names])
+        cache = dict(self.cache)
+        for name, data in zip(names, results):
+            self.fetched_at[name] = datetime.now()
             if data:
-                summary[name] = {
-                    "latest_value": data[-1]['value'], # Last item is latest due to sort
-                    "latest_year": data[-1]['year'],
-                    "trend": data # Full series for charts
-                }
-        
-        self.cache = summary
-        self.last_fetch = datetime.now()
-        return summary
+                cache[name] = self._summarize(data)
+        # Publish the new summary in one assignment so readers never see it half-built
+        if cache != self.cache:
+            self.cache = cache
+            self.version += 1
+
+    def memory_report(self):
+        """Approximate bytes held by the cached summaries (their JSON size)."""
+        cache = self.cache
+        size = len(json.dumps(cache, default=str))
+        return {"indicators": len(cache), "cache": size, "total": size}
 
     def get_sector_data(self):
         """Returns time-series data for sector indicators."""
-        # Ensure cache is populated
-        if not self.cache or (self.last_fetch and (datetime.now() - self.last_fetch).days >= 1):
-            self.get_macro_summary()
-        
+        # Ensure cache is populated (or a stale one is being revalidated)
+        cache = self.get_macro_summary()
+
         sectors = []
         sector_keys = ["agriculture_gdp", "manufacturing_gdp", "services_gdp", "exports_gdp"]
         
         for key in sector_keys:
-            if key in self.cache:
+            if key in cache:
                 sectors.append({
                     "name": key,
                     "label": key.replace("_gdp", "").title() + " (% GDP)",
-                    "data": self.cache[key]["trend"]
+                    "data": cache[key]["trend"]
                 })
         return sectors
 
-# Singleton instance
-macro_engine = MacroEngine()
+# Singleton instance (constructed lazily / by background warm-up, see engines.py)
+from engines import macro_engine
@@ -1,16 +1,34 @@
 import pandas as pd
+import logging
 import os
+import sys
+import threading
+import time
 import numpy as np
 import gspread
+from scipy.sparse import csr_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
+from snapshot import ColumnarSnapshot
+from query_parser import QueryConstraintParser
+from cube import CUBE_MAX_RESULT_CELLS, MEASURES, MetricCube
+from compaction import array_bytes, compact_frame, frame_bytes, sparse_bytes
+from metrics import DATA_LOAD_SECONDS
+from paging import DATA_PAGE_SIZE, DATA_MAX_PAGE_SIZE, INTERNAL_COLUMNS, decode_cursor, encode_cursor
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Path to mock data
 DATA_PATH = os.path.join(os.path.dirname(__file__), "mock_data", "egypt_complex_micro_data.csv")
 
+# Cap on exact-match rows handed to the prompt by retrieve()
+MICRO_CONTEXT_MAX_ROWS = int(os.getenv("MICRO_CONTEXT_MAX_ROWS", 10))
+
+# Seconds between background reloads of the micro data (0 = only on demand)
+MICRO_RELOAD_INTERVAL = float(os.getenv("MICRO_RELOAD_INTERVAL", 0))
+
 class GoogleSheetsClient:
     def __init__(self):
         self.client = None
@@ -54,17 +72,280 @@ class GoogleSheetsClient:
             print(f"Google Sheets Fetch Error: {e}")
             return None
 
-class MicroEngine:
-    def __init__(self):
+class FilterIndex:
+    """
+    Prebuilt column indexes over the wide micro DataFrame.
+    Numeric columns are kept as sorted arrays (answered by binary search) and
+    categorical columns as posting lists (value -> sorted row ids), so a filter
+    is resolved by intersecting row-id sets instead of masking a copy of the frame.
+    """
+    RANGE_COLUMNS = {
+        "Avg_Rent_Sqm_EGP": ("min_rent", "max_rent"),
+        "Foot_Traffic_Score": ("min_traffic", "max_traffic"),
+    }
+    CATEGORY_COLUMNS = {
+        "District": "districts",
+        "Competitor_Density": "competitor_density",
+    }
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.values = {}         # column -> raw values in row order (for probing)
+        self.sorted_values = {}  # column -> ascending values, NaN last
+        self.sorted_rows = {}    # column -> row ids in the same order as sorted_values
+        self.valid_counts = {}   # column -> number of non-NaN values
+        self.codes = {}          # column -> integer code per row
+        self.postings = {}       # column -> {value: sorted row ids}
+        self.code_of = {}        # column -> {value: code}
+
+        for col in self.RANGE_COLUMNS:
+            if col not in df.columns:
+                continue
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+            order = np.argsort(values, kind='stable')
+            self.values[col] = values
+            self.sorted_values[col] = values[order]
+            self.sorted_rows[col] = order
+            self.valid_counts[col] = int(np.count_nonzero(~np.isnan(values)))
+
+        for col in self.CATEGORY_COLUMNS:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col])
+            self.codes[col] = codes
+            self.code_of[col] = {value: code for code, value in enumerate(uniques)}
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.postings[col] = {
+                value: order[bounds[code]:bounds[code + 1]]
+                for code, value in enumerate(uniques)
+            }
+
+        # JSON-ready rows, converted once instead of on every request
+        public = df.drop(columns=[c for c in INTERNAL_COLUMNS if c in df.columns])
+        self.columns = list(public.columns)
+        self.records = public.astype(object).where(pd.notnull(public), None).to_dict('records')
+        self._df = public
+        self._sort_ranks = {}    # column -> rank per row (ascending, missing last), built on first sort
+
+    def supports(self, filters):
+        """True if every active filter targets a column this index covers."""
+        for col, (min_key, max_key) in self.RANGE_COLUMNS.items():
+            if (filters.get(min_key) is not None or filters.get(max_key) is not None) and col not in self.values:
+                return False
+        for col, key in self.CATEGORY_COLUMNS.items():
+            if filters.get(key) and col not in self.codes:
+                return False
+        return True
+
+    def _range_rows(self, col, low, high):
+        values = self.sorted_values[col]
+        start = 0 if low is None else int(np.searchsorted(values, low, side='left'))
+        end = self.valid_counts[col] if high is None else int(np.searchsorted(values, high, side='right'))
+        return self.sorted_rows[col][start:max(start, end)]
+
+    def _category_rows(self, col, wanted):
+        lists = [self.postings[col][v] for v in dict.fromkeys(wanted) if v in self.postings[col]]
+        if not lists:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(lists)
+
+    def query(self, filters):
+        """Returns the sorted row ids matching the filters."""
+        candidates = []  # (row ids, probe) pairs; probe re-checks the predicate on a subset
+
+        for col, (min_key, max_key) in self.RANGE_COLUMNS.items():
+            low, high = filters.get(min_key), filters.get(max_key)
+            if low is None and high is None:
+                continue
+            values = self.values[col]
+
+            def probe(ids, values=values, low=low, high=high):
+                subset = values[ids]
+                keep = ~np.isnan(subset)
+                if low is not None:
+                    keep &= subset >= low
+                if high is not None:
+                    keep &= subset <= high
+                return ids[keep]
+
+            candidates.append((self._range_rows(col, low, high), probe))
+
+        for col, key in self.CATEGORY_COLUMNS.items():
+            wanted = filters.get(key)
+            if not wanted:
+                continue
+            codes = self.codes[col]
+            wanted_codes = np.array([self.code_of[col][v] for v in wanted if v in self.code_of[col]], dtype=codes.dtype)
+
+            def probe(ids, codes=codes, wanted_codes=wanted_codes):
+                return ids[np.isin(codes[ids], wanted_codes)]
+
+            candidates.append((self._category_rows(col, wanted), probe))
+
+        if not candidates:
+            return np.arange(self.size)
+
+        # Drive the intersection from the smallest row-id set and probe the rest
+        candidates.sort(key=lambda c: len(c[0]))
+        ids = candidates[0][0]
+        for _, probe in candidates[1:]:
+            if len(ids) == 0:
+                break
+            ids = probe(ids)
+        return np.sort(ids)
+
+    def nbytes(self):
+        """Index arrays plus an estimate of the prebuilt JSON-ready records (sampled)."""
+        arrays = [*self.values.values(), *self.sorted_values.values(), *self.sorted_rows.values(),
+                  *self.codes.values(), *self._sort_ranks.values()]
+        arrays += [ids for postings in self.postings.values() for ids in postings.values()]
+        sample = self.records[:100]
+        per_record = sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values()) for r in sample) / max(len(sample), 1)
+        return array_bytes(arrays) + int(per_record * len(self.records))
+
+    def rows(self, ids, fields=None):
+        """Copies of the prebuilt records, so callers can add to a row without changing the index."""
+        if fields is None:
+            return [dict(self.records[i]) for i in ids]
+        return [{f: self.records[i][f] for f in fields} for i in ids]
+
+    def _rank(self, col):
+        ranks = self._sort_ranks.get(col)
+        if ranks is None:
+            ranks = self._df[col].rank(method='min', na_option='keep').to_numpy()
+            self._sort_ranks[col] = ranks
+        return ranks
+
+    def order(self, ids, col, descending=False):
+        """Sorts row ids by a column (stable, missing values last in either direction)."""
+        ranks = self._rank(col)[ids]
+        if descending:
+            ranks = -ranks
+        return ids[np.argsort(np.where(np.isnan(ranks), np.inf, ranks), kind='stable')]
+
+class MicroData:
+    """
+    One generation of the micro dataset and everything derived from it.
+    Built off to the side by MicroEngine and never mutated once published.
+    """
+    def __init__(self, version=0):
+        self.version = version
         self.df = None
+        self.raw_df = None  # long-format source table (complex CSV only)
         self.vectorizer = None
         self.tfidf_matrix = None
+        self.filter_index = None
+        self.query_parser = None
+        self.cube = None  # MetricCube over raw_df (complex CSV only)
+        self.shared = False  # TF-IDF and cube attached from the snapshot, mapped by every worker
+
+class MicroEngine:
+    def __init__(self):
         self.sheets_client = GoogleSheetsClient()
-        self.load_data()
-        self.init_vector_search()
+        self._reload_lock = threading.Lock()
+        self.last_reload = None
+        self.state = self._build_state(version=0)
+        if MICRO_RELOAD_INTERVAL > 0:
+            self.start_auto_reload(MICRO_RELOAD_INTERVAL)
+
+    # Everything below reads the published generation through these, so swapping
+    # self.state is the only write a reload makes
+    @property
+    def df(self):
+        return self.state.df
+
+    @property
+    def raw_df(self):
+        return self.state.raw_df
+
+    @property
+    def vectorizer(self):
+        return self.state.vectorizer
+
+    @property
+    def tfidf_matrix(self):
+        return self.state.tfidf_matrix
+
+    @property
+    def filter_index(self):
+        return self.state.filter_index
+
+    @property
+    def query_parser(self):
+        return self.state.query_parser
+
+    @property
+    def data_version(self):
+        """Bumped whenever a reload publishes different data."""
+        return self.state.version
+
+    def _build_state(self, version):
+        """Loads the data and builds the TF-IDF and filter indexes on a fresh MicroData."""
+        with DATA_LOAD_SECONDS.time(source="micro"):
+            data = MicroData(version)
+            self.load_data(data)
+            if not data.shared:
+                self.init_vector_search(data)
+                self.build_cube(data)
+            self.build_filter_index(data)
+            data.query_parser = QueryConstraintParser(self._districts(data.df))
+        return data
+
+    def reload(self):
+        """
+        Rebuilds the data from its source and publishes it with one reference swap.
+        Requests keep using the previous generation until the swap and never wait on it.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"status": "busy", "version": self.data_version}
 
-    def load_data(self):
-        """Loads data from Google Sheets (if configured) or falls back to local CSV."""
+        try:
+            start = time.perf_counter()
+            current = self.state
+            try:
+                data = self._build_state(current.version + 1)
+            except Exception as e:
+                print(f"Micro data reload failed, keeping version {current.version}: {e}")
+                self.last_reload = {"status": "failed", "version": current.version, "error": str(e)}
+                return self.last_reload
+
+            # raw_df too: a sector or year change can leave the pivot identical but not the cube
+            if data.df.equals(current.df) and self._same_frame(data.raw_df, current.raw_df):
+                status = "unchanged"
+            else:
+                self.state = data  # the swap
+                status = "reloaded"
+            self.last_reload = {
+                "status": status,
+                "version": self.data_version,
+                "rows": len(self.df),
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+            print(f"Micro data reload: {self.last_reload}")
+            return self.last_reload
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def _same_frame(a, b):
+        if a is None or b is None:
+            return a is b
+        return a.equals(b)
+
+    def start_auto_reload(self, interval):
+        """Reloads every `interval` seconds on a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.reload()
+
+        thread = threading.Thread(target=loop, name="micro-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def load_data(self, data):
+        """Loads data from Google Sheets (if configured) or falls back to local CSV, into `data`."""
         # Check for Sheet ID in env or hardcoded for testing
         sheet_id = os.getenv("GOOGLE_SHEET_ID")
         
@@ -126,12 +407,12 @@ class MicroEngine:
                     if col != "Competitor_Density": # Keep Density as string or map it later
                          df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
-                self.df = df
+                data.df = df
                 
                 # NEW: Generate Source IDs if missing for Traceability
-                if "Source_ID" not in self.df.columns:
+                if "Source_ID" not in data.df.columns:
                     # Generate IDs like FS_CAI_001, FS_CAI_002...
-                    self.df["Source_ID"] = [f"FS_CAI_{i+1:03d}" for i in range(len(self.df))]
+                    data.df["Source_ID"] = [f"FS_CAI_{i+1:03d}" for i in range(len(data.df))]
                 
                 print("Micro Data Loaded from Google Sheets.")
                 return
@@ -139,23 +420,23 @@ class MicroEngine:
         # Fallback to local
         if os.path.exists(DATA_PATH):
             if "complex" in DATA_PATH:
-                self.df = self._load_complex_data(DATA_PATH)
+                data.df = self._load_complex_data(DATA_PATH, data)
                 print("Micro Data Loaded from Complex CSV.")
             else:
-                self.df = pd.read_csv(DATA_PATH)
+                data.df = pd.read_csv(DATA_PATH)
                 print("Micro Data Loaded from Local CSV (Fallback).")
         else:
             print(f"Error: Data file not found at {DATA_PATH}")
-            self.df = pd.DataFrame()
+            data.df = pd.DataFrame()
 
         # Ensure Source_ID exists even for local/empty data
-        if self.df is not None and not self.df.empty and "Source_ID" not in self.df.columns:
-             self.df["Source_ID"] = [f"FS_LOC_{i+1:03d}" for i in range(len(self.df))]
+        if data.df is not None and not data.df.empty and "Source_ID" not in data.df.columns:
+             data.df["Source_ID"] = [f"FS_LOC_{i+1:03d}" for i in range(len(data.df))]
         
         # FINAL FALLBACK: If everything failed, populate with Mock Data for Demo
-        if self.df is None or self.df.empty:
+        if data.df is None or data.df.empty:
             print("CRITICAL: All data sources failed. Using Hardcoded Mock Data.")
-            self.df = pd.DataFrame({
+            data.df = pd.DataFrame({
                 "District": ["Maadi", "Zamalek", "Nasr City", "New Cairo", "6th of October", "Heliopolis"],
                 "Avg_Rent_Sqm_EGP": [350, 500, 200, 250, 180, 280],
                 "Foot_Traffic_Score": [1500, 3000, 3500, 1200, 2000, 2200],
@@ -163,14 +444,81 @@ class MicroEngine:
                 "Source_ID": [f"MOCK_{i}" for i in range(6)]
             })
 
-    def _load_complex_data(self, path):
+    def _load_complex_data(self, path, data):
         """
         Loads and transforms the complex long-format CSV into the wide-format expected by the app.
         Focuses on 2025 Real Estate/Commercial data.
+        Both tables, the TF-IDF index and the cube are cached in a columnar snapshot keyed
+        by the CSV, so restarts skip the CSV parse, the pivot and the index builds until
+        the file changes. The snapshot is memory-mapped: workers of the same server share
+        one copy, and only the first to take the build lock builds it.
         """
+        snapshot = ColumnarSnapshot(path)
+        with snapshot.build_lock():
+            frames = snapshot.load(categorical=("raw",))
+            if frames is not None:
+                print(f"Complex data loaded from snapshot: {len(frames['raw'])} rows, pivot shape {frames['pivot'].shape}")
+            else:
+                try:
+                    df_raw = pd.read_csv(path)
+                except Exception as e:
+                    print(f"Error reading complex data: {e}")
+                    return pd.DataFrame()
+
+                df_pivot = self._pivot_complex_data(df_raw)
+                if df_pivot.empty:
+                    return df_pivot
+                frames = {"raw": compact_frame(df_raw), "pivot": df_pivot}
+                if snapshot.save(frames):
+                    # Map what was just written so this process shares pages with the others
+                    frames = snapshot.load(categorical=("raw",)) or frames
+
+            data.raw_df = compact_frame(frames["raw"])
+            data.df = frames["pivot"]
+            data.shared = self._attach_shared(snapshot, data)
+            if not data.shared:
+                self.init_vector_search(data)
+                self.build_cube(data)
+                snapshot.save_extras(*self._shared_arrays(data))
+                # Still private copies if the extras could not be written
+                data.shared = self._attach_shared(snapshot, data)
+        return data.df
+
+    def _shared_arrays(self, data):
+        """The TF-IDF index and cube of `data` as (arrays, objects) for ColumnarSnapshot.save_extras."""
+        arrays, objects = {}, {"vectorizer": data.vectorizer, "cube": None}
+        if data.vectorizer is not None:
+            matrix = data.tfidf_matrix.tocsr()
+            arrays.update({"tfidf.data": matrix.data, "tfidf.indices": matrix.indices, "tfidf.indptr": matrix.indptr})
+            objects["tfidf_shape"] = matrix.shape
+        if data.cube is not None:
+            objects["cube"], cube_arrays = data.cube.to_arrays()
+            arrays.update({f"cube.{name}": a for name, a in cube_arrays.items()})
+        return arrays, objects
+
+    def _attach_shared(self, snapshot, data):
+        """Points `data` at the snapshot's memory-mapped TF-IDF index and cube; False if not saved yet."""
+        extras = snapshot.load_extras()
+        if extras is None:
+            return False
+        arrays, objects = extras
+        data.vectorizer = objects["vectorizer"]
+        data.tfidf_matrix = None
+        if data.vectorizer is not None:
+            data.tfidf_matrix = csr_matrix(
+                (arrays["tfidf.data"], arrays["tfidf.indices"], arrays["tfidf.indptr"]),
+                shape=objects["tfidf_shape"], copy=False)
+        data.cube = None
+        if objects["cube"] is not None:
+            prefix = "cube."
+            data.cube = MetricCube.from_arrays(
+                objects["cube"], {name[len(prefix):]: a for name, a in arrays.items() if name.startswith(prefix)})
+        print(f"Vector index and metric cube attached from snapshot ({len(arrays)} mapped arrays).")
+        return True
+
+    def _pivot_complex_data(self, df_raw):
+        """Builds the wide per-District table from the long-format rows."""
         try:
-            df_raw = pd.read_csv(path)
-            
             # Filter for latest 2025 data and relevant sectors
             # We want Retail Commercial data for "Market Intelligence" dashboard context
             mask_2025 = df_raw['Year'] == 2025
@@ -234,109 +582,277 @@ class MicroEngine:
             traceback.print_exc()
             return pd.DataFrame()
 
-    def init_vector_search(self):
+    def init_vector_search(self, data):
         """Initializes the TF-IDF vectorizer and pre-computes vectors for the data."""
-        if self.df.empty:
+        if data.df.empty:
             return
 
         print("Initializing Vector Search Model (TF-IDF)...")
         try:
             # Create a text representation for each row to embed
             # Handle potential missing columns if Sheet schema differs
+            # (only needed for the fit, so it is not kept on the frame)
             required_cols = ['District', 'Avg_Rent_Sqm_EGP', 'Foot_Traffic_Score', 'Competitor_Density']
-            if not all(col in self.df.columns for col in required_cols):
-                print(f"Warning: Missing columns for vector search. Available: {self.df.columns}")
+            if not all(col in data.df.columns for col in required_cols):
+                print(f"Warning: Missing columns for vector search. Available: {data.df.columns}")
                 # Try to use whatever is available
-                self.df['text_representation'] = self.df.apply(lambda row: " ".join(str(x) for x in row.values), axis=1)
+                texts = data.df.apply(lambda row: " ".join(str(x) for x in row.values), axis=1)
             else:
-                self.df['text_representation'] = self.df.apply(
+                texts = data.df.apply(
                     lambda row: f"{row['District']} {row['District']} rent price {row['Avg_Rent_Sqm_EGP']} traffic {row['Foot_Traffic_Score']} competitors {row['Competitor_Density']}", 
                     axis=1
                 )
             
             # Initialize Vectorizer
-            self.vectorizer = TfidfVectorizer(stop_words='english')
-            self.tfidf_matrix = self.vectorizer.fit_transform(self.df['text_representation'].tolist())
+            data.vectorizer = TfidfVectorizer(stop_words='english')
+            data.tfidf_matrix = data.vectorizer.fit_transform(texts.tolist())
             
             print("Vector Index Built Successfully (TF-IDF).")
         except Exception as e:
             print(f"Error initializing vector search: {e}")
-            self.vectorizer = None
+            data.vectorizer = None
+
+    def retrieve(self, query, top_k=3):
+        """
+        Context rows for a question. Exact constraints in the query (rent/traffic ranges,
+        district names, competition levels) run as filter_data predicates; vector search
+        is only used when the query has none or they match nothing. Matching rows are
+        ranked by how well they fit the rest of the question, then by foot traffic.
+        """
+        state = self.state
+        parser = state.query_parser
+        filters = parser.parse(query) if parser else {}
+        if filters:
+            index = state.filter_index
+            if index is not None and index.supports(filters):
+                ids = index.query(filters)
+                if len(ids):
+                    ids = self._rank_ids(state, parser.residual(query), ids)
+                    return index.rows(ids[:MICRO_CONTEXT_MAX_ROWS])
+            else:
+                rows = self.filter_data(filters)
+                if rows:
+                    rows = sorted(rows, key=lambda r: r.get('Foot_Traffic_Score') or 0, reverse=True)
+                    return rows[:MICRO_CONTEXT_MAX_ROWS]
+        return self.search(query, top_k)
+
+    def _rank_ids(self, state, text, ids):
+        """Row ids by TF-IDF similarity to `text` (scored over those rows only), ties by foot traffic."""
+        scores = np.zeros(len(ids))
+        if text and state.vectorizer is not None and state.tfidf_matrix is not None:
+            query_vector = state.vectorizer.transform([text])
+            scores = (state.tfidf_matrix[ids] @ query_vector.T).toarray().ravel()
+        traffic = state.filter_index.values.get('Foot_Traffic_Score')
+        traffic = np.nan_to_num(traffic[ids]) if traffic is not None else np.zeros(len(ids))
+        return ids[np.lexsort((-traffic, -scores))]
 
     def search(self, query, top_k=3):
         """
         Performs a vector search using TF-IDF cosine similarity.
         """
-        if self.df.empty:
-            return []
-        
-        if not self.vectorizer or self.tfidf_matrix is None:
-            print("Warning: Falling back to keyword search.")
-            return self._keyword_search(query)
+        return self.search_many([query], top_k)[0]
+
+    def search_many(self, queries, top_k=3):
+        """
+        Batched vector search: scores every query with one sparse matrix product
+        against tfidf_matrix and picks each query's top_k by partial selection.
+        Returns one result list per query, in order.
+        """
+        state = self.state  # one generation for the whole batch, even if a reload lands mid-way
+        if state.df.empty:
+            return [[] for _ in queries]
+
+        if not state.vectorizer or state.tfidf_matrix is None:
+            logger.warning("Vector index unavailable, falling back to keyword search.")
+            return [self._keyword_search(query) for query in queries]
 
         try:
-            # Transform the query to a vector
-            query_vec = self.vectorizer.transform([query])
-            
-            # Compute cosine similarity
-            cos_scores = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
-            
-            # Find top_k results
-            top_indices = cos_scores.argsort()[-top_k:][::-1]
-            
-            results = []
-            for idx in top_indices:
-                score = cos_scores[idx]
-                if score > 0.1: # Threshold
-                    row = self.df.iloc[idx].to_dict()
+            # TF-IDF rows are L2-normalized, so the dot product is the cosine similarity
+            query_matrix = state.vectorizer.transform(list(queries))
+            scores = (query_matrix @ state.tfidf_matrix.T).tocsr()
+
+            batch = []
+            for i in range(scores.shape[0]):
+                start, end = scores.indptr[i], scores.indptr[i + 1]
+                row_scores = scores.data[start:end]
+                row_ids = scores.indices[start:end]
+
+                keep = row_scores > 0.1 # Threshold
+                row_scores, row_ids = row_scores[keep], row_ids[keep]
+                if len(row_scores) > top_k:
+                    top = np.argpartition(-row_scores, top_k - 1)[:top_k]
+                    row_scores, row_ids = row_scores[top], row_ids[top]
+                order = np.argsort(-row_scores, kind='stable')
+
+                results = []
+                for score, idx in zip(row_scores[order], row_ids[order]):
+                    row = state.df.iloc[idx].to_dict()
                     row['relevance_score'] = float(score)
                     results.append(row)
-            
-            return results
+                batch.append(results)
+            return batch
 
         except Exception as e:
-            print(f"Search Error: {e}")
-            return []
+            logger.error("Search error: %s", e)
+            return [[] for _ in queries]
 
     def _keyword_search(self, query):
         """Legacy keyword search fallback."""
         query = query.lower()
+        df = self.df
         results = []
-        for _, row in self.df.iterrows():
-            # Robust check for 'District' column
-            district = str(row.get('District', '')).lower()
-            if district and district in query:
-                results.append(row.to_dict())
+        if 'District' in df.columns:
+            # Match each distinct district name once instead of walking every row
+            lowered = df['District'].astype(str).str.lower()
+            hits = [d for d in lowered.unique() if d and d in query]
+            if hits:
+                results = df[lowered.isin(hits)].to_dict('records')
         
         if not results:
             # Return top districts by traffic as default
-            if 'Foot_Traffic_Score' in self.df.columns:
-                top_districts = self.df.sort_values(by='Foot_Traffic_Score', ascending=False).head(3)
+            if 'Foot_Traffic_Score' in df.columns:
+                top_districts = df.nlargest(3, 'Foot_Traffic_Score')
                 results = top_districts.to_dict('records')
             else:
-                results = self.df.head(3).to_dict('records')
+                results = df.head(3).to_dict('records')
         
         return results
 
     def get_all_districts(self):
-        if self.df.empty:
+        return self._districts(self.df)
+
+    @staticmethod
+    def _districts(df):
+        if df is None or df.empty:
             return []
-        if 'District' in self.df.columns:
-            return sorted(self.df['District'].unique().tolist())
+        if 'District' in df.columns:
+            return sorted(df['District'].unique().tolist())
         return []
 
+    def build_filter_index(self, data):
+        """Builds the FilterIndex used by filter_data. Must run after init_vector_search."""
+        if data.df is None or data.df.empty:
+            data.filter_index = None
+            return
+
+        try:
+            data.filter_index = FilterIndex(data.df)
+            print(f"Filter Index Built ({data.filter_index.size} rows).")
+        except Exception as e:
+            print(f"Error building filter index: {e}")
+            data.filter_index = None
+
+    def memory_report(self):
+        """Bytes held by each structure of the published generation."""
+        state = self.state
+        report = {
+            "raw_df": frame_bytes(state.raw_df),
+            "pivot_df": frame_bytes(state.df),
+            "tfidf_matrix": sparse_bytes(state.tfidf_matrix),
+            "filter_index": state.filter_index.nbytes() if state.filter_index is not None else 0,
+            "cube": state.cube.report()["bytes"] if state.cube is not None else 0,
+        }
+        report["total"] = sum(report.values())
+        report["raw_rows"] = len(state.raw_df) if state.raw_df is not None else 0
+        report["pivot_rows"] = len(state.df) if state.df is not None else 0
+        report["version"] = state.version
+        report["shared"] = state.shared  # raw_df, pivot_df, tfidf_matrix and cube are mapped, not per process
+        return report
+
+    def build_cube(self, data):
+        """Materializes the OLAP rollups over the full long-format data."""
+        data.cube = None
+        if data.raw_df is None or data.raw_df.empty:
+            return
+        try:
+            data.cube = MetricCube(data.raw_df)
+            report = data.cube.report()
+            print(f"Metric Cube Built ({report['cuboids']} cuboids, {report['cells']} cells, {report['build_seconds']}s).")
+        except Exception as e:
+            print(f"Error building metric cube: {e}")
+
+    def query_cube(self, group_by=(), filters=None, measures=None, limit=CUBE_MAX_RESULT_CELLS):
+        """Slice / dice / drill-down over precomputed rollups; None when the source has no long-format data."""
+        cube = self.state.cube
+        if cube is None:
+            return None
+        return cube.query(group_by, filters, measures, limit)
+
+    def cube_dimensions(self):
+        cube = self.state.cube
+        if cube is None:
+            return None
+        return {"dimensions": cube.dimensions(), "measures": MEASURES, **cube.report()}
+
     def filter_data(self, filters):
         """
         Filters the dataframe based on provided criteria.
         filters: dict with keys 'districts', 'min_rent', 'max_rent', 'min_traffic', 'max_traffic'
         """
-        if self.df.empty:
+        state = self.state
+        if state.df.empty:
             return []
 
-        # Debug: Print columns
-        print(f"Filter Data Columns: {self.df.columns.tolist()}")
+        logger.debug("Filter data columns: %s", state.df.columns.tolist())
 
-        filtered_df = self.df.copy()
+        if state.filter_index is not None and state.filter_index.supports(filters):
+            return state.filter_index.rows(state.filter_index.query(filters))
+
+        logger.warning("Filter index unavailable, falling back to DataFrame scan.")
+        return self._scan_filter(filters, state.df)
+
+    def query_page(self, filters, fields=None, sort_by=None, descending=False, limit=DATA_PAGE_SIZE, cursor=None):
+        """
+        One page of filter_data's rows, projected to `fields` and ordered by `sort_by`.
+        Only the page is materialized, so the cost follows the page size. Cursors are
+        tied to the data version: after a reload they raise CursorExpired instead of
+        silently paging through different rows. Bad fields / sort / cursor raise ValueError.
+        """
+        state = self.state
+        index = state.filter_index
+        if index is not None:
+            columns = index.columns
+        elif state.df is not None:
+            columns = [c for c in state.df.columns if c not in INTERNAL_COLUMNS]
+        else:
+            columns = []
+
+        unknown = [f for f in (fields or []) + ([sort_by] if sort_by else []) if f not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        fields = list(dict.fromkeys(fields)) if fields else None
+        limit = max(1, min(int(limit), DATA_MAX_PAGE_SIZE))
+        offset = decode_cursor(cursor, state.version) if cursor else 0
+
+        if index is not None and index.supports(filters):
+            ids = index.query(filters)
+            if sort_by:
+                ids = index.order(ids, sort_by, descending)
+            total = len(ids)
+            rows = index.rows(ids[offset:offset + limit], fields)
+        elif state.df is None or state.df.empty:
+            total, rows = 0, []
+        else:
+            logger.warning("Filter index unavailable, falling back to DataFrame scan.")
+            matched = self._scan_filter(filters, state.df)
+            if sort_by:
+                present = [r for r in matched if r.get(sort_by) is not None]
+                missing = [r for r in matched if r.get(sort_by) is None]
+                matched = sorted(present, key=lambda r: r[sort_by], reverse=descending) + missing
+            total = len(matched)
+            rows = [{f: r[f] for f in fields} if fields else r for r in matched[offset:offset + limit]]
+
+        end = offset + len(rows)
+        return {
+            "data": rows,
+            "total": total,
+            "next_cursor": encode_cursor(state.version, end) if end < total else None,
+            "version": state.version,
+        }
+
+    def _scan_filter(self, filters, df):
+        """Legacy mask-based filter, used when the index cannot answer the filters."""
+        filtered_df = df.copy()
 
         # Filter by District
         if filters.get('districts'):
@@ -357,6 +873,8 @@ class MicroEngine:
         if filters.get('competitor_density'):
             filtered_df = filtered_df[filtered_df['Competitor_Density'].isin(filters['competitor_density'])]
 
+        filtered_df = filtered_df.drop(columns=[c for c in INTERNAL_COLUMNS if c in filtered_df.columns])
+
         # Handle NaNs for JSON serialization
         filtered_df = filtered_df.astype(object).where(pd.notnull(filtered_df), None)
 
@@ -366,21 +884,22 @@ class MicroEngine:
         """
         Returns the hierarchy tree for Micro data based on available columns.
         """
-        if self.df is None or self.df.empty:
+        df = self.df
+        if df is None or df.empty:
              return []
 
         tree = []
         
         # 1. Market Indicators
         market_items = []
-        if "Avg_Rent_Sqm_EGP" in self.df.columns:
+        if "Avg_Rent_Sqm_EGP" in df.columns:
             market_items.append({
                 "name": "Avg_Rent_Sqm_EGP", 
                 "label": "Avg Rent (EGP)", 
                 "icon": "DollarSign",
                 "industries": ["Retail", "F&B", "Logistics", "Real Estate"] # Universal
             })
-        if "Vacancy_Rate" in self.df.columns:
+        if "Vacancy_Rate" in df.columns:
              market_items.append({
                  "name": "Vacancy_Rate", 
                  "label": "Vacancy Rate", 
@@ -397,14 +916,14 @@ class MicroEngine:
 
         # 2. Operational Metrics
         op_items = []
-        if "Foot_Traffic_Score" in self.df.columns:
+        if "Foot_Traffic_Score" in df.columns:
             op_items.append({
                 "name": "Foot_Traffic_Score", 
                 "label": "Foot Traffic", 
                 "icon": "Users",
                 "industries": ["Retail", "F&B"] # Not for Warehouses/Offices primarily
             })
-        if "Competitor_Density" in self.df.columns:
+        if "Competitor_Density" in df.columns:
             op_items.append({
                 "name": "Competitor_Density", 
                 "label": "Competitor Density", 
@@ -421,5 +940,5 @@ class MicroEngine:
             
         return tree
 
-# Singleton instance
-micro_engine = MicroEngine()
+# Singleton instance (constructed lazily / by background warm-up, see engines.py)
+from engines import micro_engine
@@ -0,0 +1,124 @@
+import asyncio
+import importlib
+import os
+import threading
+import time
+
+# After a failed build, requests fail fast for this long before the build is retried
+ENGINE_RETRY_SECONDS = float(os.getenv("ENGINE_RETRY_SECONDS", 30))
+
+class LazyEngine:
+    """
+    Lazily constructed singleton. The engine's module (and its heavy imports) is only
+    loaded when the engine is first used or warmed up, and construction runs once
+    even if several threads ask at the same time. Attribute access is forwarded, so
+    the proxy can be used wherever the engine instance was used before.
+    """
+    def __init__(self, name, module, factory):
+        self._name = name
+        self._module = module
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+        self.status = "pending"  # pending -> warming -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self._failed_at = None
+
+    def _check_backoff(self):
+        if self._failed_at is not None and time.monotonic() - self._failed_at < ENGINE_RETRY_SECONDS:
+            raise RuntimeError(f"Engine '{self._name}' failed to initialize: {self.error}")
+
+    def get(self):
+        instance = self._instance
+        if instance is not None:
+            return instance
+
+        self._check_backoff()
+        with self._lock:
+            if self._instance is None:
+                self._check_backoff()  # another thread's build may have just failed
+                self.status = "warming"
+                start = time.perf_counter()
+                try:
+                    factory = getattr(importlib.import_module(self._module), self._factory)
+                    self._instance = factory()
+                except Exception as e:
+                    self.status = "failed"
+                    self.error = str(e)
+                    self._failed_at = time.monotonic()
+                    print(f"Engine '{self._name}' failed to initialize: {e}")
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.error = self._failed_at = None
+                self.status = "ready"
+                print(f"Engine '{self._name}' ready in {self.load_seconds}s")
+        return self._instance
+
+    def is_ready(self):
+        return self._instance is not None
+
+    def __getattr__(self, attr):
+        # Only called for attributes not found on the proxy itself
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def report(self):
+        report = {"status": self.status}
+        if self.load_seconds is not None:
+            report["load_seconds"] = self.load_seconds
+        if self.error:
+            report["error"] = self.error
+        return report
+
+# Singletons, in warm-up order (the orchestrator needs both data engines)
+micro_engine = LazyEngine("micro", "engine_micro", "MicroEngine")
+macro_engine = LazyEngine("macro", "engine_macro", "MacroEngine")
+orchestrator = LazyEngine("orchestrator", "orchestrator", "AIOrchestrator")
+
+ENGINES = [micro_engine, macro_engine, orchestrator]
+
+async def ensure_ready(*proxies):
+    """
+    Builds the given engines in a worker thread, so a warm-up in progress never holds
+    the event loop (and /health with it). Raises if one cannot be built.
+    """
+    pending = [p for p in proxies if isinstance(p, LazyEngine) and not p.is_ready()]
+    if pending:
+        await asyncio.to_thread(lambda: [p.get() for p in pending])
+
+def warm_up():
+    """Builds every engine in order; failures are recorded on the engine, not raised."""
+    for engine in ENGINES:
+        try:
+            engine.get()
+        except Exception:
+            pass
+
+def start_background_warm_up():
+    thread = threading.Thread(target=warm_up, name="engine-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def process_rss_bytes():
+    """Current resident set size of this process (Linux), or None if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def memory_report():
+    """Bytes per engine (for engines that are built) plus the process RSS."""
+    report = {"process_rss": process_rss_bytes(), "engines": {}}
+    for engine in ENGINES:
+        if engine.is_ready():
+            report["engines"][engine._name] = engine.memory_report()
+        else:
+            report["engines"][engine._name] = {"status": engine.status}
+    return report
+
+def readiness():
+    """Per-engine warm-up status for the readiness endpoint."""
+    return {engine._name: engine.report() for engine in ENGINES}
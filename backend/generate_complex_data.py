@@ -1,6 +1,8 @@
-import pandas as pd
-import random
+import argparse
+import time
+
 import numpy as np
+import pandas as pd
 
 # Constants
 GOVERNORATES = {
@@ -48,53 +50,143 @@ HIERARCHY = {
 YEARS = [2023, 2024, 2025]
 QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
 
-def generate_data():
+COLUMNS = [
+    "Industry", "Sector", "Sub_Sector", "Indicator", "Governorate", "District", "Date", "Year",
+    "Quarter", "Value", "Unit", "Confidence_Score", "Source_Verified", "YoY_Change", "Source_ID",
+]
+CONFIDENCE_LEVELS = ["High", "Medium", "Low"]
+
+# Share of (district, period, indicator) cells left out to test "Dimming" logic,
+# and share of remaining rows without a Source_ID
+SKIP_RATIO = 0.1
+NULL_SOURCE_RATIO = 0.3
+
+# Districts generated (and written) per chunk; each chunk has its own RNG stream, so
+# output depends only on the seed and this value, not on the output format
+CHUNK_DISTRICTS = 200
+
+def indicator_table():
+    """One row per leaf of HIERARCHY with its value multiplier and unit."""
     rows = []
-    
-    for gov, districts in GOVERNORATES.items():
-        for district in districts:
-            for year in YEARS:
-                for quarter in QUARTERS:
-                    # Iterate through Hierarchy
-                    for industry, sectors in HIERARCHY.items():
-                        for sector, sub_sectors in sectors.items():
-                            for sub_sector, indicators in sub_sectors.items():
-                                for indicator in indicators:
-                                    
-                                    # Randomly skip some data to test "Dimming" logic
-                                    if random.random() < 0.1: 
-                                        continue
-
-                                    # Base Value Logic
-                                    base_value = random.uniform(100, 5000)
-                                    if "Price" in indicator: base_value *= 2
-                                    if "Volume" in indicator: base_value *= 10
-                                    
-                                    # YoY Change
-                                    yoy = random.uniform(-15, 25)
-                                    
-                                    row = {
-                                        "Industry": industry,
-                                        "Sector": sector,
-                                        "Sub_Sector": sub_sector,
-                                        "Indicator": indicator,
-                                        "Governorate": gov,
-                                        "District": district,
-                                        "Date": f"{year}-{quarter}",
-                                        "Year": year,
-                                        "Quarter": quarter,
-                                        "Value": round(base_value * (1 + yoy/100), 2),
-                                        "Unit": "EGP" if "Price" in indicator or "Rent" in indicator else "Units",
-                                        "Confidence_Score": random.choice(["High", "Medium", "Low"]),
-                                        "Source_Verified": random.choice([True, False]),
-                                        "YoY_Change": round(yoy, 1),
-                                        "Source_ID": f"SRC-{random.randint(100, 999)}" if random.random() > 0.3 else None
-                                    }
-                                    rows.append(row)
-
-    df = pd.DataFrame(rows)
-    df.to_csv("egypt_complex_micro_data.csv", index=False)
-    print(f"Generated {len(df)} rows of complex data.")
+    for industry, sectors in HIERARCHY.items():
+        for sector, sub_sectors in sectors.items():
+            for sub_sector, indicators in sub_sectors.items():
+                for indicator in indicators:
+                    multiplier = (2 if "Price" in indicator else 1) * (10 if "Volume" in indicator else 1)
+                    unit = "EGP" if "Price" in indicator or "Rent" in indicator else "Units"
+                    rows.append((industry, sector, sub_sector, indicator, multiplier, unit))
+    return pd.DataFrame(rows, columns=["Industry", "Sector", "Sub_Sector", "Indicator", "Multiplier", "Unit"])
+
+def district_table(governorates=None, districts=None, scale=1):
+    """
+    (Governorate, District) pairs. governorates / districts (per governorate) default to
+    the real lists and are padded with synthetic names when larger; scale > 1 adds
+    copies of every district suffixed " #k", as bench_engines does.
+    """
+    names = list(GOVERNORATES)
+    governorates = governorates or len(names)
+    pairs = []
+    for g in range(governorates):
+        gov = names[g] if g < len(names) else f"Governorate {g + 1}"
+        real = GOVERNORATES.get(gov, [])
+        count = len(real) if districts is None else districts
+        pairs += [(gov, real[d] if d < len(real) else f"{gov} District {d + 1}") for d in range(count)]
+    copies = [pairs] + [[(gov, f"{district} #{k}") for gov, district in pairs] for k in range(1, scale)]
+    return [pair for copy in copies for pair in copy]
+
+def _take(column, idx):
+    """Categorical of column[idx] without materializing m Python strings."""
+    cat = pd.Categorical(column)
+    return pd.Categorical.from_codes(cat.codes[idx], categories=cat.categories)
+
+def generate_chunk(pairs, years, indicators, rng):
+    """Vectorized rows for a block of districts: every period x indicator, minus skipped cells."""
+    n_periods = len(years) * len(QUARTERS)
+    n_ind = len(indicators)
+    n = len(pairs) * n_periods * n_ind
+
+    keep = np.flatnonzero(rng.random(n) >= SKIP_RATIO)
+    pair_idx, rest = np.divmod(keep, n_periods * n_ind)
+    period_idx, ind_idx = np.divmod(rest, n_ind)
+    year_idx, quarter_idx = np.divmod(period_idx, len(QUARTERS))
+    m = len(keep)
+
+    base = rng.uniform(100, 5000, m) * indicators["Multiplier"].to_numpy()[ind_idx]
+    yoy = rng.uniform(-15, 25, m)
+    source = rng.integers(100, 1000, m).astype(str)
+    has_source = rng.random(m) > NULL_SOURCE_RATIO
+
+    gov_categories, gov_codes = np.unique([gov for gov, _ in pairs], return_inverse=True)
+    dates = [f"{year}-{quarter}" for year in years for quarter in QUARTERS]
+
+    df = pd.DataFrame({col: _take(indicators[col], ind_idx) for col in ["Industry", "Sector", "Sub_Sector", "Indicator"]})
+    df["Governorate"] = pd.Categorical.from_codes(gov_codes[pair_idx], categories=gov_categories)
+    df["District"] = pd.Categorical.from_codes(pair_idx, categories=pd.Index([district for _, district in pairs]))
+    df["Date"] = pd.Categorical.from_codes(period_idx, categories=pd.Index(dates))
+    df["Year"] = np.asarray(years)[year_idx]
+    df["Quarter"] = pd.Categorical.from_codes(quarter_idx, categories=QUARTERS)
+    df["Value"] = np.round(base * (1 + yoy / 100), 2)
+    df["Unit"] = _take(indicators["Unit"], ind_idx)
+    df["Confidence_Score"] = pd.Categorical.from_codes(rng.integers(0, 3, m), categories=CONFIDENCE_LEVELS)
+    df["Source_Verified"] = rng.integers(0, 2, m).astype(bool)
+    df["YoY_Change"] = np.round(yoy, 1)
+    df["Source_ID"] = np.where(has_source, np.char.add("SRC-", source), None)
+    return df
+
+def generate_frames(seed=0, scale=1, governorates=None, districts=None, years=None, chunk_districts=CHUNK_DISTRICTS):
+    """Yields the dataset as DataFrames of at most chunk_districts districts each."""
+    years = list(years or YEARS)
+    indicators = indicator_table()
+    pairs = district_table(governorates, districts, scale)
+    for i, start in enumerate(range(0, len(pairs), chunk_districts)):
+        rng = np.random.default_rng([seed, i])
+        yield generate_chunk(pairs[start:start + chunk_districts], years, indicators, rng)
+
+def write_frames(frames, path, fmt=None):
+    """Streams chunks to CSV or Parquet (by extension unless fmt is given); returns rows written."""
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    rows = 0
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        writer = None
+        try:
+            for df in frames:
+                # Plain strings so every chunk shares one schema regardless of its categories
+                table = pa.Table.from_pandas(df.astype({c: str for c in df.select_dtypes("category")}), preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += len(df)
+        finally:
+            if writer:
+                writer.close()
+        return rows
+
+    with open(path, "w", newline="") as f:
+        for df in frames:
+            df.to_csv(f, index=False, header=rows == 0)
+            rows += len(df)
+    return rows
+
+def generate_data(output="egypt_complex_micro_data.csv", seed=0, scale=1, governorates=None, districts=None,
+                  years=None, fmt=None):
+    start = time.perf_counter()
+    rows = write_frames(generate_frames(seed, scale, governorates, districts, years), output, fmt)
+    print(f"Generated {rows} rows of complex data in {time.perf_counter() - start:.1f}s -> {output}")
+    return rows
 
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(description="Generates synthetic complex micro data.")
+    parser.add_argument("--output", default="egypt_complex_micro_data.csv", help="CSV or .parquet path")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Defaults to the output extension")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=int, default=1, help="Copies of every district")
+    parser.add_argument("--governorates", type=int, help="Default: the 5 real governorates")
+    parser.add_argument("--districts", type=int, help="Districts per governorate (default: the real lists)")
+    parser.add_argument("--years", type=int, help="Number of years ending in 2025 (default: 3)")
+    args = parser.parse_args()
+    years = list(range(YEARS[-1] - args.years + 1, YEARS[-1] + 1)) if args.years else None
+    generate_data(args.output, args.seed, args.scale, args.governorates, args.districts, years, args.format)
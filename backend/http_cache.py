@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import json
+import threading
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compression would not pay for itself
+COMPRESS_MIN_BYTES = 1024
+
+def json_bytes(content):
+    """Encodes a response body, with orjson when available (NaN -> null, numpy scalars allowed)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class CachedBody:
+    """One encoded response body with its compressed variants and their strong ETags."""
+    def __init__(self, content):
+        self.body = json_bytes(content)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        # Content hash, so every worker serving the same data hands out the same tags
+        self.variants = {"identity": (self.body, f'"{digest}"')}
+        if len(self.body) >= COMPRESS_MIN_BYTES:
+            self.variants["gzip"] = (gzip.compress(self.body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(self.body), f'"{digest}-br"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    def matches(self, if_none_match):
+        if not if_none_match:
+            return False
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or bool(tags & self.etags)
+
+    def negotiate(self, accept_encoding):
+        """Picks br, then gzip, then identity according to Accept-Encoding (q=0 excludes)."""
+        accepted = set()
+        for part in (accept_encoding or "").lower().split(","):
+            coding, _, params = part.strip().partition(";")
+            if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(coding)
+        for coding in ("br", "gzip"):
+            if coding in self.variants and (coding in accepted or "*" in accepted):
+                return coding
+        return "identity"
+
+class VersionedResponseCache:
+    """
+    JSON bodies built once per (key, data version) and served with ETag / 304 and
+    precompressed variants. A new version (e.g. after a reload) rebuilds on the next request.
+    """
+    def __init__(self):
+        self.entries = {}  # key -> (version, CachedBody)
+        self.lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, key, version, build):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                entry = (version, CachedBody(build()))
+                self.entries[key] = entry
+                self.builds += 1
+        return entry[1]
+
+    def respond(self, request, key, version, build):
+        cached = self.get(key, version, build)
+        # no-cache: clients keep the body but revalidate, so a reload is seen immediately
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        coding = cached.negotiate(request.headers.get("accept-encoding"))
+        body, etag = cached.variants[coding]
+        headers["ETag"] = etag
+
+        if cached.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,157 @@
+import math
+import os
+import re
+import threading
+
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+from metrics import INTENT_ROUTES
+
+# Below this confidence the query is sent to the Gemini router
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", 0.7))
+
+# Gazetteer placeholders: known entities are replaced before scoring, so the model
+# generalizes to every district/indicator instead of the ones in the seed examples
+DISTRICT_TOKEN = "__district__"
+INDICATOR_TOKEN = "__indicator__"
+
+# Extra surface forms for the macro INDICATORS keys
+INDICATOR_ALIASES = ["gdp", "cpi", "interest rate", "interest rates", "economic growth", "exchange rate", "devaluation"]
+
+# Labelled seed queries ({d} = any district, {i} = any macro indicator)
+SEED_EXAMPLES = [
+    ("what is the {i} in egypt", "MACRO"),
+    ("how is the {i} trending", "MACRO"),
+    ("is it a good time to invest in egypt", "MACRO"),
+    ("is now a good time to invest", "MACRO"),
+    ("what is the investment climate", "MACRO"),
+    ("show me the latest {i} figures", "MACRO"),
+    ("how did {i} change over the last five years", "MACRO"),
+    ("will the {i} go up next year", "MACRO"),
+    ("explain the economic outlook for egypt", "MACRO"),
+    ("market trends in the egyptian economy", "MACRO"),
+    ("compare {i} and {i}", "MACRO"),
+    ("what share of gdp comes from {i}", "MACRO"),
+    ("national economic indicators summary", "MACRO"),
+    ("what is the rent in {d}", "MICRO"),
+    ("average rent per sqm in {d}", "MICRO"),
+    ("foot traffic in {d}", "MICRO"),
+    ("how many competitors are in {d}", "MICRO"),
+    ("which district has the highest foot traffic", "MICRO"),
+    ("cheapest rent locations in cairo", "MICRO"),
+    ("compare rent in {d} and {d}", "MICRO"),
+    ("best location for a shop with low competition", "MICRO"),
+    ("districts with rent under 300 and high traffic", "MICRO"),
+    ("competitor density in {d}", "MICRO"),
+    ("where should i open a store based on foot traffic", "MICRO"),
+    ("show vacancy rate for {d}", "MICRO"),
+    ("list districts with low competitor density", "MICRO"),
+    ("tell me about {d}", "MICRO"),
+    ("is it feasible to open a cafe in {d} given {i}", "HYBRID"),
+    ("feasibility of a restaurant in {d} with current {i}", "HYBRID"),
+    ("should i open a shop in {d} considering the economy", "HYBRID"),
+    ("how does {i} affect rent in {d}", "HYBRID"),
+    ("will {i} make {d} rents rise", "HYBRID"),
+    ("is {d} a good investment given {i}", "HYBRID"),
+    ("impact of {i} on retail in {d}", "HYBRID"),
+    ("best district to invest in given the economic outlook", "HYBRID"),
+    ("open a store in {d} with high {i}", "HYBRID"),
+    ("hello", "GENERAL"),
+    ("hi there", "GENERAL"),
+    ("hey", "GENERAL"),
+    ("thanks", "GENERAL"),
+    ("thank you very much", "GENERAL"),
+    ("who are you", "GENERAL"),
+    ("what can you do", "GENERAL"),
+    ("good morning", "GENERAL"),
+    ("help", "GENERAL"),
+    ("tell me a joke", "GENERAL"),
+    ("what is the weather today", "GENERAL"),
+    ("how do i reset my password", "GENERAL"),
+]
+
+class LocalIntentClassifier:
+    """
+    Fast local router for MACRO/MICRO/HYBRID/GENERAL.
+    A gazetteer swaps district and indicator names for placeholder tokens, then a
+    logistic regression over binary word n-grams scores the query. Inference is a
+    dictionary lookup plus a softmax, so it runs in microseconds.
+    """
+    def __init__(self, districts, indicators):
+        self.district_pattern = self._compile(districts)
+        self.indicator_pattern = self._compile(
+            [name.replace("_gdp", "").replace("_", " ") for name in indicators] + INDICATOR_ALIASES
+        )
+        self.stats = {"local": 0, "fallback": 0}
+        self.stats_lock = threading.Lock()
+        self._train()
+
+    def set_districts(self, districts):
+        """Swaps the district gazetteer; the model only sees the placeholder, so no retraining."""
+        self.district_pattern = self._compile(districts)
+
+    @staticmethod
+    def _compile(names):
+        names = sorted({str(n).lower().strip() for n in names if str(n).strip()}, key=len, reverse=True)
+        if not names:
+            return None
+        return re.compile(r"\b(" + "|".join(re.escape(n) for n in names) + r")\b")
+
+    def normalize(self, query):
+        text = str(query).lower()
+        if self.district_pattern is not None:
+            text = self.district_pattern.sub(f" {DISTRICT_TOKEN} ", text)
+        if self.indicator_pattern is not None:
+            text = self.indicator_pattern.sub(f" {INDICATOR_TOKEN} ", text)
+        return text
+
+    def _train(self):
+        texts, labels = [], []
+        for template, label in SEED_EXAMPLES:
+            texts.append(self.normalize(template.replace("{d}", DISTRICT_TOKEN).replace("{i}", INDICATOR_TOKEN)))
+            labels.append(label)
+
+        vectorizer = CountVectorizer(binary=True, ngram_range=(1, 2))
+        features = vectorizer.fit_transform(texts)
+        model = LogisticRegression(C=10.0, max_iter=2000)
+        model.fit(features, labels)
+
+        # Keep only what inference needs: n-gram -> per-class weights
+        self.analyzer = vectorizer.build_analyzer()
+        self.classes = list(model.classes_)
+        coef = model.coef_.T
+        self.weights = {term: coef[idx].tolist() for term, idx in vectorizer.vocabulary_.items()}
+        self.intercept = model.intercept_.tolist()
+
+    def predict(self, query):
+        """Returns (intent, confidence) for a query."""
+        logits = list(self.intercept)
+        matched = 0
+        for term in set(self.analyzer(self.normalize(query))):
+            weights = self.weights.get(term)
+            if weights:
+                matched += 1
+                for k, w in enumerate(weights):
+                    logits[k] += w
+
+        # Nothing recognised: the prior alone is not evidence, let the fallback decide
+        if not matched:
+            return "GENERAL", 0.0
+
+        top = max(logits)
+        exps = [math.exp(l - top) for l in logits]
+        best = exps.index(max(exps))
+        return str(self.classes[best]), exps[best] / sum(exps)
+
+    def record(self, used_fallback):
+        route = "fallback" if used_fallback else "local"
+        with self.stats_lock:
+            self.stats[route] += 1
+        INTENT_ROUTES.inc(route=route)
+
+    def report(self):
+        return {**self.stats, "fallback_rate": round(self.fallback_rate(), 4)}
+
+    def fallback_rate(self):
+        total = self.stats["local"] + self.stats["fallback"]
+        return self.stats["fallback"] / total if total else 0.0
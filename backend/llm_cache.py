@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from metrics import LLM_CACHE_LOOKUPS
+
+# Configuration (env overridable)
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 3600))
+# Near-duplicate tier: cosine similarity needed to reuse a paraphrased query's answer (0 disables)
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", 0))
+
+def normalize_query(query):
+    """Lowercases and collapses whitespace/trailing punctuation so trivial variants share a key."""
+    return re.sub(r"\s+", " ", str(query).lower()).strip().rstrip("?!. ")
+
+def stable_hash(value):
+    """Order-independent hash of JSON-like data (e.g. dashboard_context)."""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseCache:
+    """
+    LRU + TTL cache for model responses with a byte budget.
+    Entries are keyed by the normalized query plus the other prompt inputs (the "scope").
+    An optional near-duplicate tier matches paraphrased queries within the same scope
+    using a TF-IDF vectorizer supplied by get_vectorizer.
+    """
+    def __init__(self, max_bytes=LLM_CACHE_MAX_BYTES, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                 similarity_threshold=LLM_CACHE_SIMILARITY, get_vectorizer=None):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.get_vectorizer = get_vectorizer
+        self.entries = OrderedDict()  # key -> (value, expires_at, size, scope)
+        self.similar = {}             # scope -> {key: query vector}
+        self.bytes_used = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0}
+
+    def _keys(self, query, parts):
+        scope = stable_hash(parts)
+        key = stable_hash({"query": normalize_query(query), "scope": scope})
+        return key, scope
+
+    def key_for(self, query, **parts):
+        """Exact cache key for these prompt inputs (also used to coalesce in-flight calls)."""
+        return self._keys(query, parts)[0]
+
+    def _vectorize(self, query):
+        if not self.similarity_threshold or not self.get_vectorizer:
+            return None
+        vectorizer = self.get_vectorizer()
+        if vectorizer is None:
+            return None
+        try:
+            vec = vectorizer.transform([normalize_query(query)])
+        except Exception:
+            return None
+        return vec if vec.nnz else None
+
+    def get(self, query, fuzzy=True, **parts):
+        """
+        Returns the cached value for these prompt inputs, or None.
+        fuzzy=False skips the near-duplicate tier (for inputs where small textual changes matter).
+        """
+        key, scope = self._keys(query, parts)
+        with self.lock:
+            value = self._get_live(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                LLM_CACHE_LOOKUPS.inc(result="hit")
+                return value
+
+        vec = self._vectorize(query) if fuzzy else None
+        with self.lock:
+            if vec is not None:
+                best_key, best_score = None, self.similarity_threshold
+                for other_key, other_vec in self.similar.get(scope, {}).items():
+                    score = vec.multiply(other_vec).sum()  # TF-IDF rows are L2-normalized
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    value = self._get_live(best_key)
+                    if value is not None:
+                        self.stats["near_hits"] += 1
+                        LLM_CACHE_LOOKUPS.inc(result="near_hit")
+                        return value
+            self.stats["misses"] += 1
+            LLM_CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+    def put(self, value, query, fuzzy=True, **parts):
+        key, scope = self._keys(query, parts)
+        size = len(str(value).encode())
+        if size > self.max_bytes:
+            return
+        vec = self._vectorize(query) if fuzzy else None
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (value, time.monotonic() + self.ttl_seconds, size, scope)
+            self.bytes_used += size
+            if vec is not None:
+                self.similar.setdefault(scope, {})[key] = vec
+            while self.bytes_used > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.similar.clear()
+            self.bytes_used = 0
+
+    def _get_live(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes_used -= entry[2]
+        scoped = self.similar.get(entry[3])
+        if scoped is not None:
+            scoped.pop(key, None)
+            if not scoped:
+                del self.similar[entry[3]]
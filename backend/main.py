@@ -1,7 +1,26 @@
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import engines
+import metrics
+from http_cache import VersionedResponseCache, json_bytes
+from paging import DATA_PAGE_SIZE, DATA_MAX_PAGE_SIZE, CursorExpired
 
-app = FastAPI(title="Egypt Market Intelligence AI", version="1.0.0")
+# Per-request diagnostics log at DEBUG; LOG_LEVEL=DEBUG brings them back
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Bind the port immediately; engines (data load, TF-IDF, Gemini client) warm up in the background
+    engines.start_background_warm_up()
+    yield
+
+app = FastAPI(title="Egypt Market Intelligence AI", version="1.0.0", lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -11,14 +30,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson when available (NaN -> null, numpy scalars allowed)."""
+    def render(self, content):
+        return json_bytes(content)
 
-from pydantic import BaseModel
-from orchestrator import orchestrator
-from auth import auth_router, get_current_user, User
-from fastapi import Depends, HTTPException
-from engine_micro import micro_engine
-from engine_macro import macro_engine
-from typing import List, Optional, Dict
+# Dashboard metadata bodies, rebuilt only when the micro / macro data version changes
+metadata_cache = VersionedResponseCache()
+
+from pydantic import BaseModel, Field
+from auth import auth_router, get_admin_user, get_current_user, User
+from fastapi import Depends, HTTPException, Request
+from engines import micro_engine, macro_engine, orchestrator
+from typing import List, Optional, Dict, Union
 
 # Include Auth Router
 app.include_router(auth_router, prefix="/api")
@@ -27,6 +53,7 @@ class QueryRequest(BaseModel):
     text: str
     dashboard_context: Optional[Dict] = None
     simulation_mode: Optional[bool] = False
+    single_call: Optional[bool] = None  # None -> SINGLE_CALL_ROUTING default
 
 class DataFilters(BaseModel):
     districts: Optional[List[str]] = None
@@ -38,56 +65,197 @@ class DataFilters(BaseModel):
 
 class DataRequest(BaseModel):
     filters: DataFilters
+    fields: Optional[List[str]] = None  # projection; None -> every public column
+    sort_by: Optional[str] = None
+    descending: bool = False
+    limit: int = Field(DATA_PAGE_SIZE, ge=1, le=DATA_MAX_PAGE_SIZE)
+    cursor: Optional[str] = None  # next_cursor from the previous page
+
+async def require_engines():
+    """For async handlers: wait for the engines off the event loop, 503 if they failed to build."""
+    try:
+        await engines.ensure_ready(micro_engine, macro_engine, orchestrator)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Engines unavailable: {e}")
 
 @app.post("/api/query")
-def query_ai(request: QueryRequest, current_user: User = Depends(get_current_user)):
-    result = orchestrator.process_query(
+async def query_ai(request: QueryRequest, current_user: User = Depends(get_current_user)):
+    await require_engines()
+    result = await orchestrator.aprocess_query(
         request.text, 
         user_industry=current_user.industry,
         dashboard_context=request.dashboard_context,
-        simulation_mode=request.simulation_mode
+        simulation_mode=request.simulation_mode,
+        single_call=request.single_call
     )
     return result
 
+def format_sse(event, payload):
+    """Formats one Server-Sent Event; numpy scalars in data_context are unwrapped."""
+    data = json.dumps(payload, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.post("/api/query/stream")
+def query_ai_stream(request: QueryRequest, current_user: User = Depends(get_current_user)):
+    """
+    Streaming variant of /api/query (SSE): a 'context' event with intent and data_context,
+    then 'token' events as the answer is generated, then 'done'.
+    """
+    events = orchestrator.stream_query(
+        request.text,
+        user_industry=current_user.industry,
+        dashboard_context=request.dashboard_context,
+        simulation_mode=request.simulation_mode
+    )
+    return StreamingResponse(
+        (format_sse(event, payload) for event, payload in events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/macro/sectors")
-async def get_macro_sectors():
+def get_macro_sectors(request: Request):
     try:
-        print("Endpoint /api/macro/sectors called")
-        data = macro_engine.get_sector_data()
-        print(f"Got data: {len(data)} sectors")
-        return {"sectors": data}
+        # Keeps the stale-while-revalidate refresh; a cold cache still waits for the first fetch
+        macro_engine.get_macro_summary()
+        version = macro_engine.version
+        return metadata_cache.respond(request, "macro_sectors", version, lambda: {"sectors": macro_engine.get_sector_data()})
     except Exception as e:
-        print(f"Error in /api/macro/sectors: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in /api/macro/sectors: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/data")
 def get_filtered_data(request: DataRequest, current_user: User = Depends(get_current_user)):
     """
-    Returns filtered market data for the dashboard.
+    Returns one page of filtered market data for the dashboard.
+    Follow next_cursor for the remaining rows; a cursor from before a data reload gets 410.
+    The page is returned as a ready Response, bypassing FastAPI's per-row encoding pass.
+    """
+    try:
+        page = micro_engine.query_page(
+            request.filters.dict(),
+            fields=request.fields,
+            sort_by=request.sort_by,
+            descending=request.descending,
+            limit=request.limit,
+            cursor=request.cursor,
+        )
+    except CursorExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(page)
+
+class CubeRequest(BaseModel):
+    group_by: List[str] = []
+    filters: Dict[str, Union[str, int, List[Union[str, int]]]] = {}
+    measures: Optional[List[str]] = None  # None -> sum, mean, count, min, max
+    limit: int = Field(1000, ge=1, le=10000)
+
+@app.get("/api/cube")
+def get_cube_dimensions(request: Request):
+    """Cube hierarchies, level members and measures, for building drill-down UIs."""
+    if micro_engine.state.cube is None:
+        raise HTTPException(status_code=503, detail="Metric cube unavailable for the current data source")
+    return metadata_cache.respond(request, "cube", micro_engine.data_version, micro_engine.cube_dimensions)
+
+@app.post("/api/cube/query")
+def query_cube(request: CubeRequest, current_user: User = Depends(get_current_user)):
+    """
+    Aggregates (sum, mean, count, min, max of Value) grouped by any mix of
+    Governorate/District, Industry/Sector/Sub_Sector/Indicator and Year/Quarter,
+    filtered by member labels. Answered from precomputed rollups.
     """
-    data = micro_engine.filter_data(request.filters.dict())
-    return {"data": data}
+    try:
+        result = micro_engine.query_cube(request.group_by, request.filters, request.measures, request.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=503, detail="Metric cube unavailable for the current data source")
+    return FastJSONResponse(result)
+
+class ScenarioRequest(BaseModel):
+    shocks: Dict[str, float] = {}  # change per shock: percentage points, exchange_rate in % depreciation
+    levels: Dict[str, float] = {}  # target level (e.g. inflation 40), relative to the current macro value
+
+class ScenarioGridRequest(BaseModel):
+    axes: Dict[str, List[float]]  # shock -> values; every combination is one scenario
+
+class MonteCarloRequest(BaseModel):
+    distributions: Dict[str, Dict[str, float]]  # shock -> {"mean", "std"} or {"low", "high"}
+    samples: int = Field(1000, ge=1)
+    seed: Optional[int] = None
+
+@app.post("/api/scenario")
+def run_scenario(request: ScenarioRequest, current_user: User = Depends(get_current_user)):
+    """Current vs projected rent, sale price and foot traffic per district under macro shocks."""
+    try:
+        return FastJSONResponse(orchestrator.scenario_engine().run(request.shocks, request.levels))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/scenario/grid")
+def run_scenario_grid(request: ScenarioGridRequest, current_user: User = Depends(get_current_user)):
+    """Aggregate outcome of every combination of the given shock values."""
+    try:
+        return FastJSONResponse(orchestrator.scenario_engine().grid(request.axes))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/scenario/monte-carlo")
+def run_scenario_monte_carlo(request: MonteCarloRequest, current_user: User = Depends(get_current_user)):
+    """5th / 50th / 95th percentile of each district's projected values over sampled shocks."""
+    try:
+        return FastJSONResponse(orchestrator.scenario_engine().monte_carlo(request.distributions, request.samples, request.seed))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 class InsightRequest(BaseModel):
     filters: Dict
     data_summary: str
 
 @app.post("/api/ai/insight")
-def get_ai_insight(request: InsightRequest):
+async def get_ai_insight(request: InsightRequest):
     """Generates a proactive AI insight based on current context."""
-    insight = orchestrator.generate_proactive_insight(request.filters, request.data_summary)
+    await require_engines()
+    insight = await orchestrator.agenerate_proactive_insight(request.filters, request.data_summary)
     return {"insight": insight}
 
+@app.get("/api/ai/router-stats")
+def get_router_stats():
+    """Reports how often intent routing stayed local vs fell back to Gemini."""
+    return orchestrator.intent_classifier.report()
+
+@app.get("/api/ai/prompt-stats")
+def get_prompt_stats():
+    """Reports answer prompt sizes (estimated tokens) against the configured budget."""
+    return orchestrator.prompt_builder.report()
+
+@app.post("/api/admin/reload-micro")
+def reload_micro_data(current_user: User = Depends(get_admin_user)):
+    """
+    Re-reads the micro data source and swaps the new data in atomically.
+    Runs in the threadpool, so queries keep being served from the current data meanwhile.
+    """
+    return micro_engine.reload()
+
+@app.get("/api/admin/memory")
+def get_memory_report(current_user: User = Depends(get_admin_user)):
+    """Bytes held per engine (data frames, indexes, cube, caches) and the process RSS."""
+    return engines.memory_report()
+
 @app.get("/api/districts")
-def get_districts():
+def get_districts(request: Request):
     """Returns mapping of Governorate -> Districts."""
-    return {"districts": micro_engine.get_all_districts()}
+    return metadata_cache.respond(
+        request, "districts", micro_engine.data_version, lambda: {"districts": micro_engine.get_all_districts()})
 
 @app.get("/api/hierarchy")
-def get_hierarchy():
+def get_hierarchy(request: Request):
     """Returns the full data hierarchy tree."""
+    return metadata_cache.respond(request, "hierarchy", micro_engine.data_version, build_hierarchy)
+
+def build_hierarchy():
     # 1. Get Micro Data Hierarchy (Dynamic)
     micro_tree = micro_engine.get_hierarchy_tree()
 
@@ -119,6 +287,19 @@ if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint: stage, request, cache, World Bank and data-load metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health_check():
+    """Liveness only: does not touch (or wait for) the engines."""
     return {"status": "healthy"}
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 200 once every engine has warmed up, 503 with per-engine status before that."""
+    report = engines.readiness()
+    ready = all(engine["status"] == "ready" for engine in report.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "engines": report})
@@ -0,0 +1,149 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans from sub-millisecond lookups to multi-second model calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_str(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    kind = "counter"
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [(self.name, key, (), value) for key, value in items]
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            items = [(key, list(series)) for key, series in self.series.items()]
+        out = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                out.append((f"{self.name}_bucket", key, (("le", _number(bound)),), count))
+            out.append((f"{self.name}_sum", key, (), series[-2]))
+            out.append((f"{self.name}_count", key, (), series[-1]))
+        return out
+
+def render():
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, extra, value in metric.samples():
+            pairs = list(zip(metric.labelnames, key)) + list(extra)
+            lines.append(f"{name}{_label_str(pairs)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+# --- Application metrics ---
+
+STAGE_SECONDS = Histogram(
+    "query_stage_seconds", "Time spent per /api/query pipeline stage.", ["stage"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+LLM_CACHE_LOOKUPS = Counter(
+    "llm_cache_lookups_total", "Response cache lookups by result (hit, near_hit, miss).", ["result"])
+INTENT_ROUTES = Counter(
+    "intent_routes_total", "Intent classifications answered locally vs by the model.", ["route"])
+PROMPT_TOKENS = Histogram(
+    "prompt_tokens", "Estimated tokens per answer prompt.", buckets=TOKEN_BUCKETS)
+WORLDBANK_FETCH_SECONDS = Histogram(
+    "worldbank_fetch_seconds", "World Bank indicator fetch latency by outcome.", ["status"])
+DATA_LOAD_SECONDS = Histogram(
+    "data_load_seconds", "Time to (re)load an engine's data.", ["source"])
+
+def span(stage):
+    """Times one pipeline stage (intent, macro, micro, scenario, prompt, generate)."""
+    return STAGE_SECONDS.time(stage=stage)
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP_REQUEST_SECONDS per route template (not raw path)."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status[0],
+            )
@@ -1,58 +1,230 @@
 import os
+import re
+import json
+import asyncio
+import logging
 import google.generativeai as genai
 from dotenv import load_dotenv
-from engine_macro import macro_engine
-from engine_micro import micro_engine
+from engine_macro import INDICATORS
+from engines import micro_engine, macro_engine
+from intent_classifier import LocalIntentClassifier, INTENT_CONFIDENCE_THRESHOLD
+from llm_cache import ResponseCache, stable_hash
+from prompt_builder import PromptBuilder
+from scenario import ScenarioEngine, parse_shocks
+from metrics import span
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configure Gemini
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+# Opt-in: when the local router is unsure, route and answer in one model call
+SINGLE_CALL_ROUTING = os.getenv("SINGLE_CALL_ROUTING", "false").lower() == "true"
+
+# Max concurrent model calls per call type on the async path (env overridable)
+LLM_CONCURRENCY = {
+    kind: int(os.getenv(f"LLM_CONCURRENCY_{kind.upper()}", default))
+    for kind, default in {"intent": 16, "answer": 16, "route_answer": 16, "insight": 8}.items()
+}
+
+VALID_INTENTS = ["MACRO", "MICRO", "HYBRID", "GENERAL"]
+
+ROUTER_CATEGORIES = """
+        - MACRO: Questions about national economic indicators (Inflation, GDP), investment climate, market trends, or "is it a good time to invest".
+        - MICRO: Questions about specific locations, rent prices, foot traffic, or local competitors in Cairo.
+        - HYBRID: Questions that combine both macro economic factors and specific local business feasibility (e.g., "feasibility of a cafe in Maadi given inflation").
+        - GENERAL: Greetings or out-of-scope questions.
+"""
+
+ROUTE_AND_ANSWER_INSTRUCTION = f"""
+        First classify the User Query into exactly one of these categories:
+        {ROUTER_CATEGORIES}
+        Then answer it using only the Context Data relevant to that category (MACRO data for MACRO, MICRO data for MICRO, both for HYBRID, none for GENERAL).
+
+        Return ONLY a JSON object of the form:
+        {{"intent": "<MACRO|MICRO|HYBRID|GENERAL>", "answer": "<your answer in Markdown>"}}
+"""
+
 class AIOrchestrator:
     def __init__(self):
         # Updated to use a valid available model
         self.model = genai.GenerativeModel('gemini-2.0-flash')
+        # Memoizes model responses; the near-duplicate tier reuses the micro TF-IDF vectorizer
+        self.cache = ResponseCache(get_vectorizer=lambda: micro_engine.vectorizer)
+        # Local fast path; Gemini is only asked when this is unsure
+        self.intent_classifier = LocalIntentClassifier(micro_engine.get_all_districts(), INDICATORS)
+        self._classifier_version = micro_engine.data_version  # micro data its district names come from
+        # Renders context as compact tables within PROMPT_TOKEN_BUDGET and counts prompt tokens
+        self.prompt_builder = PromptBuilder()
+        # Async path: one semaphore per call type, and in-flight model calls shared by identical requests
+        self._semaphores = {}
+        self._inflight = {}
+        # (data version, ScenarioEngine) for simulation mode and the scenario endpoints
+        self._scenario = (None, None)
+
+    def memory_report(self):
+        """Bytes held by the response cache (the only per-process state that grows)."""
+        return {
+            "llm_cache": self.cache.bytes_used,
+            "llm_cache_entries": len(self.cache.entries),
+            "total": self.cache.bytes_used,
+        }
+
+    def data_version(self):
+        """Identifies the data behind an answer so cached responses expire when it changes."""
+        # macro version, not last_fetch: a refresh that changed nothing keeps cached answers
+        return f"{micro_engine.data_version}:{macro_engine.version}"
+
+    def scenario_engine(self):
+        """What-if model over the current micro table and macro levels; rebuilt when either changes."""
+        macro_summary = macro_engine.get_macro_summary()
+        version, engine = self._scenario
+        if engine is None or version != self.data_version():
+            version = self.data_version()
+            engine = ScenarioEngine(micro_engine.df, macro_summary)
+            self._scenario = (version, engine)
+        return engine
+
+    def simulate(self, query, districts=()):
+        """
+        Projection for the shocks named in a what-if query, or None when it names none.
+        Per-district rows only for `districts` (the ones the query is about); the
+        summary covers all of them.
+        """
+        deltas, levels = parse_shocks(query)
+        if not deltas and not levels:
+            return None
+        try:
+            return self.scenario_engine().run(deltas, levels, districts=list(districts))
+        except ValueError as e:
+            logger.warning("Scenario not computed for %r: %s", query, e)
+            return None
+
+    def _generate(self, prompt, query, fuzzy=True, generation_config=None, **key_parts):
+        """Calls the model unless the same prompt inputs were answered recently."""
+        cached = self.cache.get(query, fuzzy=fuzzy, **key_parts)
+        if cached is not None:
+            return cached
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        with span("generate"):
+            text = self.model.generate_content(prompt, **kwargs).text
+        self.cache.put(text, query, fuzzy=fuzzy, **key_parts)
+        return text
+
+    async def _agenerate(self, prompt, query, fuzzy=True, generation_config=None, **key_parts):
+        """
+        Async _generate: bounded by the call type's semaphore, and concurrent identical
+        requests are coalesced into one in-flight model call whose result is shared.
+        """
+        cached = self.cache.get(query, fuzzy=fuzzy, **key_parts)
+        if cached is not None:
+            return cached
+
+        key = self.cache.key_for(query, **key_parts)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._acall_model(prompt, query, fuzzy, generation_config, key_parts))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one caller disconnecting must not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+    async def _acall_model(self, prompt, query, fuzzy, generation_config, key_parts):
+        kind = key_parts.get("kind", "answer")
+        if kind not in self._semaphores:
+            self._semaphores[kind] = asyncio.Semaphore(LLM_CONCURRENCY.get(kind, 8))
+
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        async with self._semaphores[kind]:
+            with span("generate"):
+                response = await self.model.generate_content_async(prompt, **kwargs)
+        text = response.text
+        self.cache.put(text, query, fuzzy=fuzzy, **key_parts)
+        return text
 
     def classify_intent(self, query):
         """
-        Uses Gemini to classify the user's intent.
+        Classifies the user's intent locally, falling back to Gemini when the local
+        classifier's confidence is below INTENT_CONFIDENCE_THRESHOLD.
         """
-        prompt = f"""
+        with span("intent"):
+            return self._classify_intent(query)
+
+    def _classify_intent(self, query):
+        intent, confidence = self._predict_intent(query)
+        if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            self.intent_classifier.record(used_fallback=False)
+            return intent
+
+        self.intent_classifier.record(used_fallback=True)
+        try:
+            return self._parse_intent(self._generate(self._intent_prompt(query), query, kind="intent"))
+        except Exception as e:
+            logger.warning("Gemini intent error: %s", e)
+            return "GENERAL"
+
+    def _predict_intent(self, query):
+        """Local (intent, confidence), with the classifier's district names kept in step with the micro data."""
+        version = micro_engine.data_version
+        if version != self._classifier_version:
+            self.intent_classifier.set_districts(micro_engine.get_all_districts())
+            self._classifier_version = version
+        return self.intent_classifier.predict(query)
+
+    async def aclassify_intent(self, query):
+        """Async classify_intent."""
+        with span("intent"):
+            return await self._aclassify_intent(query)
+
+    async def _aclassify_intent(self, query):
+        intent, confidence = self._predict_intent(query)
+        if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            self.intent_classifier.record(used_fallback=False)
+            return intent
+
+        self.intent_classifier.record(used_fallback=True)
+        try:
+            return self._parse_intent(await self._agenerate(self._intent_prompt(query), query, kind="intent"))
+        except Exception as e:
+            logger.warning("Gemini intent error: %s", e)
+            return "GENERAL"
+
+    @staticmethod
+    def _intent_prompt(query):
+        return f"""
         You are an AI router for an Egypt Market Intelligence platform.
         Classify the following user query into exactly one of these categories:
-        - MACRO: Questions about national economic indicators (Inflation, GDP), investment climate, market trends, or "is it a good time to invest".
-        - MICRO: Questions about specific locations, rent prices, foot traffic, or local competitors in Cairo.
-        - HYBRID: Questions that combine both macro economic factors and specific local business feasibility (e.g., "feasibility of a cafe in Maadi given inflation").
-        - GENERAL: Greetings or out-of-scope questions.
-
+        {ROUTER_CATEGORIES}
         Query: "{query}"
         
         Return ONLY the category name (MACRO, MICRO, HYBRID, or GENERAL).
         """
-        try:
-            response = self.model.generate_content(prompt)
-            intent = response.text.strip().upper()
-            # Fallback cleanup in case of extra text
-            for valid in ["MACRO", "MICRO", "HYBRID", "GENERAL"]:
-                if valid in intent:
-                    return valid
-            return "GENERAL"
-        except Exception as e:
-            print(f"Gemini Intent Error: {e}")
-            return "GENERAL"
 
-    def process_query(self, query, user_industry="General", dashboard_context=None, simulation_mode=False):
+    @staticmethod
+    def _parse_intent(text):
+        intent = text.strip().upper()
+        # Fallback cleanup in case of extra text
+        for valid in VALID_INTENTS:
+            if valid in intent:
+                return valid
+        return "GENERAL"
+
+    def process_query(self, query, user_industry="General", dashboard_context=None, simulation_mode=False, single_call=None):
+        if single_call is None:
+            single_call = SINGLE_CALL_ROUTING
+
+        if single_call:
+            _, confidence = self._predict_intent(query)
+            if confidence < INTENT_CONFIDENCE_THRESHOLD:
+                return self.route_and_answer(query, user_industry, dashboard_context, simulation_mode)
+
         intent = self.classify_intent(query)
-        context = {}
         
         # 1. Retrieve Data (Legacy / Fallback)
-        if intent in ["MACRO", "HYBRID"]:
-            context['macro'] = macro_engine.get_macro_summary()
-        
-        if intent in ["MICRO", "HYBRID"]:
-            context['micro'] = micro_engine.search(query)
+        context = self.retrieve_context(query, intent, simulation_mode)
 
         # 2. Generate Response using Gemini with State Injection
         response_text = self.generate_llm_response(query, intent, context, user_industry, dashboard_context, simulation_mode)
@@ -63,32 +235,239 @@ class AIOrchestrator:
             "data_context": context 
         }
 
+    async def aprocess_query(self, query, user_industry="General", dashboard_context=None, simulation_mode=False, single_call=None):
+        """Async process_query: holds no worker thread while waiting on the model."""
+        if single_call is None:
+            single_call = SINGLE_CALL_ROUTING
+
+        if single_call:
+            _, confidence = self._predict_intent(query)
+            if confidence < INTENT_CONFIDENCE_THRESHOLD:
+                return await self.aroute_and_answer(query, user_industry, dashboard_context, simulation_mode)
+
+        intent = await self.aclassify_intent(query)
+        context = await asyncio.to_thread(self.retrieve_context, query, intent, simulation_mode)
+        response_text = await self.agenerate_llm_response(query, intent, context, user_industry, dashboard_context, simulation_mode)
+
+        return {
+            "intent": intent,
+            "response": response_text,
+            "data_context": context
+        }
+
+    def stream_query(self, query, user_industry="General", dashboard_context=None, simulation_mode=False):
+        """
+        Event generator behind /api/query/stream. Yields ("context", {intent, data_context})
+        as soon as retrieval is done, then ("token", text) per model chunk, then ("done", {}).
+        """
+        intent = self.classify_intent(query)
+        context = self.retrieve_context(query, intent, simulation_mode)
+        yield "context", {"intent": intent, "data_context": context}
+
+        for text in self.stream_llm_response(query, intent, context, user_industry, dashboard_context, simulation_mode):
+            yield "token", text
+        yield "done", {}
+
+    def retrieve_context(self, query, intent, simulation_mode=False):
+        context = {}
+        if intent in ["MACRO", "HYBRID"]:
+            with span("macro"):
+                context['macro'] = macro_engine.get_macro_summary()
+        
+        if intent in ["MICRO", "HYBRID"]:
+            with span("micro"):
+                context['micro'] = micro_engine.retrieve(query)
+
+        if simulation_mode:
+            # Districts the query names first, then the ones micro retrieval picked
+            named = micro_engine.query_parser.parse(query).get("districts", []) if micro_engine.query_parser else []
+            retrieved = [r.get("District") for r in context.get('micro') or [] if isinstance(r, dict)]
+            with span("scenario"):
+                scenario = self.simulate(query, dict.fromkeys(named + retrieved))
+            if scenario is not None:
+                context['scenario'] = scenario
+        return context
+
+    def route_and_answer(self, query, user_industry="General", dashboard_context=None, simulation_mode=False):
+        """
+        Single model call: sends both macro and micro context candidates and asks for
+        structured output carrying the intent label and the answer.
+        Returns the same shape as process_query.
+        """
+        self.intent_classifier.record(used_fallback=True)
+        candidates = self.retrieve_context(query, "HYBRID", simulation_mode)
+        prompt = self.build_response_prompt(
+            query, candidates, user_industry, dashboard_context, simulation_mode,
+            output_instruction=ROUTE_AND_ANSWER_INSTRUCTION,
+        )
+
+        try:
+            raw = self._generate(
+                prompt, query,
+                generation_config={"response_mime_type": "application/json"},
+                **self._route_key(user_industry, dashboard_context, simulation_mode, candidates.get('scenario'))
+            )
+            intent, response_text = self._parse_routed_answer(raw)
+        except Exception as e:
+            logger.warning("Gemini route-and-answer error: %s", e)
+            intent, response_text = "GENERAL", f"I encountered an error generating the response: {e}"
+
+        return {
+            "intent": intent,
+            "response": response_text,
+            "data_context": self._narrow_context(intent, candidates)
+        }
+
+    async def aroute_and_answer(self, query, user_industry="General", dashboard_context=None, simulation_mode=False):
+        """Async route_and_answer."""
+        self.intent_classifier.record(used_fallback=True)
+        candidates = await asyncio.to_thread(self.retrieve_context, query, "HYBRID", simulation_mode)
+        prompt = self.build_response_prompt(
+            query, candidates, user_industry, dashboard_context, simulation_mode,
+            output_instruction=ROUTE_AND_ANSWER_INSTRUCTION,
+        )
+
+        try:
+            raw = await self._agenerate(
+                prompt, query,
+                generation_config={"response_mime_type": "application/json"},
+                **self._route_key(user_industry, dashboard_context, simulation_mode, candidates.get('scenario'))
+            )
+            intent, response_text = self._parse_routed_answer(raw)
+        except Exception as e:
+            logger.warning("Gemini route-and-answer error: %s", e)
+            intent, response_text = "GENERAL", f"I encountered an error generating the response: {e}"
+
+        return {
+            "intent": intent,
+            "response": response_text,
+            "data_context": self._narrow_context(intent, candidates)
+        }
+
+    def _route_key(self, user_industry, dashboard_context, simulation_mode, scenario=None):
+        return {
+            "kind": "route_answer",
+            "user_industry": user_industry,
+            "dashboard_context": stable_hash(dashboard_context),
+            "simulation_mode": bool(simulation_mode),
+            "scenario": self._scenario_key(scenario),
+            "data_version": self.data_version(),
+        }
+
+    @staticmethod
+    def _narrow_context(intent, candidates):
+        """Keeps only the context the chosen intent would have retrieved."""
+        keep = {"MACRO": ['macro'], "MICRO": ['micro'], "HYBRID": ['macro', 'micro']}.get(intent, [])
+        return {key: candidates[key] for key in keep + ['scenario'] if key in candidates}
+
+    @staticmethod
+    def _parse_routed_answer(raw):
+        """Extracts (intent, answer) from the model's JSON; tolerates code fences and stray text."""
+        match = re.search(r"\{.*\}", raw, re.DOTALL)
+        try:
+            data = json.loads(match.group(0) if match else raw)
+            intent = str(data.get("intent", "")).strip().upper()
+            answer = str(data.get("answer", "")).strip()
+        except (ValueError, AttributeError):
+            return "GENERAL", raw.strip()
+
+        if intent not in VALID_INTENTS:
+            intent = "GENERAL"
+        return intent, answer or raw.strip()
+
     def generate_llm_response(self, query, intent, context, user_industry="General", dashboard_context=None, simulation_mode=False):
         """
         Uses Gemini to generate a natural language response based on the retrieved data and dashboard context.
         """
-        
+        prompt = self.build_response_prompt(query, context, user_industry, dashboard_context, simulation_mode)
+
+        try:
+            return self._generate(prompt, query, **self._answer_key(intent, user_industry, dashboard_context, simulation_mode, context.get('scenario')))
+        except Exception as e:
+            return f"I encountered an error generating the response: {e}"
+
+    async def agenerate_llm_response(self, query, intent, context, user_industry="General", dashboard_context=None, simulation_mode=False):
+        """Async generate_llm_response."""
+        prompt = self.build_response_prompt(query, context, user_industry, dashboard_context, simulation_mode)
+
+        try:
+            return await self._agenerate(prompt, query, **self._answer_key(intent, user_industry, dashboard_context, simulation_mode, context.get('scenario')))
+        except Exception as e:
+            return f"I encountered an error generating the response: {e}"
+
+    def stream_llm_response(self, query, intent, context, user_industry="General", dashboard_context=None, simulation_mode=False):
+        """
+        Streaming variant of generate_llm_response: yields answer text chunks as the model
+        produces them. A cached answer is yielded as a single chunk.
+        """
+        key_parts = self._answer_key(intent, user_industry, dashboard_context, simulation_mode, context.get('scenario'))
+        cached = self.cache.get(query, **key_parts)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = self.build_response_prompt(query, context, user_industry, dashboard_context, simulation_mode)
+        chunks = []
+        try:
+            with span("generate"):
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    text = chunk.text
+                    if text:
+                        chunks.append(text)
+                        yield text
+        except Exception as e:
+            yield f"I encountered an error generating the response: {e}"
+            return
+
+        self.cache.put("".join(chunks), query, **key_parts)
+
+    def _answer_key(self, intent, user_industry, dashboard_context, simulation_mode, scenario=None):
+        """Cache key parts (besides the query) that determine an answer."""
+        return {
+            "kind": "answer",
+            "intent": intent,
+            "user_industry": user_industry,
+            "dashboard_context": stable_hash(dashboard_context),
+            "simulation_mode": bool(simulation_mode),
+            "scenario": self._scenario_key(scenario),
+            "data_version": self.data_version(),
+        }
+
+    @staticmethod
+    def _scenario_key(scenario):
+        # The shocks, so "inflation +5%" never reuses the near-duplicate answer to "+10%"
+        return stable_hash(scenario["assumptions"]["shocks"]) if scenario else None
+
+    def build_response_prompt(self, query, context, user_industry="General", dashboard_context=None, simulation_mode=False, output_instruction="Answer:"):
+        """Assembles the answer prompt from retrieved data, dashboard state and mode."""
+        with span("prompt"):
+            return self._build_response_prompt(query, context, user_industry, dashboard_context, simulation_mode, output_instruction)
+
+    def _build_response_prompt(self, query, context, user_industry, dashboard_context, simulation_mode, output_instruction):
+        rendered = self.prompt_builder.render(query, context, dashboard_context)
+
         # Construct System Context from Dashboard State
         system_context_str = ""
-        if dashboard_context:
-            filters = dashboard_context.get('filters', {})
-            visible_data = dashboard_context.get('visible_data', [])
-            
-            # Format visible data rows
-            formatted_rows = ""
-            for i, row in enumerate(visible_data[:10]): # Limit to top 10 for token efficiency
-                formatted_rows += f"- Row {i+1}: {row}\n"
-            
+        if rendered['view'] or rendered['visible']:
             system_context_str = f"""
             [SYSTEM CONTEXT]
-            Current View: {filters}
-            Active Data Points (Top 10):
-            {formatted_rows}
+            Current View: {rendered['view'] or 'All data'}
+            Active Data Points:
+{rendered['visible'] or '(none)'}
             [/SYSTEM CONTEXT]
             """
 
         simulation_instruction = ""
-        if simulation_mode:
+        projection_rule = "You are allowed to calculate projections and estimate future values based on user parameters."
+        if simulation_mode and rendered['scenario']:
+            projection_rule = "Use ONLY the projections in SCENARIO DATA; do not compute or estimate other projected values."
+            simulation_instruction = """
+            MODE: SIMULATION / SCENARIO PLANNING
+            - The user is asking a "What-If" question. The scenario engine has already computed the projection (SCENARIO DATA).
+            - You must output a Markdown Table comparing "Current State" vs "Projected State" using those numbers as given.
+            - Narrate what drives the changes and explicitly state the shocks and elasticities it assumed.
+            """
+        elif simulation_mode:
             simulation_instruction = """
             MODE: SIMULATION / SCENARIO PLANNING
             - The user is asking a "What-If" question.
@@ -106,17 +485,19 @@ class AIOrchestrator:
 
         Instructions:
         1. Answer based on the data provided in [SYSTEM CONTEXT] or 'Context Data'.
-        2. IF (Simulation Mode): You are allowed to calculate projections and estimate future values based on user parameters.
+        2. IF (Simulation Mode): {projection_rule}
         3. IF (Standard Mode): Answer using **ONLY** the provided data. If data is missing, state it.
         4. **CITATION RULE**: When citing a number, you MUST append a source tag if available (e.g., [Source: FS_CAI_001]). If no ID is present, use [Source: System].
         5. Be professional, concise, and helpful.
         """
 
         data_str = ""
-        if 'macro' in context and context['macro']:
-            data_str += f"\nMACRO DATA (World Bank):\n{context['macro']}"
-        if 'micro' in context and context['micro']:
-            data_str += f"\nMICRO DATA (Local Survey):\n{context['micro']}"
+        if rendered['scenario']:
+            data_str += f"\nSCENARIO DATA (computed):\n{rendered['scenario']}"
+        if rendered['macro']:
+            data_str += f"\nMACRO DATA (World Bank):\n{rendered['macro']}"
+        if rendered['micro']:
+            data_str += f"\nMICRO DATA (Local Survey):\n{rendered['micro']}"
         
         if not data_str and not system_context_str:
             data_str = "No specific data found for this query."
@@ -129,20 +510,33 @@ class AIOrchestrator:
 
         User Query: "{query}"
         
-        Answer:
+        {output_instruction}
         """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"I encountered an error generating the response: {e}"
+        self.prompt_builder.record(prompt)
+        return prompt
 
     def generate_proactive_insight(self, filters, data_summary):
         """
         Generates a short, proactive insight based on current filters and visible data.
         """
-        prompt = f"""
+        try:
+            return self._generate(self._insight_prompt(filters, data_summary), data_summary, fuzzy=False, kind="insight", filters=stable_hash(filters)).strip()
+        except Exception as e:
+            logger.warning("Insight error: %s", e)
+            return "💡 Explore the data to uncover market trends."
+
+    async def agenerate_proactive_insight(self, filters, data_summary):
+        """Async generate_proactive_insight."""
+        try:
+            text = await self._agenerate(self._insight_prompt(filters, data_summary), data_summary, fuzzy=False, kind="insight", filters=stable_hash(filters))
+            return text.strip()
+        except Exception as e:
+            logger.warning("Insight error: %s", e)
+            return "💡 Explore the data to uncover market trends."
+
+    @staticmethod
+    def _insight_prompt(filters, data_summary):
+        return f"""
         You are a Senior Market Analyst for Egypt.
         
         Context:
@@ -158,12 +552,6 @@ class AIOrchestrator:
         
         Insight:
         """
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            print(f"Insight Error: {e}")
-            return "💡 Explore the data to uncover market trends."
 
-# Singleton
-orchestrator = AIOrchestrator()
+# Singleton (constructed lazily / by background warm-up, see engines.py)
+from engines import orchestrator
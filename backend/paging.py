@@ -0,0 +1,28 @@
+import base64
+import os
+
+# Rows per /api/data page when the client does not ask, and the most it may ask for
+DATA_PAGE_SIZE = int(os.getenv("DATA_PAGE_SIZE", 500))
+DATA_MAX_PAGE_SIZE = int(os.getenv("DATA_MAX_PAGE_SIZE", 5000))
+
+# Columns derived for search and ranking: never sent to API clients or put in prompts
+INTERNAL_COLUMNS = frozenset({"text_representation", "relevance_score"})
+
+class CursorExpired(ValueError):
+    """A page cursor issued against a data version that has since been replaced."""
+
+def encode_cursor(version, offset):
+    """Opaque cursor for the page starting at `offset` of data generation `version`."""
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode()
+
+def decode_cursor(cursor, version):
+    """Returns the cursor's offset; raises ValueError if malformed, CursorExpired if stale."""
+    try:
+        cursor_version, offset = (int(x) for x in base64.urlsafe_b64decode(cursor.encode()).decode().split(":"))
+    except Exception:
+        offset = -1
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+    if cursor_version != version:
+        raise CursorExpired("Cursor expired: the data was reloaded, start again from the first page")
+    return offset
@@ -0,0 +1,40 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+# Processes reserved for password hashing; bounds how much CPU a login burst can take
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", 2))
+
+pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+# sha256_crypt runs in libc crypt() while holding the GIL, so a thread pool would still
+# stall the event loop; hashing goes to a small process pool instead. "spawn" keeps the
+# workers down to this module and passlib rather than a fork of the whole app.
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=AUTH_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+async def ahash_password(password):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), hash_password, password)
+
+async def averify_password(plain_password, hashed_password):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), verify_password, plain_password, hashed_password)
@@ -0,0 +1,176 @@
+import math
+import os
+import re
+import threading
+
+from metrics import PROMPT_TOKENS
+from paging import INTERNAL_COLUMNS
+
+# Token budget for the data rendered into an answer prompt (instructions and query excluded)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1200))
+
+# Always shown for micro rows when present; other columns only if the query mentions them.
+# Source_ID backs the [Source: ...] citation tags the answer prompt asks for.
+CORE_MICRO_COLUMNS = ["District", "Avg_Rent_Sqm_EGP", "Foot_Traffic_Score", "Competitor_Density", "Source_ID"]
+
+# Query words that make a macro indicator relevant (beyond its own name)
+MACRO_KEYWORDS = {
+    "inflation": ["inflation", "cpi", "prices"],
+    "gdp_growth": ["gdp", "growth", "economy", "economic"],
+    "lending_rate": ["lending", "interest", "borrowing", "loan", "loans"],
+    "agriculture_gdp": ["agriculture", "agricultural", "farming", "sector", "sectors"],
+    "manufacturing_gdp": ["manufacturing", "industry", "industrial", "sector", "sectors"],
+    "services_gdp": ["services", "service", "sector", "sectors"],
+    "exports_gdp": ["exports", "export", "trade"],
+}
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return math.ceil(len(text) / 4)
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, (list, tuple)):
+        return "/".join(_cell(v) for v in value)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+def _words(text):
+    return set(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+class PromptBuilder:
+    """
+    Renders retrieved context as compact pipe-separated tables under a token budget.
+    Only indicators and columns the query refers to are kept (everything when it
+    refers to none), dashboard rows already in the micro context are dropped, and
+    rows are added in priority order (macro, micro, dashboard) until the budget is spent.
+    """
+    def __init__(self, token_budget=PROMPT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.stats = {"prompts": 0, "total_tokens": 0, "max_tokens": 0, "last_tokens": 0}
+        self.stats_lock = threading.Lock()
+
+    def render(self, query, context, dashboard_context=None):
+        """Returns {'view', 'scenario', 'macro', 'micro', 'visible'} strings; empty when there is nothing to show."""
+        words = _words(query)
+        remaining = self.token_budget
+        rendered = {"view": "", "scenario": "", "macro": "", "micro": "", "visible": ""}
+
+        dashboard_context = dashboard_context or {}
+        filters = {k: v for k, v in (dashboard_context.get("filters") or {}).items() if v not in (None, "", [], {})}
+        if filters:
+            rendered["view"] = ", ".join(f"{k}={_cell(v)}" for k, v in filters.items())
+            remaining -= estimate_tokens(rendered["view"])
+
+        # A computed scenario is what the answer narrates, so it gets the budget first
+        if context.get("scenario"):
+            rendered["scenario"], remaining = self._scenario_tables(context["scenario"], remaining)
+
+        if context.get("macro"):
+            rendered["macro"], remaining = self._macro_table(context["macro"], words, remaining)
+
+        micro_rows = [r for r in context.get("micro") or [] if isinstance(r, dict)]
+        if micro_rows:
+            rendered["micro"], remaining = self._table(micro_rows, self._columns(micro_rows, words), remaining)
+
+        visible_rows = [r for r in dashboard_context.get("visible_data") or [] if isinstance(r, dict)]
+        if visible_rows:
+            seen = {self._row_key(r) for r in micro_rows}
+            visible_rows = [r for r in visible_rows if self._row_key(r) not in seen]
+            if visible_rows:
+                rendered["visible"], remaining = self._table(visible_rows, self._columns(visible_rows, words), remaining)
+            else:
+                rendered["visible"] = "(same rows as MICRO DATA)"
+
+        return rendered
+
+    def _macro_table(self, summary, words, remaining):
+        names = [n for n, v in summary.items() if isinstance(v, dict)]
+        relevant = [n for n in names if words & set(MACRO_KEYWORDS.get(n, n.split("_")))]
+        # Full trend only for the indicators the query asks about; latest values for the rest
+        rows = []
+        for name in relevant or names:
+            entry = summary[name]
+            trend = ""
+            if name in relevant:
+                trend = ", ".join(f"{p.get('year')}: {_cell(p.get('value'))}" for p in entry.get("trend") or [])
+            rows.append({"Indicator": name, "Latest": entry.get("latest_value"), "Year": entry.get("latest_year"), "Trend": trend})
+        columns = ["Indicator", "Latest", "Year"] + (["Trend"] if relevant else [])
+        return self._table(rows, columns, remaining)
+
+    def _scenario_tables(self, scenario, remaining):
+        """Assumptions line, per-column summary, then current vs projected per district."""
+        assumptions = scenario.get("assumptions") or {}
+        shocks = ", ".join(f"{k} {v:+g}" for k, v in (assumptions.get("shocks") or {}).items())
+        elasticities = "; ".join(
+            f"{col}: " + ", ".join(f"{k} {_cell(v)}" for k, v in per_shock.items())
+            for col, per_shock in (assumptions.get("elasticities") or {}).items()
+        )
+        lines = [f"Shocks: {shocks or 'none'}", f"Elasticities (% change per unit shock): {elasticities}"]
+        if assumptions.get("pass_through"):
+            lines.append("Price pass-through by Competitor_Density: " + ", ".join(f"{k} {_cell(v)}" for k, v in assumptions["pass_through"].items()))
+        header = "\n".join(lines)
+        remaining -= estimate_tokens(header)
+
+        summary_rows = [{"Column": col, **stats} for col, stats in (scenario.get("summary") or {}).items()]
+        summary, remaining = self._table(summary_rows, ["Column", "current_mean", "projected_mean", "change_pct"], remaining)
+        rows = scenario.get("rows") or []
+        columns = list(dict.fromkeys(c for r in rows[:1] for c in r))
+        districts, remaining = self._table(rows, columns, remaining) if rows else ("", remaining)
+        return "\n".join(part for part in (header, summary, districts) if part), remaining
+
+    @staticmethod
+    def _columns(rows, words):
+        present = list(dict.fromkeys(c for r in rows for c in r if c not in INTERNAL_COLUMNS))
+        core = [c for c in CORE_MICRO_COLUMNS if c in present]
+        if not core:
+            return present
+        mentioned = [c for c in present if c not in core and words & _words(c.replace("_", " "))]
+        return core + mentioned
+
+    @staticmethod
+    def _row_key(row):
+        if "District" in row:
+            return ("District", row["District"])
+        return tuple(sorted((k, _cell(v)) for k, v in row.items() if k not in INTERNAL_COLUMNS))
+
+    @staticmethod
+    def _table(rows, columns, remaining):
+        """Header plus as many rows as the remaining budget allows; returns (table, budget left)."""
+        lines = [" | ".join(columns)]
+        budget = remaining - estimate_tokens(lines[0])
+        shown = 0
+        for row in rows:
+            line = " | ".join(_cell(row.get(c)) for c in columns)
+            cost = estimate_tokens(line) + 1
+            if cost > budget:
+                break
+            lines.append(line)
+            budget -= cost
+            shown += 1
+        if shown < len(rows):
+            lines.append(f"(+{len(rows) - shown} more rows omitted)")
+        if not shown:
+            return lines[-1], remaining
+        return "\n".join(lines), budget
+
+    def record(self, prompt):
+        """Counts the tokens of an assembled prompt; returns the count."""
+        tokens = estimate_tokens(prompt)
+        with self.stats_lock:
+            self.stats["prompts"] += 1
+            self.stats["total_tokens"] += tokens
+            self.stats["max_tokens"] = max(self.stats["max_tokens"], tokens)
+            self.stats["last_tokens"] = tokens
+        PROMPT_TOKENS.observe(tokens)
+        return tokens
+
+    def report(self):
+        prompts = self.stats["prompts"]
+        return {
+            **self.stats,
+            "avg_tokens": round(self.stats["total_tokens"] / prompts, 1) if prompts else 0.0,
+            "token_budget": self.token_budget,
+        }
@@ -0,0 +1,97 @@
+import re
+
+# Surface forms for the numeric columns filter_data understands: metric -> (min key, max key)
+METRIC_PATTERNS = {
+    ("min_rent", "max_rent"): r"rents?|rental|rent prices?|price|cost",
+    ("min_traffic", "max_traffic"): r"foot ?traffic|traffic(?: score)?|footfall",
+}
+
+UPPER_BOUND = r"under|below|less than|lower than|cheaper than|at most|up to|no more than|max(?:imum)?|<=?"
+LOWER_BOUND = r"over|above|more than|greater than|higher than|at least|exceeding|min(?:imum)?|>=?"
+
+NUMBER = r"(\d[\d,]*(?:\.\d+)?)\s*(k\b)?"
+
+# Density words -> Competitor_Density labels
+DENSITY_LEVELS = {"very high": "Very High", "high": "High", "medium": "Medium", "moderate": "Medium", "low": "Low"}
+DENSITY_NOUN = r"competition|competitors|competitor density|density"
+
+class QueryConstraintParser:
+    """
+    Turns the exact parts of a question into filter_data predicates:
+    "rent under 3000", "traffic between 2000 and 2500", district names and
+    "high competition". Returns the same filters dict the /api/data endpoint takes.
+    """
+    def __init__(self, districts):
+        self.districts = {str(d).lower(): d for d in districts if str(d).strip()}
+        names = sorted(self.districts, key=len, reverse=True)
+        self.district_pattern = re.compile(r"\b(" + "|".join(re.escape(n) for n in names) + r")\b") if names else None
+
+        # Up to three filler words between the metric and the bound ("rent per sqm is under ..."),
+        # never crossing a conjunction, so "traffic and rent under 3000" binds to rent only
+        filler = r"(?:\s+(?!between\b|from\b|and\b|or\b|with\b|but\b)[a-z/.]+){0,3}?"
+        self.range_patterns = []
+        for keys, metric in METRIC_PATTERNS.items():
+            self.range_patterns.append((keys, "between", re.compile(
+                rf"\b(?:{metric}){filler}\s+(?:between|from)\s+{NUMBER}\s*(?:and|to|-)\s*{NUMBER}")))
+            self.range_patterns.append((keys, "max", re.compile(rf"\b(?:{metric}){filler}\s*(?:{UPPER_BOUND})\s*{NUMBER}")))
+            self.range_patterns.append((keys, "min", re.compile(rf"\b(?:{metric}){filler}\s*(?:{LOWER_BOUND})\s*{NUMBER}")))
+
+        levels = "|".join(sorted(DENSITY_LEVELS, key=len, reverse=True))
+        self.density_patterns = [
+            re.compile(rf"\b({levels})\s+(?:{DENSITY_NOUN})\b"),
+            re.compile(rf"\b(?:{DENSITY_NOUN})\s+(?:is\s+|are\s+)?({levels})\b"),
+        ]
+
+    @staticmethod
+    def _number(digits, thousands):
+        value = float(digits.replace(",", ""))
+        return value * 1000 if thousands else value
+
+    def parse(self, query):
+        """Returns a filters dict; empty if the query carries no exact constraints."""
+        text = str(query).lower()
+        filters = {}
+
+        for (min_key, max_key), kind, pattern in self.range_patterns:
+            match = pattern.search(text)
+            if not match:
+                continue
+            if kind == "between":
+                low = self._number(match.group(1), match.group(2))
+                high = self._number(match.group(3), match.group(4))
+                filters.setdefault(min_key, min(low, high))
+                filters.setdefault(max_key, max(low, high))
+            elif kind == "max":
+                filters.setdefault(max_key, self._number(match.group(1), match.group(2)))
+            else:
+                filters.setdefault(min_key, self._number(match.group(1), match.group(2)))
+
+        if self.district_pattern is not None:
+            found = [self.districts[m] for m in self.district_pattern.findall(text)]
+            if found:
+                filters["districts"] = list(dict.fromkeys(found))
+
+        density = []
+        for pattern in self.density_patterns:
+            density.extend(DENSITY_LEVELS[m] for m in pattern.findall(text))
+        if density:
+            filters["competitor_density"] = list(dict.fromkeys(density))
+
+        return filters
+
+    def residual(self, query):
+        """The query text left once the constraint phrases parse() reads are cut out."""
+        text = str(query).lower()
+        spans = []
+        for _, _, pattern in self.range_patterns:
+            match = pattern.search(text)
+            if match:
+                spans.append(match.span())
+        for pattern in [self.district_pattern, *self.density_patterns]:
+            if pattern is not None:
+                spans.extend(m.span() for m in pattern.finditer(text))
+
+        keep = [True] * len(text)
+        for start, end in spans:
+            keep[start:end] = [False] * (end - start)
+        return " ".join("".join(c if k else " " for c, k in zip(text, keep)).split())
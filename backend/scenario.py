@@ -0,0 +1,305 @@
+import os
+import re
+import time
+
+import numpy as np
+
+# Macro shocks a scenario can apply: percentage points for the rates, % EGP depreciation
+# against the USD for exchange_rate
+SHOCKS = ["inflation", "lending_rate", "exchange_rate", "gdp_growth"]
+
+# Shocks backed by a MacroEngine indicator, so they can also be given as a target level
+LEVEL_SHOCKS = {"inflation", "lending_rate", "gdp_growth"}
+
+# % change of each micro column per unit of shock, at the reference macro regime below.
+# Property prices and rents in EGP track inflation and the currency only partly; higher
+# borrowing costs weigh on sale prices most; footfall follows real growth.
+ELASTICITIES = {
+    "Avg_Rent_Sqm_EGP": {"inflation": 0.6, "lending_rate": -0.8, "exchange_rate": 0.3, "gdp_growth": 1.2},
+    "Avg_Sale_Price_Sqm_EGP": {"inflation": 0.8, "lending_rate": -1.5, "exchange_rate": 0.5, "gdp_growth": 1.5},
+    "Foot_Traffic_Score": {"inflation": -0.3, "lending_rate": -0.2, "exchange_rate": -0.1, "gdp_growth": 0.8},
+}
+
+# Columns whose pass-through depends on local pricing power (Competitor_Density)
+PRICE_COLUMNS = {"Avg_Rent_Sqm_EGP", "Avg_Sale_Price_Sqm_EGP"}
+DENSITY_PASS_THROUGH = {"Low": 1.2, "Medium": 1.0, "High": 0.85, "Very High": 0.7}
+
+# Macro levels (MacroEngine latest values) at which ELASTICITIES apply as listed. Away from
+# them a shock's elasticities scale with current / reference: prices index faster when
+# inflation is already high, and demand reacts more to rate moves when rates are high.
+REFERENCE_LEVELS = {"inflation": 10.0, "lending_rate": 12.0}
+REGIME_SCALE_BOUNDS = (0.5, 2.0)
+
+# Most scenarios one grid or Monte Carlo request may evaluate
+SCENARIO_MAX_RUNS = int(os.getenv("SCENARIO_MAX_RUNS", 100_000))
+
+# Scenario x district x column cells projected at once; bounds memory of large sweeps
+SCENARIO_CHUNK_CELLS = int(os.getenv("SCENARIO_CHUNK_CELLS", 2_000_000))
+
+MONTE_CARLO_PERCENTILES = [5, 50, 95]
+
+# Patterns that name a shock in a what-if question, most specific first per shock. Bare
+# words like "growth" or "pound" are left out: "rent growth" is not GDP growth, and
+# "the pound trades at 50" is a rate level, not a depreciation.
+SHOCK_ALIASES = {
+    "inflation": [r"inflation(?: rate)?", r"cpi"],
+    "lending_rate": [r"lending rates?", r"interest rates?", r"policy rates?", r"(?<!exchange )rates"],
+    "exchange_rate": [r"exchange rates?", r"devaluation", r"depreciation", r"devalues?",
+                      r"(?:pound|egp) (?:devalues|depreciates|weakens|loses|falls|drops)"],
+    "gdp_growth": [r"gdp growth", r"economic growth", r"gdp"],
+}
+# At most three words between the shock and its number, never across "and" / "but"
+_GAP = r"(?:\s+(?!and\b|but\b)[a-z']+){0,3}?\s*"
+_NUMBER = (r"(?P<verb>hits?|reach(?:es)?|to|at|is|are|of|=|by|rises?|increases?|jumps?|up|falls?|drops?|"
+           r"declines?|decreases?|down|cut)?\s*(?P<sign>[+-])?\s*(?P<num>\d+(?:\.\d+)?)\s*"
+           r"(?P<unit>%|pp\b|bps\b|basis points?|percentage points?|points?)?")
+# Verbs that name where the indicator ends up rather than how much it moves; "of" only
+# without a change word ("inflation of 40%" vs "a rise of 5%")
+_TARGET_VERBS = {"hit", "hits", "reach", "reaches", "to", "at", "is", "are", "="}
+_UP_WORDS = {"rise", "rises", "increase", "increases", "jump", "jumps", "up", "hike", "higher"}
+_DOWN_WORDS = {"fall", "falls", "drop", "drops", "decline", "declines", "decrease", "decreases", "down", "cut", "cuts", "lower"}
+_APPRECIATION_WORDS = {"appreciates", "appreciation", "strengthens"}
+
+def parse_shocks(text):
+    """
+    Reads quantified shocks from a what-if question. Returns (deltas, levels):
+    "inflation +5%" / "rates are cut by 150 bps" are deltas, "inflation hits 40%" /
+    "inflation of 40%" are levels. A bare number without a unit, sign or verb (e.g. a
+    year) is not a shock, nor is a target level for a shock without a macro baseline.
+    """
+    deltas, levels = {}, {}
+    lowered = str(text).lower()
+    for shock, aliases in SHOCK_ALIASES.items():
+        for alias in aliases:
+            match = next((m for m in re.finditer(rf"\b{alias}\b{_GAP}{_NUMBER}", lowered)
+                          if m.group("verb") or m.group("sign") or m.group("unit")), None)
+            if not match:
+                continue
+            value = float(match.group("num"))
+            if (match.group("unit") or "").startswith("b"):
+                value /= 100  # basis points
+            verb = match.group("verb")
+            words = set(re.findall(r"[a-z]+", match.group(0)))
+            if verb in _TARGET_VERBS or verb == "of" and not words & (_UP_WORDS | _DOWN_WORDS):
+                if shock in LEVEL_SHOCKS:
+                    levels[shock] = value
+                elif verb == "of":
+                    deltas[shock] = value  # "devaluation of 20%"
+                break
+            against = _APPRECIATION_WORDS if shock == "exchange_rate" else _DOWN_WORDS
+            deltas[shock] = -value if match.group("sign") == "-" or words & against else value
+            break
+    return deltas, levels
+
+class ScenarioEngine:
+    """
+    Numeric what-if model over the micro table. A scenario is a vector of macro shocks;
+    every district's columns move by (shocks x elasticities) x pass-through, where the
+    elasticities are scaled by the current macro regime and the pass-through of prices
+    by local competition. The clipped-at-zero response is monotone in the column-level
+    change, so sweeps and Monte Carlo percentiles are computed per column and only
+    scaled out to the districts at the end.
+    """
+    def __init__(self, df, macro_summary=None):
+        self.columns = [c for c in ELASTICITIES if c in df.columns]
+        if not self.columns or "District" not in df.columns:
+            raise ValueError("Scenario engine needs District and at least one of " + ", ".join(ELASTICITIES))
+
+        self.districts = df["District"].astype(str).tolist()
+        self.values = np.column_stack([
+            np.asarray(df[c].to_numpy(dtype=float, na_value=np.nan), dtype=np.float64) for c in self.columns
+        ])  # district x column
+        self.density = df["Competitor_Density"].astype(str).tolist() if "Competitor_Density" in df.columns else None
+
+        self.baseline = {}  # shock -> current macro level, where the macro engine has one
+        for shock in SHOCKS:
+            entry = (macro_summary or {}).get(shock)
+            if isinstance(entry, dict) and entry.get("latest_value") is not None:
+                self.baseline[shock] = float(entry["latest_value"])
+        self.regime = {
+            shock: float(np.clip(self.baseline[shock] / ref, *REGIME_SCALE_BOUNDS)) if shock in self.baseline else 1.0
+            for shock, ref in REFERENCE_LEVELS.items()
+        }
+
+        # column x shock: % change per unit of each shock
+        self.elasticity = np.array([[ELASTICITIES[c][s] * self.regime.get(s, 1.0) for s in SHOCKS] for c in self.columns])
+        # district x column: share of the column-level change each district sees (always > 0)
+        self.pass_through = np.ones((len(self.districts), len(self.columns)))
+        if self.density is not None:
+            factors = np.array([DENSITY_PASS_THROUGH.get(d, 1.0) for d in self.density])
+            for j, col in enumerate(self.columns):
+                if col in PRICE_COLUMNS:
+                    self.pass_through[:, j] = factors
+
+        present = ~np.isnan(self.values)
+        self.current = np.where(present, self.values, 0.0)
+        self.counts = np.maximum(present.sum(axis=0), 1)
+        self.totals = self.current.sum(axis=0)
+        self.weighted_totals = (self.current * self.pass_through).sum(axis=0)
+        self.max_pass_through = self.pass_through.max(axis=0) if len(self.districts) else np.ones(len(self.columns))
+
+    def shock_vector(self, shocks=None, levels=None):
+        """Deltas per SHOCKS entry; levels are converted to deltas from the macro baseline."""
+        shocks, levels = shocks or {}, levels or {}
+        unknown = [s for s in list(shocks) + list(levels) if s not in SHOCKS]
+        if unknown:
+            raise ValueError(f"Unknown shocks: {', '.join(map(str, unknown))}")
+        vector = np.zeros(len(SHOCKS))
+        for i, shock in enumerate(SHOCKS):
+            if shock in levels:
+                if shock not in self.baseline:
+                    raise ValueError(f"No current {shock} level to shock from; give a change instead")
+                vector[i] = float(levels[shock]) - self.baseline[shock]
+            elif shock in shocks:
+                vector[i] = float(shocks[shock])
+        return vector
+
+    def column_change(self, scenarios):
+        """% change of each column before pass-through (scenario x column)."""
+        return np.atleast_2d(scenarios) @ self.elasticity.T
+
+    def project(self, change):
+        """Projected values (scenario x district x column) for column-level changes."""
+        factor = 1.0 + change[:, None, :] * self.pass_through[None] / 100.0
+        return self.values[None] * np.maximum(factor, 0.0)
+
+    def assumptions(self, vector):
+        return {
+            "shocks": {s: round(float(v), 4) for s, v in zip(SHOCKS, vector) if v},
+            "baseline": self.baseline,
+            "regime_scale": self.regime,
+            "elasticities": {c: dict(zip(SHOCKS, _rounded(row))) for c, row in zip(self.columns, self.elasticity)},
+            "pass_through": DENSITY_PASS_THROUGH if self.density is not None else {},
+        }
+
+    def run(self, shocks=None, levels=None, districts=None):
+        """
+        One scenario: current vs projected value per district and column, for the listed
+        districts (in that order; unknown names are skipped) or all of them. The summary
+        always covers every district.
+        """
+        vector = self.shock_vector(shocks, levels)
+        projected = self.project(self.column_change(vector))[0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change = (projected / self.values - 1.0) * 100.0
+
+        if districts is None:
+            rows = np.arange(len(self.districts))
+        else:
+            index = {d: i for i, d in reversed(list(enumerate(self.districts)))}
+            rows = np.array([index[d] for d in dict.fromkeys(map(str, districts)) if d in index], dtype=np.intp)
+        table = {"District": [self.districts[i] for i in rows]}
+        if self.density is not None:
+            table["Competitor_Density"] = [self.density[i] for i in rows]
+        for j, col in enumerate(self.columns):
+            table[col] = _rounded(self.values[rows, j])
+            table[f"{col}_projected"] = _rounded(projected[rows, j])
+            table[f"{col}_change_pct"] = _rounded(change[rows, j])
+
+        present = ~np.isnan(self.values)
+        summary = {}
+        for j, col in enumerate(self.columns):
+            projected_total = projected[present[:, j], j].sum()
+            summary[col] = {
+                "current_mean": _rounded(self.totals[j] / self.counts[j]),
+                "projected_mean": _rounded(projected_total / self.counts[j]),
+                "change_pct": _rounded((projected_total / self.totals[j] - 1.0) * 100.0) if self.totals[j] else None,
+            }
+        return {"assumptions": self.assumptions(vector), "rows": _records(table), "summary": summary}
+
+    def grid(self, axes):
+        """Every combination of the listed shock values ({shock: [values]}); see sweep."""
+        unknown = [s for s in axes if s not in SHOCKS]
+        if unknown:
+            raise ValueError(f"Unknown shocks: {', '.join(map(str, unknown))}")
+        names = [s for s in SHOCKS if axes.get(s)]
+        runs = int(np.prod([len(axes[s]) for s in names])) if names else 0
+        if not runs or runs > SCENARIO_MAX_RUNS:
+            raise ValueError(f"A grid needs between 1 and {SCENARIO_MAX_RUNS} scenarios, got {runs}")
+        scenarios = np.zeros((runs, len(SHOCKS)))
+        mesh = np.meshgrid(*[np.asarray(axes[s], dtype=float) for s in names], indexing="ij")
+        for s, values in zip(names, mesh):
+            scenarios[:, SHOCKS.index(s)] = values.ravel()
+        return self.sweep(scenarios)
+
+    def sweep(self, scenarios):
+        """
+        Aggregate outcome of each scenario (row of a scenario x shock matrix): the % change
+        of each column's total over all districts and its projected mean.
+        """
+        start = time.perf_counter()
+        scenarios = np.atleast_2d(np.asarray(scenarios, dtype=float))
+        change = self.column_change(scenarios)
+
+        # Totals are linear in the change until some district's value would drop below zero;
+        # only those scenarios are projected district by district
+        projected_totals = self.totals + change * self.weighted_totals / 100.0
+        floored = np.flatnonzero((change * self.max_pass_through < -100.0).any(axis=1))
+        step = max(1, SCENARIO_CHUNK_CELLS // max(1, self.values.size))
+        for lo in range(0, len(floored), step):
+            idx = floored[lo:lo + step]
+            projected_totals[idx] = np.nansum(self.project(change[idx]), axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            total_change = (projected_totals / self.totals - 1.0) * 100.0
+        table = {s: _rounded(scenarios[:, i]) for i, s in enumerate(SHOCKS)}
+        for j, col in enumerate(self.columns):
+            table[f"{col}_change_pct"] = _rounded(total_change[:, j])
+            table[f"{col}_projected_mean"] = _rounded(projected_totals[:, j] / self.counts[j])
+        return {
+            "shocks": SHOCKS,
+            "columns": self.columns,
+            "scenarios": len(scenarios),
+            "rows": _records(table),
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+    def monte_carlo(self, distributions, samples=1000, seed=None, percentiles=MONTE_CARLO_PERCENTILES):
+        """
+        Samples shocks from {shock: {"mean", "std"}} (normal) or {shock: {"low", "high"}}
+        (uniform) and returns percentiles of every district's projected values.
+        """
+        start = time.perf_counter()
+        unknown = [s for s in distributions if s not in SHOCKS]
+        if unknown:
+            raise ValueError(f"Unknown shocks: {', '.join(map(str, unknown))}")
+        if not 1 <= samples <= SCENARIO_MAX_RUNS:
+            raise ValueError(f"samples must be between 1 and {SCENARIO_MAX_RUNS}")
+
+        rng = np.random.default_rng(seed)
+        scenarios = np.zeros((samples, len(SHOCKS)))
+        for shock, spec in distributions.items():
+            i = SHOCKS.index(shock)
+            if "low" in spec or "high" in spec:
+                scenarios[:, i] = rng.uniform(float(spec.get("low", 0.0)), float(spec.get("high", 0.0)), samples)
+            else:
+                scenarios[:, i] = rng.normal(float(spec.get("mean", 0.0)), float(spec.get("std", 0.0)), samples)
+
+        # A district's value is a non-decreasing function of the column change (pass-through > 0),
+        # so its percentiles are the projections of the column change's percentiles
+        bands = self.project(np.percentile(self.column_change(scenarios), percentiles, axis=0))
+
+        table = {"District": self.districts}
+        for j, col in enumerate(self.columns):
+            table[col] = _rounded(self.values[:, j])
+            for p, band in zip(percentiles, bands):
+                table[f"{col}_p{p}"] = _rounded(band[:, j])
+        return {
+            "samples": samples,
+            "seed": seed,
+            "distributions": distributions,
+            "assumptions": self.assumptions(np.zeros(len(SHOCKS))),
+            "rows": _records(table),
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+def _rounded(values):
+    """Rounds for JSON; NaN / inf become None. Scalars in, scalar out."""
+    array = np.round(np.asarray(values, dtype=np.float64), 4)
+    out = np.atleast_1d(array).astype(object)
+    out[~np.isfinite(np.atleast_1d(array))] = None
+    return out.tolist() if array.ndim else out[0]
+
+def _records(table):
+    """{column: list} -> list of row dicts."""
+    return [dict(zip(table, row)) for row in zip(*table.values())]
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: builds are then not coordinated across processes
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+# Snapshots live with the other local caches (gitignored)
+SNAPSHOT_DIR = os.getenv("MICRO_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "cache", "snapshots"))
+
+FORMAT_VERSION = 2
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ColumnarSnapshot:
+    """
+    Typed columnar snapshot of the DataFrames derived from one source file.
+    Each column is stored as a memory-mappable .npy file: numeric/bool columns as-is,
+    string columns dictionary-encoded (int32 codes + categories in meta.json).
+    The snapshot is keyed by the source's size, mtime and SHA-256 and is ignored
+    (then rebuilt by the caller) as soon as the source changes.
+
+    Because the files are memory-mapped, every process that loads the same snapshot
+    shares one copy of the data in the page cache (e.g. uvicorn --workers N).
+    """
+    def __init__(self, source_path, root=None):
+        self.source_path = source_path
+        self.path = os.path.join(root or SNAPSHOT_DIR, os.path.splitext(os.path.basename(source_path))[0])
+
+    def _meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    @contextmanager
+    def build_lock(self):
+        """
+        Exclusive inter-process lock for this source: the first process to take it
+        builds (and saves) the snapshot, the others wait and then load what it wrote.
+        """
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _source_stat(self):
+        stat = os.stat(self.source_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def is_valid(self):
+        """True if the snapshot was built from the current source file."""
+        try:
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if meta.get("format") != FORMAT_VERSION:
+            return False
+
+        size, mtime = self._source_stat()
+        if meta["source_size"] == size and meta["source_mtime_ns"] == mtime:
+            return True
+        # Touched but possibly unchanged (e.g. re-checkout): fall back to the content hash
+        if meta["source_size"] == size and meta["source_sha256"] == file_sha256(self.source_path):
+            meta["source_mtime_ns"] = mtime
+            self._write_meta(self.path, meta)
+            return True
+        return False
+
+    def load(self, categorical=()):
+        """
+        Returns {name: DataFrame} from a valid snapshot, or None.
+        Columns are memory-mapped; string columns of frames listed in `categorical`
+        come back as pandas Categoricals (zero-copy codes), others as plain strings.
+        """
+        try:
+            if not self.is_valid():
+                return None
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+
+            frames = {}
+            for name, frame_meta in meta["frames"].items():
+                columns = {}
+                for i, col in enumerate(frame_meta["columns"]):
+                    # np.asarray drops the memmap subclass but keeps the zero-copy view
+                    values = np.asarray(np.load(os.path.join(self.path, name, f"col_{i:04d}.npy"), mmap_mode="r"))
+                    if col["kind"] == "codes":
+                        cat = pd.Categorical.from_codes(values, categories=col["categories"])
+                        columns[col["name"]] = cat if name in categorical else np.asarray(cat, dtype=object)
+                    else:
+                        columns[col["name"]] = values
+                df = pd.DataFrame(columns, copy=False)
+                df.columns.name = frame_meta.get("columns_name")
+                frames[name] = df
+            return frames
+        except Exception as e:
+            print(f"Snapshot load failed ({self.path}): {e}")
+            return None
+
+    def save(self, frames):
+        """Writes {name: DataFrame} atomically (build in a temp dir, then rename)."""
+        tmp = None
+        try:
+            parent = os.path.dirname(self.path)
+            os.makedirs(parent, exist_ok=True)
+            tmp = tempfile.mkdtemp(dir=parent, prefix=".building-")
+
+            size, mtime = self._source_stat()
+            meta = {
+                "format": FORMAT_VERSION,
+                "source": os.path.abspath(self.source_path),
+                "source_size": size,
+                "source_mtime_ns": mtime,
+                "source_sha256": file_sha256(self.source_path),
+                "frames": {},
+            }
+            for name, df in frames.items():
+                os.makedirs(os.path.join(tmp, name))
+                columns = []
+                for i, col in enumerate(df.columns):
+                    columns.append(self._write_column(os.path.join(tmp, name, f"col_{i:04d}.npy"), col, df[col]))
+                meta["frames"][name] = {"columns": columns, "columns_name": df.columns.name}
+            self._write_meta(tmp, meta)
+
+            # Swap in the new snapshot; readers see either the old or the new directory
+            old = None
+            if os.path.exists(self.path):
+                old = tempfile.mkdtemp(dir=parent, prefix=".stale-")
+                os.rename(self.path, os.path.join(old, "snapshot"))
+            os.rename(tmp, self.path)
+            if old:
+                shutil.rmtree(old, ignore_errors=True)
+            print(f"Snapshot written to {self.path}")
+        except Exception as e:
+            print(f"Snapshot save failed ({self.path}): {e}")
+            if tmp and os.path.exists(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def save_extras(self, arrays, objects):
+        """
+        Adds structures derived from the frames to the current snapshot: numpy arrays
+        (memory-mapped by load_extras) and small picklable objects. They live inside the
+        snapshot directory, so a snapshot rebuilt for a changed source drops them too.
+        """
+        tmp = None
+        try:
+            tmp = tempfile.mkdtemp(dir=self.path, prefix=".extras-")
+            files = {}
+            for i, (name, array) in enumerate(arrays.items()):
+                files[name] = f"arr_{i:04d}.npy"
+                np.save(os.path.join(tmp, files[name]), np.ascontiguousarray(array))
+            with open(os.path.join(tmp, "objects.pickle"), "wb") as f:
+                pickle.dump(objects, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._write_meta(tmp, {"format": FORMAT_VERSION, "arrays": files})
+
+            target = os.path.join(self.path, "extras")
+            old = None
+            if os.path.exists(target):
+                old = tempfile.mkdtemp(dir=self.path, prefix=".stale-")
+                os.rename(target, os.path.join(old, "extras"))
+            os.rename(tmp, target)
+            if old:
+                shutil.rmtree(old, ignore_errors=True)
+            return True
+        except Exception as e:
+            print(f"Snapshot extras save failed ({self.path}): {e}")
+            if tmp and os.path.exists(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+            return False
+
+    def load_extras(self):
+        """Returns (arrays, objects) saved by save_extras for a valid snapshot, or None."""
+        directory = os.path.join(self.path, "extras")
+        try:
+            if not os.path.exists(directory) or not self.is_valid():
+                return None
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("format") != FORMAT_VERSION:
+                return None
+            arrays = {
+                name: np.asarray(np.load(os.path.join(directory, file), mmap_mode="r"))
+                for name, file in meta["arrays"].items()
+            }
+            with open(os.path.join(directory, "objects.pickle"), "rb") as f:
+                objects = pickle.load(f)
+            return arrays, objects
+        except Exception as e:
+            print(f"Snapshot extras load failed ({self.path}): {e}")
+            return None
+
+    @staticmethod
+    def _write_column(path, name, series):
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            np.save(path, series.to_numpy())
+            return {"name": str(name), "kind": "values"}
+
+        codes, categories = pd.factorize(series)
+        # Stored in the width pandas uses for this many categories, so loading stays zero-copy
+        width = pd.Categorical.from_codes(np.zeros(0, dtype=np.int32), categories=pd.Index(categories)).codes.dtype
+        np.save(path, codes.astype(width))
+        return {"name": str(name), "kind": "codes", "categories": [str(c) for c in categories]}
+
+    @staticmethod
+    def _write_meta(directory, meta):
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+import orchestrator as orchestrator_module
+from test_llm_cache import make_orchestrator
+
+@pytest.fixture(autouse=True)
+def offline_macro(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.macro_engine, "get_macro_summary", lambda: {})
+
+def test_identical_requests_share_one_model_call():
+    orch = make_orchestrator("Maadi is busy.", delay=0.2)
+
+    async def run():
+        return await asyncio.gather(*[orch.aprocess_query("Rent in Maadi") for _ in range(50)])
+
+    results = asyncio.run(run())
+    assert orch.model.calls == 1
+    assert all(r == results[0] for r in results)
+    assert not orch._inflight
+
+def test_model_concurrency_is_bounded_per_call_type(monkeypatch):
+    monkeypatch.setitem(orchestrator_module.LLM_CONCURRENCY, "answer", 4)
+    orch = make_orchestrator("ok", delay=0.05)
+
+    async def run():
+        await asyncio.gather(*[orch.aprocess_query(f"Rent in Maadi for shop {i}") for i in range(20)])
+
+    asyncio.run(run())
+    assert orch.model.calls == 20
+    assert orch.model.max_active == 4
+
+def test_async_errors_fall_back_to_message():
+    orch = make_orchestrator()
+
+    async def fail(prompt, **kwargs):
+        raise RuntimeError("quota")
+
+    orch.model.generate_content_async = fail
+    result = asyncio.run(orch.aprocess_query("Rent in Maadi"))
+    assert result["response"].startswith("I encountered an error")
+    assert not orch._inflight
+
+def test_cheap_endpoints_stay_fast_with_llm_calls_in_flight(monkeypatch, signed_in):
+    monkeypatch.setitem(orchestrator_module.LLM_CONCURRENCY, "answer", 1000)
+    orch = make_orchestrator("slow answer", delay=2.0)
+    monkeypatch.setattr(main, "orchestrator", orch)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            llm_requests = [
+                asyncio.create_task(client.post("/api/query", json={"text": f"Rent in Maadi for shop {i}"}))
+                for i in range(200)
+            ]
+            while orch.model.active < 200:
+                await asyncio.sleep(0.01)
+
+            latencies = []
+            for _ in range(20):
+                start = time.perf_counter()
+                response = await client.get("/api/districts")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+
+            responses = await asyncio.gather(*llm_requests)
+            return latencies, responses
+
+    latencies, responses = asyncio.run(run())
+
+    assert all(r.status_code == 200 for r in responses)
+    assert max(latencies) < 0.2
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import auth
+import main
+from passwords import hash_password
+from user_store import SqliteUserStore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SqliteUserStore(str(tmp_path / "users.sqlite"), legacy_path=None)
+    store.create({"username": "erin", "password_hash": hash_password("secret"), "industry": "Retail"})
+    monkeypatch.setattr(auth, "USER_STORE", store)
+    monkeypatch.setattr(auth, "login_throttle", auth.LoginThrottle(max_failures=3, window=60))
+    return store
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+def test_login_burst_does_not_stall_other_requests(store):
+    main.micro_engine.get()  # warm the data engine outside the measurement
+
+    async def run():
+        async with client() as c:
+            logins = [
+                asyncio.create_task(c.post("/api/login", json={"username": "erin", "password": "secret"}))
+                for _ in range(8)
+            ]
+            await asyncio.sleep(0.05)
+
+            latencies = []
+            while not all(t.done() for t in logins):
+                start = time.perf_counter()
+                response = await c.get("/api/districts")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+                await asyncio.sleep(0.01)
+            return latencies, await asyncio.gather(*logins)
+
+    latencies, responses = asyncio.run(run())
+    assert all(r.status_code == 200 for r in responses)
+    assert len(latencies) >= 10
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    assert p99 < 0.1
+
+def test_one_verify_per_login_and_failed_attempts_are_throttled(store, monkeypatch):
+    calls = []
+    real_verify = auth.averify_password
+
+    async def counting_verify(plain, hashed):
+        calls.append(plain)
+        return await real_verify(plain, hashed)
+
+    monkeypatch.setattr(auth, "averify_password", counting_verify)
+
+    async def run():
+        async with client() as c:
+            ok = await c.post("/api/login", json={"username": "erin", "password": "secret"})
+            failures = [await c.post("/api/login", json={"username": "erin", "password": "wrong"}) for _ in range(3)]
+            blocked = await c.post("/api/login", json={"username": "erin", "password": "secret"})
+            return ok, failures, blocked
+
+    ok, failures, blocked = asyncio.run(run())
+    assert ok.status_code == 200
+    assert [r.status_code for r in failures] == [400, 400, 400]
+    assert blocked.status_code == 429 and int(blocked.headers["Retry-After"]) > 0
+    assert len(calls) == 4  # the blocked attempt never reached the hasher
+
+def test_throttle_drops_expired_keys_and_stays_bounded():
+    now = [0.0]
+    throttle = auth.LoginThrottle(max_failures=2, window=60, max_keys=3, clock=lambda: now[0])
+    throttle.fail("user:a", "ip:1")
+    now[0] = 61
+    throttle.fail("user:b")
+    assert list(throttle.failures) == ["user:b"]  # a and 1 expired
+
+    for name in "cdef":
+        throttle.fail(f"user:{name}")
+    assert list(throttle.failures) == ["user:d", "user:e", "user:f"]
+
+    throttle.fail("user:f")
+    assert throttle.retry_after("user:f") == 60 and throttle.retry_after("user:e") == 0
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import auth
+import engine_micro
+import engines
+import generate_complex_data
+import main
+import snapshot
+from compaction import RAW_SCHEMA, compact_frame, frame_bytes
+from engine_micro import MicroEngine
+
+def test_compact_frame_keeps_values_and_shrinks_memory(tmp_path):
+    path = tmp_path / "data.csv"
+    generate_complex_data.generate_data(str(path), seed=9, scale=3)
+    raw = pd.read_csv(path)
+    compact = compact_frame(raw)
+
+    for col, kind in RAW_SCHEMA.items():
+        if kind == "category":
+            assert isinstance(compact[col].dtype, pd.CategoricalDtype), col
+        else:
+            assert compact[col].dtype == np.dtype(kind), col
+    assert compact["Source_ID"].isna().sum() == raw["Source_ID"].isna().sum()
+    pd.testing.assert_frame_equal(
+        compact.drop(columns=["YoY_Change"]).astype(object), raw.drop(columns=["YoY_Change"]).astype(object))
+    np.testing.assert_allclose(compact["YoY_Change"], raw["YoY_Change"], atol=1e-5)
+    assert frame_bytes(compact) * 10 < frame_bytes(raw)
+
+def test_columns_outside_the_schema():
+    df = pd.DataFrame({
+        "Label": ["a", "b"] * 50,
+        "Note": [f"note {i}" for i in range(100)],
+        "Count": np.arange(100, dtype=np.int64),
+        "Year": [2025] * 99 + [None],
+    })
+    compact = compact_frame(df)
+    assert isinstance(compact["Label"].dtype, pd.CategoricalDtype)
+    assert compact["Note"].dtype == df["Note"].dtype  # mostly distinct: left alone
+    assert compact["Count"].dtype == np.int8
+    assert compact["Year"].isna().sum() == 1  # NaN cannot go to int16; kept as loaded
+
+def test_engine_loads_compact_data_and_reports_memory(tmp_path, monkeypatch, signed_in):
+    source = tmp_path / "memory_complex_data.csv"
+    generate_complex_data.generate_data(str(source), seed=2, scale=2)
+    monkeypatch.setattr(engine_micro, "DATA_PATH", str(source))
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.delenv("GOOGLE_SHEET_ID", raising=False)
+
+    for _ in range(2):  # CSV, then snapshot
+        engine = MicroEngine()
+        assert isinstance(engine.raw_df["District"].dtype, pd.CategoricalDtype)
+        assert engine.raw_df["Year"].dtype == np.int16
+        assert "text_representation" not in engine.df.columns
+        assert engine.search("rent in Maadi")
+
+        report = engine.memory_report()
+        parts = ["raw_df", "pivot_df", "tfidf_matrix", "filter_index", "cube"]
+        assert all(report[p] > 0 for p in parts)
+        assert report["total"] == sum(report[p] for p in parts)
+
+    monkeypatch.setattr(engines.micro_engine, "_instance", engine)
+    client = TestClient(main.app)
+    assert client.get("/api/admin/memory").status_code == 403
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "s3cret")
+    body = client.get("/api/admin/memory", headers={"X-Admin-Token": "s3cret"}).json()
+    assert body["engines"]["micro"]["raw_rows"] == len(engine.raw_df)
+    assert body["process_rss"] is None or body["process_rss"] > 0
@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import generate_complex_data
+import main
+from cube import MetricCube
+from http_cache import VersionedResponseCache
+
+@pytest.fixture(scope="module")
+def raw():
+    return pd.concat(generate_complex_data.generate_frames(seed=4, scale=2)).astype(
+        {"Governorate": str, "District": str, "Industry": str, "Sector": str, "Sub_Sector": str, "Indicator": str, "Quarter": str})
+
+def expected(raw, group_by, filters):
+    rows = raw
+    for col, value in filters.items():
+        accepted = value if isinstance(value, list) else [value]
+        rows = rows[rows[col].astype(str).isin([str(v) for v in accepted])]
+    agg = rows.groupby(group_by)["Value"].agg(["sum", "mean", "count", "min", "max"]).reset_index()
+    return agg.sort_values(group_by).reset_index(drop=True)
+
+QUERIES = [
+    (["Governorate", "Year"], {"Industry": "Agriculture"}),
+    (["Sector", "Quarter"], {"Year": "2024", "Governorate": ["Cairo", "Giza"]}),
+    (["District"], {"Indicator": "Avg Rent (Sqm)", "Year": 2025}),
+    (["Year", "Industry"], {}),
+    (["Indicator", "District", "Quarter"], {"District": "Maadi #1"}),
+]
+
+@pytest.mark.parametrize("max_cells", [None, 0])  # 0: only the base cuboid, every query re-aggregates
+@pytest.mark.parametrize("group_by, filters", QUERIES)
+def test_queries_match_a_groupby_of_the_source_rows(raw, group_by, filters, max_cells):
+    cube = MetricCube(raw) if max_cells is None else MetricCube(raw, max_cells=max_cells)
+    result = cube.query(group_by, filters)
+    got = pd.DataFrame(result["cells"])
+    want = expected(raw, group_by, filters)
+
+    assert result["total_cells"] == len(want) and not result["truncated"]
+    assert got[group_by].astype(str).values.tolist() == want[group_by].astype(str).values.tolist()
+    for measure in ["sum", "mean", "min", "max"]:
+        np.testing.assert_allclose(got[measure], want[measure], rtol=1e-6)
+    assert got["count"].tolist() == want["count"].tolist()
+
+def test_grand_total_missing_values_and_limit(raw):
+    raw = raw.copy()
+    raw.loc[raw["District"] == "Maadi", "Value"] = np.nan
+    cube = MetricCube(raw)
+
+    total = cube.query([], {})["cells"]
+    assert total == [pytest.approx({
+        "sum": raw["Value"].sum(), "mean": raw["Value"].mean(), "count": int(raw["Value"].count()),
+        "min": raw["Value"].min(), "max": raw["Value"].max(),
+    })]
+
+    maadi = cube.query(["District"], {"District": "Maadi"}, measures=["sum", "count"])["cells"]
+    assert maadi == [{"District": "Maadi", "sum": None, "count": 0}]
+
+    page = cube.query(["District"], {}, limit=5)
+    assert len(page["cells"]) == 5 and page["truncated"] and page["total_cells"] == raw["District"].nunique()
+
+    with pytest.raises(ValueError):
+        cube.query(["Value"], {})
+    with pytest.raises(ValueError):
+        cube.query(["Year"], {}, measures=["median"])
+
+def test_query_uses_the_smallest_covering_rollup(raw):
+    cube = MetricCube(raw)
+    assert cube.query(["Industry"], {})["cuboid"] == ["Industry"]
+    assert cube.query(["Year"], {"Governorate": "Cairo"})["cuboid"] == ["Governorate", "Year"]
+    assert len(cube.cuboids) == 3 * 5 * 3
+
+class StubMicro:
+    data_version = 0
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.state = SimpleNamespace(cube=cube)
+        self.dimension_builds = 0
+
+    def query_cube(self, group_by, filters, measures, limit):
+        return self.cube.query(group_by, filters, measures, limit) if self.cube else None
+
+    def cube_dimensions(self):
+        self.dimension_builds += 1
+        return {"dimensions": self.cube.dimensions()} if self.cube else None
+
+def test_cube_endpoints(raw, monkeypatch, signed_in):
+    client = TestClient(main.app)
+    micro = StubMicro(MetricCube(raw))
+    monkeypatch.setattr(main, "micro_engine", micro)
+    monkeypatch.setattr(main, "metadata_cache", VersionedResponseCache())
+    response = client.post("/api/cube/query", json={"group_by": ["Industry"], "filters": {"Year": 2025}})
+    assert [c["Industry"] for c in response.json()["cells"]] == ["Agriculture", "Manufacturing", "Real Estate"]
+    assert client.post("/api/cube/query", json={"group_by": ["Nope"]}).status_code == 400
+    assert client.get("/api/cube").json()["dimensions"]["time"][0]["members"] == [2023, 2024, 2025]
+    etag = client.get("/api/cube").headers["etag"]
+    assert client.get("/api/cube", headers={"If-None-Match": etag}).status_code == 304
+    assert micro.dimension_builds == 1  # built once per data version, not per request
+
+    monkeypatch.setattr(main, "micro_engine", StubMicro(None))
+    assert client.post("/api/cube/query", json={"group_by": ["Industry"]}).status_code == 503
+    assert client.get("/api/cube").status_code == 503
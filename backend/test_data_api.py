@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import engine_micro
+import generate_complex_data
+import main
+import snapshot
+from engine_micro import FilterIndex, MicroEngine
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    source = tmp_path / "data_api_complex_data.csv"
+    generate_complex_data.generate_data(str(source), seed=11, scale=3)
+    monkeypatch.setattr(engine_micro, "DATA_PATH", str(source))
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.delenv("GOOGLE_SHEET_ID", raising=False)
+    return MicroEngine()
+
+@pytest.fixture
+def client(engine, monkeypatch, signed_in):
+    monkeypatch.setattr(main, "micro_engine", engine)
+    return TestClient(main.app)
+
+def test_cursor_pages_cover_every_row_once_in_sort_order(engine, client):
+    expected = engine.filter_data({"min_traffic": 1000})
+    seen, cursor = [], None
+    while True:
+        body = {"filters": {"min_traffic": 1000}, "sort_by": "Foot_Traffic_Score", "descending": True, "limit": 7}
+        if cursor:
+            body["cursor"] = cursor
+        page = client.post("/api/data", json=body).json()
+        assert page["total"] == len(expected) and len(page["data"]) <= 7
+        seen += page["data"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(r["District"] for r in seen) == sorted(r["District"] for r in expected)
+    traffic = [r["Foot_Traffic_Score"] for r in seen]
+    assert traffic == sorted(traffic, reverse=True)
+
+def test_projection_and_internal_columns(engine, client):
+    page = client.post("/api/data", json={"filters": {}, "fields": ["District", "Avg_Rent_Sqm_EGP"], "limit": 5}).json()
+    assert [set(r) for r in page["data"]] == [{"District", "Avg_Rent_Sqm_EGP"}] * 5
+
+    full = client.post("/api/data", json={"filters": {}}).json()["data"]
+    assert "text_representation" not in engine.df.columns
+    assert all("text_representation" not in r for r in full)
+    assert len(full) == len(engine.df)
+
+    response = client.post("/api/data", json={"filters": {}, "fields": ["text_representation"]})
+    assert response.status_code == 400
+
+def test_returned_rows_do_not_alias_the_index(engine):
+    for rows in (engine.query_page({}, limit=3)["data"], engine.filter_data({}), engine.retrieve("rent under 100000")):
+        rows[0]["relevance_score"] = 1.0
+    assert all("relevance_score" not in r for r in engine.query_page({})["data"])
+
+def test_missing_values_sort_last_and_serialize_as_null():
+    index = FilterIndex(pd.DataFrame({
+        "District": ["A", "B", "C", "D"],
+        "Foot_Traffic_Score": [2.0, np.nan, 3.0, 1.0],
+        "text_representation": ["a", "b", "c", "d"],
+    }))
+    ids = index.query({})
+    assert [r["District"] for r in index.rows(index.order(ids, "Foot_Traffic_Score"))] == ["D", "A", "C", "B"]
+    assert [r["District"] for r in index.rows(index.order(ids, "Foot_Traffic_Score", descending=True))] == ["C", "A", "D", "B"]
+    assert index.rows([1], ["Foot_Traffic_Score"]) == [{"Foot_Traffic_Score": None}]
+    assert index.columns == ["District", "Foot_Traffic_Score"]
+
+def test_cursor_from_before_a_reload_is_rejected(engine, client):
+    first = client.post("/api/data", json={"filters": {}, "limit": 10}).json()
+    engine.state.version += 1  # as after a reload publishing new data
+    response = client.post("/api/data", json={"filters": {}, "limit": 10, "cursor": first["next_cursor"]})
+    assert response.status_code == 410
+    assert client.post("/api/data", json={"filters": {}, "cursor": "garbage"}).status_code == 400
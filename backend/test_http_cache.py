@@ -0,0 +1,84 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from http_cache import CachedBody, VersionedResponseCache
+
+class StubMicro:
+    def __init__(self):
+        self.data_version = 0
+        self.districts = [f"District {i}" for i in range(200)]
+        self.calls = 0
+
+    def get_all_districts(self):
+        self.calls += 1
+        return self.districts
+
+    def get_hierarchy_tree(self):
+        return []
+
+class StubMacro:
+    version = 1
+
+    def get_macro_summary(self):
+        return {}
+
+    def get_sector_data(self):
+        return [{"name": "agriculture_gdp", "data": [{"year": "2024", "value": 11.2}]}]
+
+@pytest.fixture
+def micro(monkeypatch):
+    micro = StubMicro()
+    monkeypatch.setattr(main, "micro_engine", micro)
+    monkeypatch.setattr(main, "macro_engine", StubMacro())
+    monkeypatch.setattr(main, "metadata_cache", VersionedResponseCache())
+    return micro
+
+def test_revalidation_returns_304_until_the_data_version_changes(micro):
+    client = TestClient(main.app)
+    first = client.get("/api/districts")
+    assert first.status_code == 200 and first.json()["districts"] == micro.districts
+    etag = first.headers["etag"]
+
+    again = client.get("/api/districts", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert micro.calls == 1  # body built once per data version
+
+    micro.districts = micro.districts + ["New District"]
+    micro.data_version = 1
+    changed = client.get("/api/districts", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert changed.json()["districts"][-1] == "New District"
+
+def test_large_bodies_are_served_precompressed(micro):
+    raw = TestClient(main.app).get("/api/districts", headers={"Accept-Encoding": "gzip"})
+    assert raw.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in raw.headers["vary"]
+
+    plain = TestClient(main.app).get("/api/districts", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert raw.json() == plain.json()
+    # Either representation's tag revalidates
+    assert TestClient(main.app).get(
+        "/api/districts", headers={"Accept-Encoding": "identity", "If-None-Match": raw.headers["etag"]}).status_code == 304
+
+def test_macro_sectors_and_hierarchy_are_cached(micro):
+    client = TestClient(main.app)
+    sectors = client.get("/api/macro/sectors")
+    assert sectors.json()["sectors"][0]["name"] == "agriculture_gdp"
+    assert client.get("/api/macro/sectors", headers={"If-None-Match": sectors.headers["etag"]}).status_code == 304
+
+    tree = client.get("/api/hierarchy")
+    assert tree.json()["tree"][-1]["name"] == "Macroeconomic Sectors"
+    assert client.get("/api/hierarchy", headers={"If-None-Match": tree.headers["etag"]}).status_code == 304
+
+def test_cached_body_negotiation():
+    body = CachedBody({"values": list(range(1000))})
+    assert gzip.decompress(body.variants["gzip"][0]) == body.body
+    assert body.negotiate("gzip;q=0, identity") == "identity"
+    assert body.negotiate("deflate, gzip;q=0.5") == "gzip"
+    assert body.negotiate(None) == "identity"
+    assert CachedBody({"a": 1}).negotiate("gzip") == "identity"  # too small to compress
+    assert body.matches('W/"nope", ' + body.variants["identity"][1])
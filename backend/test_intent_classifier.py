@@ -0,0 +1,62 @@
+import time
+
+import orchestrator as orchestrator_module
+from engine_macro import INDICATORS
+from intent_classifier import LocalIntentClassifier, INTENT_CONFIDENCE_THRESHOLD
+from test_llm_cache import make_orchestrator
+
+DISTRICTS = ["Maadi", "Zamalek", "New Cairo", "Nasr City", "Dokki", "6th of October", "El Gouna"]
+
+def make_classifier():
+    return LocalIntentClassifier(DISTRICTS, INDICATORS)
+
+def test_routes_common_queries():
+    classifier = make_classifier()
+    cases = {
+        "Is it a good time to invest?": "MACRO",
+        "what's the gdp growth": "MACRO",
+        "Rent in Zamalek": "MICRO",
+        "foot traffic New Cairo": "MICRO",
+        "Which districts have rent under 300 and high traffic": "MICRO",
+        "feasibility of a cafe in Maadi given inflation": "HYBRID",
+        "how does the lending rate affect shops in Dokki": "HYBRID",
+        "hello": "GENERAL",
+    }
+    for query, expected in cases.items():
+        intent, confidence = classifier.predict(query)
+        assert intent == expected, query
+        assert confidence >= INTENT_CONFIDENCE_THRESHOLD, query
+
+def test_unrecognised_queries_have_no_confidence():
+    assert make_classifier().predict("zxqv plorb") == ("GENERAL", 0.0)
+
+def test_classification_is_sub_millisecond():
+    classifier = make_classifier()
+    query = "Should I open a cafe in 6th of October given high inflation?"
+    runs = 2000
+    start = time.perf_counter()
+    for _ in range(runs):
+        classifier.predict(query)
+    assert (time.perf_counter() - start) / runs < 0.0005
+
+def test_gemini_only_called_when_unsure():
+    orch = make_orchestrator("MACRO")
+    assert orch.classify_intent("Rent in Maadi") == "MICRO"
+    assert orch.model.calls == 0
+
+    assert orch.classify_intent("zxqv plorb") == "MACRO"
+    assert orch.model.calls == 1
+
+    report = orch.intent_classifier.report()
+    assert report["local"] == 1 and report["fallback"] == 1
+    assert report["fallback_rate"] == 0.5
+
+def test_district_names_follow_reloaded_micro_data(monkeypatch):
+    orch = make_orchestrator("GENERAL")
+    assert orch.classify_intent("Rent in Atlantis") == "GENERAL"  # unknown name, asks the model
+
+    micro = orchestrator_module.micro_engine
+    monkeypatch.setattr(micro, "get_all_districts", lambda: DISTRICTS + ["Atlantis"])
+    monkeypatch.setattr(micro, "data_version", micro.data_version + 1)
+    assert orch.classify_intent("Rent in Atlantis") == "MICRO"
+    assert orch.model.calls == 1
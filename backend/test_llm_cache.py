@@ -0,0 +1,124 @@
+import asyncio
+import time
+from datetime import datetime
+
+import orchestrator as orchestrator_module
+from llm_cache import ResponseCache
+from orchestrator import AIOrchestrator
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Stands in for genai.GenerativeModel and counts round trips."""
+    def __init__(self, text="MICRO", delay=0.0):
+        self.text = text
+        self.delay = delay
+        self.calls = 0
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        self.prompts.append(prompt)
+        if stream:
+            return self._chunks()
+        time.sleep(self.delay)
+        return StubResponse(self.text)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return StubResponse(self.text)
+
+    def _chunks(self):
+        """Yields the response word by word, spreading the delay across chunks."""
+        words = self.text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.delay / len(words))
+            yield StubResponse(word if i == 0 else " " + word)
+
+def make_orchestrator(text="MICRO", delay=0.0):
+    orch = AIOrchestrator()
+    orch.model = StubModel(text, delay)
+    return orch
+
+def test_lru_evicts_oldest_within_byte_budget():
+    cache = ResponseCache(max_bytes=10, ttl_seconds=60)
+    cache.put("aaaa", "q1")
+    cache.put("bbbb", "q2")
+    assert cache.get("q1") == "aaaa"  # q1 is now most recently used
+    cache.put("cccc", "q3")
+
+    assert cache.get("q2") is None
+    assert cache.get("q1") == "aaaa"
+    assert cache.get("q3") == "cccc"
+    assert cache.bytes_used <= 10
+    assert cache.stats["evictions"] == 1
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl_seconds=0.05)
+    cache.put("answer", "q")
+    assert cache.get("q") == "answer"
+    time.sleep(0.1)
+    assert cache.get("q") is None
+    assert cache.bytes_used == 0
+
+def test_key_covers_all_prompt_inputs():
+    cache = ResponseCache()
+    cache.put("retail answer", "Rent in Maadi?", user_industry="Retail")
+    assert cache.get("  rent in   MAADI ", user_industry="Retail") == "retail answer"
+    assert cache.get("Rent in Maadi?", user_industry="F&B") is None
+
+def test_repeat_questions_cost_no_model_calls():
+    orch = make_orchestrator("MICRO")
+    context = {"filters": {"districts": ["Maadi"]}, "visible_data": [{"District": "Maadi"}]}
+
+    first = orch.process_query("Rent in Maadi?", user_industry="Retail", dashboard_context=context)
+    calls = orch.model.calls
+    second = orch.process_query("rent in maadi", user_industry="Retail", dashboard_context=context)
+
+    assert calls == 1  # intent is routed locally; only the answer hits the model
+    assert orch.model.calls == calls
+    assert first == second
+
+    # A different dashboard context is a different prompt
+    orch.process_query("Rent in Maadi?", user_industry="Retail", dashboard_context={"filters": {}})
+    assert orch.model.calls == calls + 1
+
+def test_answers_survive_macro_refreshes_that_change_nothing(monkeypatch):
+    orch = make_orchestrator("MICRO")
+    macro = orchestrator_module.macro_engine
+    orch.generate_llm_response("Rent in Maadi?", "MICRO", {})
+
+    monkeypatch.setattr(macro, "last_fetch", datetime.now())  # refreshed, every indicator unchanged
+    orch.generate_llm_response("Rent in Maadi?", "MICRO", {})
+    assert orch.model.calls == 1
+
+    monkeypatch.setattr(macro, "version", macro.version + 1)  # a changed summary was published
+    orch.generate_llm_response("Rent in Maadi?", "MICRO", {})
+    assert orch.model.calls == 2
+
+def test_near_duplicate_tier_matches_paraphrases():
+    orch = make_orchestrator("MICRO")
+    orch.cache.similarity_threshold = 0.8
+
+    orch.generate_llm_response("Maadi rent price", "MICRO", {})
+    orch.generate_llm_response("what is the rent price in maadi", "MICRO", {})
+    assert orch.model.calls == 1
+    assert orch.cache.stats["near_hits"] == 1
+
+def test_insights_are_cached_per_filters():
+    orch = make_orchestrator("💡 Maadi leads on rent.")
+    orch.generate_proactive_insight({"metric": "rent"}, "Maadi: 500")
+    orch.generate_proactive_insight({"metric": "rent"}, "Maadi: 500")
+    orch.generate_proactive_insight({"metric": "traffic"}, "Maadi: 500")
+    assert orch.model.calls == 2
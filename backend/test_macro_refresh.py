@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from engine_macro import MacroEngine, INDICATORS
+
+# Simulated upstream latency per indicator request
+DELAY = 0.3
+
+class StubWorldBank(BaseHTTPRequestHandler):
+    """Answers /<indicator>?format=json like api.worldbank.org does, with ETag support."""
+    hits = 0
+    not_modified = 0
+    hits_lock = threading.Lock()
+    value = 10.0
+
+    def do_GET(self):
+        with StubWorldBank.hits_lock:
+            StubWorldBank.hits += 1
+        time.sleep(DELAY)
+        etag = f'"v{StubWorldBank.value}"'
+        if self.headers.get("If-None-Match") == etag:
+            with StubWorldBank.hits_lock:
+                StubWorldBank.not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps([
+            {"page": 1, "pages": 1, "per_page": 5, "total": 2},
+            [
+                {"date": "2024", "value": StubWorldBank.value},
+                {"date": "2023", "value": StubWorldBank.value - 1},
+            ],
+        ]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    StubWorldBank.hits = 0
+    StubWorldBank.not_modified = 0
+    StubWorldBank.value = 10.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWorldBank)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+def expire(engine):
+    for name in engine.fetched_at:
+        engine.fetched_at[name] = datetime.now() - timedelta(days=30)
+
+def wait_until_fresh(engine):
+    deadline = time.time() + 5
+    while engine.is_stale() and time.time() < deadline:
+        time.sleep(0.05)
+
+def test_cold_fetch_is_parallel(tmp_path):
+    server, url = start_server()
+    try:
+        engine = MacroEngine(base_url=url, cache_path=str(tmp_path / "macro.sqlite"))
+        start = time.perf_counter()
+        summary = engine.get_macro_summary()
+        elapsed = time.perf_counter() - start
+
+        assert set(summary) == set(INDICATORS)
+        assert summary["inflation"]["latest_year"] == "2024"
+        # Sequential fetching would take len(INDICATORS) * DELAY
+        assert elapsed < DELAY * 3
+    finally:
+        server.shutdown()
+
+def test_concurrent_cold_callers_share_one_refresh(tmp_path):
+    server, url = start_server()
+    try:
+        engine = MacroEngine(base_url=url, cache_path=str(tmp_path / "macro.sqlite"))
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(engine.get_macro_summary())) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(results) == 20
+        assert all(set(r) == set(INDICATORS) for r in results)
+        assert StubWorldBank.hits == len(INDICATORS)
+    finally:
+        server.shutdown()
+
+def test_expired_cache_is_served_while_revalidating(tmp_path):
+    server, url = start_server()
+    try:
+        engine = MacroEngine(base_url=url, cache_path=str(tmp_path / "macro.sqlite"))
+        engine.get_macro_summary()
+        expire(engine)
+        StubWorldBank.value = 20.0
+
+        # Every caller gets the stale summary immediately; only one refresh goes upstream
+        start = time.perf_counter()
+        for _ in range(10):
+            stale = engine.get_macro_summary()
+        assert time.perf_counter() - start < DELAY
+        assert stale["inflation"]["latest_value"] == 10.0
+
+        wait_until_fresh(engine)
+        assert engine.get_macro_summary()["inflation"]["latest_value"] == 20.0
+        assert StubWorldBank.hits == 2 * len(INDICATORS)
+    finally:
+        server.shutdown()
+
+def test_sector_data_uses_shared_cache(tmp_path):
+    server, url = start_server()
+    try:
+        engine = MacroEngine(base_url=url, cache_path=str(tmp_path / "macro.sqlite"))
+        sectors = engine.get_sector_data()
+        assert [s["name"] for s in sectors] == ["agriculture_gdp", "manufacturing_gdp", "services_gdp", "exports_gdp"]
+        engine.get_sector_data()
+        assert StubWorldBank.hits == len(INDICATORS)
+    finally:
+        server.shutdown()
+
+def test_restart_serves_from_disk_without_network(tmp_path):
+    server, url = start_server()
+    try:
+        cache_path = str(tmp_path / "macro.sqlite")
+        MacroEngine(base_url=url, cache_path=cache_path).get_macro_summary()
+        assert StubWorldBank.hits == len(INDICATORS)
+
+        # A new process (or worker) starts warm from the durable cache
+        restarted = MacroEngine(base_url="http://127.0.0.1:9/", cache_path=cache_path)
+        summary = restarted.get_macro_summary()
+        assert set(summary) == set(INDICATORS)
+        assert not restarted.is_stale()
+        assert StubWorldBank.hits == len(INDICATORS)
+    finally:
+        server.shutdown()
+
+def test_expired_series_revalidate_with_304(tmp_path):
+    server, url = start_server()
+    try:
+        cache_path = str(tmp_path / "macro.sqlite")
+        engine = MacroEngine(base_url=url, cache_path=cache_path)
+        engine.get_macro_summary()
+
+        expire(engine)
+        engine.get_macro_summary()
+        wait_until_fresh(engine)
+
+        assert StubWorldBank.not_modified == len(INDICATORS)
+        assert engine.get_macro_summary()["inflation"]["latest_value"] == 10.0
+    finally:
+        server.shutdown()
@@ -0,0 +1,62 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+import metrics
+import orchestrator as orchestrator_module
+from test_llm_cache import make_orchestrator
+
+@pytest.fixture(autouse=True)
+def offline_macro(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.macro_engine, "get_macro_summary", lambda: {})
+
+def sample(text, line_prefix):
+    """Value of the first exposition line starting with line_prefix."""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def test_histogram_exposition_format():
+    hist = metrics.Histogram("test_latency_seconds", "Test histogram.", ["op"], buckets=(0.1, 1.0))
+    try:
+        hist.observe(0.05, op="read")
+        hist.observe(0.5, op="read")
+        text = metrics.render()
+    finally:
+        metrics.REGISTRY.remove(hist)
+
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{op="read",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{op="read",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{op="read"} 2' in text
+
+def test_query_stages_and_cache_show_up_on_metrics(monkeypatch, signed_in):
+    monkeypatch.setattr(main, "orchestrator", make_orchestrator("Maadi is busy."))
+    before = metrics.render()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for _ in range(2):
+                assert (await client.post("/api/query", json={"text": "Rent in Maadi"})).status_code == 200
+            return await client.get("/metrics")
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    def delta(prefix):
+        return (sample(text, prefix) or 0) - (sample(before, prefix) or 0)
+
+    for stage in ["intent", "micro", "prompt"]:
+        assert delta(f'query_stage_seconds_count{{stage="{stage}"}}') == 2
+    assert delta('query_stage_seconds_count{stage="generate"}') == 1  # second answer is cached
+    assert delta('llm_cache_lookups_total{result="hit"}') >= 1
+    assert delta('http_request_seconds_count{method="POST",route="/api/query",status="200"}') == 2
+    assert sample(text, 'data_load_seconds_count{source="micro"}') >= 1
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import engine_micro
+import engines
+import main
+import snapshot
+from engine_micro import MicroEngine
+
+def write_source(path, maadi_rent, maadi_sector="Retail"):
+    rows = []
+    for district, rent, traffic in [("Maadi", maadi_rent, 3200), ("Zamalek", 2800, 2500), ("Dokki", 2500, 1800)]:
+        sector = maadi_sector if district == "Maadi" else "Retail"
+        rows.append({"District": district, "Indicator": "Avg Rent (Sqm)", "Value": rent, "Year": 2025, "Sector": sector, "Sub_Sector": "Shops"})
+        rows.append({"District": district, "Indicator": "Foot Traffic Score", "Value": traffic, "Year": 2025, "Sector": "Retail", "Sub_Sector": "Shops"})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    source = tmp_path / "reload_complex_data.csv"
+    write_source(source, maadi_rent=2000)
+    monkeypatch.setattr(engine_micro, "DATA_PATH", str(source))
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.delenv("GOOGLE_SHEET_ID", raising=False)
+    engine = MicroEngine()
+    engine.source = source
+    return engine
+
+def test_second_engine_attaches_shared_index(engine, monkeypatch):
+    # Another worker on the same source maps the first one's TF-IDF index instead of refitting it
+    monkeypatch.setattr(MicroEngine, "init_vector_search", lambda self, data: pytest.fail("index rebuilt"))
+    other = MicroEngine()
+    assert other.state.shared
+    assert (other.tfidf_matrix != engine.tfidf_matrix).nnz == 0
+    assert not other.tfidf_matrix.data.flags.writeable
+    assert other.search("rent in Maadi")[0]["District"] == "Maadi"
+
+def test_index_stays_private_when_snapshot_extras_cannot_be_saved(tmp_path, monkeypatch):
+    source = tmp_path / "unsaved_complex_data.csv"
+    write_source(source, maadi_rent=2000)
+    monkeypatch.setattr(engine_micro, "DATA_PATH", str(source))
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.delenv("GOOGLE_SHEET_ID", raising=False)
+    monkeypatch.setattr(snapshot.ColumnarSnapshot, "save_extras", lambda self, arrays, objects: False)
+
+    engine = MicroEngine()
+    assert not engine.state.shared
+    assert engine.tfidf_matrix.data.flags.writeable
+    assert engine.search("rent in Maadi")[0]["District"] == "Maadi"
+
+def maadi_rent(engine):
+    return engine.filter_data({"districts": ["Maadi"]})[0]["Avg_Rent_Sqm_EGP"]
+
+def test_reload_publishes_changed_data(engine):
+    assert engine.data_version == 0 and maadi_rent(engine) == 2000
+
+    assert engine.reload()["status"] == "unchanged"
+    assert engine.data_version == 0
+
+    write_source(engine.source, maadi_rent=4000)
+    result = engine.reload()
+    assert result["status"] == "reloaded" and result["version"] == 1
+    assert maadi_rent(engine) == 4000
+    assert engine.search("Maadi")[0]["Avg_Rent_Sqm_EGP"] == 4000
+
+    # Same pivot, different long-format rows: the cube must not go stale
+    write_source(engine.source, maadi_rent=4000, maadi_sector="Office")
+    result = engine.reload()
+    assert result["status"] == "reloaded" and result["version"] == 2
+    assert "Office" in set(engine.raw_df["Sector"])
+
+def test_readers_are_not_blocked_during_reload(engine, monkeypatch):
+    write_source(engine.source, maadi_rent=4000)
+    build = engine.init_vector_search
+
+    def slow_build(data):
+        time.sleep(0.5)
+        build(data)
+
+    monkeypatch.setattr(engine, "init_vector_search", slow_build)
+    reloader = threading.Thread(target=engine.reload)
+    reloader.start()
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert maadi_rent(engine) == 2000  # still the published generation
+    assert engine.search("Maadi")[0]["Avg_Rent_Sqm_EGP"] == 2000
+    assert time.perf_counter() - start < 0.2
+    assert engine.reload()["status"] == "busy"
+
+    reloader.join()
+    assert maadi_rent(engine) == 4000 and engine.data_version == 1
+
+def test_reload_endpoint_requires_admin_token(engine, monkeypatch, signed_in):
+    monkeypatch.setattr(engines.micro_engine, "_instance", engine)
+    client = TestClient(main.app)
+    # No ADMIN_TOKEN configured: closed to everyone
+    assert client.post("/api/admin/reload-micro", headers={"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/api/admin/reload-micro").status_code == 403
+    assert client.post("/api/admin/reload-micro", headers={"X-Admin-Token": "guess"}).status_code == 403
+    response = client.post("/api/admin/reload-micro", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200 and response.json()["status"] == "unchanged"
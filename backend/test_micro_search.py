@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from engine_micro import MicroEngine
+
+QUERIES = ["rent in Maadi", "cheap rent high traffic", "Zamalek competitors", "New Cairo", "xyz"]
+
+def test_search_many_matches_brute_force_cosine():
+    engine = MicroEngine()
+    batch = engine.search_many(QUERIES, top_k=3)
+    rows = {d: i for i, d in enumerate(engine.df["District"])}
+
+    assert len(batch) == len(QUERIES)
+    for query, results in zip(QUERIES, batch):
+        # Reference: dense cosine over every row, full sort, threshold, top 3
+        similarity = cosine_similarity(engine.vectorizer.transform([query]), engine.tfidf_matrix).ravel()
+        expected = [s for s in similarity[np.argsort(-similarity, kind="stable")] if s > 0.1][:3]
+
+        scores = [r["relevance_score"] for r in results]
+        assert scores == pytest.approx(expected)
+        # Each row is the one that earned its score (ties may come in either order)
+        for r in results:
+            assert similarity[rows[r["District"]]] == pytest.approx(r["relevance_score"])
+        assert results == engine.search(query, top_k=3)
+
+    assert batch[0][0]["District"] == "Maadi"
+    assert batch[-1] == []
+
+def test_keyword_search_matches_districts_or_top_traffic():
+    engine = MicroEngine()
+    assert [r["District"] for r in engine._keyword_search("Rent in ZAMALEK")] == ["Zamalek"]
+
+    default = engine._keyword_search("nothing relevant")
+    expected = engine.df.nlargest(3, "Foot_Traffic_Score")["District"].tolist()
+    assert [r["District"] for r in default] == expected
@@ -0,0 +1,42 @@
+from prompt_builder import PromptBuilder, estimate_tokens
+
+SUMMARY = {
+    "inflation": {"latest_value": 33.9, "latest_year": "2023", "trend": [{"year": "2022", "value": 13.9}, {"year": "2023", "value": 33.9}]},
+    "gdp_growth": {"latest_value": 3.8, "latest_year": "2023", "trend": [{"year": "2023", "value": 3.8}]},
+}
+
+def row(district, rent):
+    return {"District": district, "Avg_Rent_Sqm_EGP": rent, "Foot_Traffic_Score": 2500.123,
+            "Competitor_Density": "High", "Vacancy_Rate": 0.1, "Source_ID": f"FS_{district.upper()}_001",
+            "text_representation": "x " * 50}
+
+def test_keeps_relevant_indicators_and_columns():
+    rendered = PromptBuilder().render("how does inflation affect rent in Maadi", {"macro": SUMMARY, "micro": [row("Maadi", 2234.5)]})
+
+    assert "inflation | 33.9 | 2023 | 2022: 13.9, 2023: 33.9" in rendered["macro"]
+    assert "gdp_growth" not in rendered["macro"]
+    assert rendered["micro"].splitlines() == [
+        "District | Avg_Rent_Sqm_EGP | Foot_Traffic_Score | Competitor_Density | Source_ID",
+        "Maadi | 2234.5 | 2500.12 | High | FS_MAADI_001",
+    ]
+
+    # No indicator named: all of them, latest values only
+    general = PromptBuilder().render("is it a good time to invest", {"macro": SUMMARY})["macro"]
+    assert "inflation" in general and "gdp_growth" in general and "Trend" not in general
+
+def test_dashboard_rows_are_deduplicated_and_budgeted():
+    builder = PromptBuilder(token_budget=75)
+    dashboard = {"filters": {"min_rent": 2000, "districts": []}, "visible_data": [row("Maadi", 1), row("Zamalek", 2), row("Dokki", 3)]}
+    rendered = builder.render("rent", {"micro": [row("Maadi", 1)]}, dashboard)
+
+    assert rendered["view"] == "min_rent=2000"
+    assert "Maadi" not in rendered["visible"]
+    assert rendered["visible"].startswith("District |")
+    assert "more rows omitted" in rendered["visible"]
+
+def test_prompt_tokens_are_reported():
+    builder = PromptBuilder()
+    assert builder.record("x" * 400) == estimate_tokens("x" * 400) == 100
+    builder.record("x" * 200)
+    report = builder.report()
+    assert report["prompts"] == 2 and report["max_tokens"] == 100 and report["last_tokens"] == 50
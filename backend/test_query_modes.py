@@ -0,0 +1,56 @@
+import json
+import time
+
+import pytest
+
+import orchestrator as orchestrator_module
+from test_llm_cache import make_orchestrator
+
+MACRO_SUMMARY = {"inflation": {"latest_value": 33.9, "latest_year": "2023", "trend": []}}
+
+# Unknown to the local router, so it has to ask the model
+UNSURE_QUERY = "zxqv plorb"
+
+@pytest.fixture(autouse=True)
+def offline_macro(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.macro_engine, "get_macro_summary", lambda: MACRO_SUMMARY)
+
+def test_single_call_returns_same_shape():
+    orch = make_orchestrator(json.dumps({"intent": "MACRO", "answer": "Inflation is 33.9% [Source: System]"}))
+    result = orch.process_query(UNSURE_QUERY, single_call=True)
+
+    assert set(result) == {"intent", "response", "data_context"}
+    assert result["intent"] == "MACRO"
+    assert result["response"] == "Inflation is 33.9% [Source: System]"
+    assert result["data_context"] == {"macro": MACRO_SUMMARY}
+    assert orch.model.calls == 1
+    assert "MACRO DATA" in orch.model.prompts[0] and '"intent"' in orch.model.prompts[0]
+
+def test_unparseable_output_is_kept_as_answer():
+    orch = make_orchestrator("Plain text answer")
+    result = orch.process_query(UNSURE_QUERY, single_call=True)
+    assert result["intent"] == "GENERAL"
+    assert result["response"] == "Plain text answer"
+    assert result["data_context"] == {}
+
+def test_confident_queries_skip_the_combined_prompt():
+    orch = make_orchestrator("Maadi rent is high.")
+    result = orch.process_query("Rent in Maadi", single_call=True)
+    assert result["intent"] == "MICRO"
+    assert orch.model.calls == 1
+    assert '"intent"' not in orch.model.prompts[0]
+
+def test_single_call_halves_latency():
+    delay = 0.2
+    two_calls = make_orchestrator("MACRO", delay=delay)
+    start = time.perf_counter()
+    two_calls.process_query(UNSURE_QUERY, single_call=False)
+    two_call_time = time.perf_counter() - start
+
+    one_call = make_orchestrator(json.dumps({"intent": "MACRO", "answer": "ok"}), delay=delay)
+    start = time.perf_counter()
+    one_call.process_query(UNSURE_QUERY, single_call=True)
+    one_call_time = time.perf_counter() - start
+
+    assert two_calls.model.calls == 2 and one_call.model.calls == 1
+    assert one_call_time < two_call_time * 0.6
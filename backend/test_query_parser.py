@@ -0,0 +1,50 @@
+import engine_micro
+from engine_micro import MicroEngine
+from query_parser import QueryConstraintParser
+
+def test_parses_ranges_districts_and_density():
+    parser = QueryConstraintParser(["Maadi", "New Cairo", "Zamalek"])
+
+    assert parser.parse("districts with rent under 3,000 and high traffic") == {"max_rent": 3000.0}
+    assert parser.parse("rent per sqm between 2.9k and 2500 in new cairo") == {
+        "min_rent": 2500.0, "max_rent": 2900.0, "districts": ["New Cairo"],
+    }
+    assert parser.parse("foot traffic above 2500 with very high competition") == {
+        "min_traffic": 2500.0, "competitor_density": ["Very High"],
+    }
+    # The bound binds to the nearest metric, not across a conjunction
+    assert parser.parse("traffic and rent under 3000") == {"max_rent": 3000.0}
+    assert parser.parse("hello there") == {}
+
+    # What the filters do not cover is left for ranking
+    assert parser.residual("rent per sqm under 3000 in Maadi near the metro") == "in near the metro"
+    assert parser.residual("high competition districts") == "districts"
+
+def test_retrieve_returns_exact_rows_for_constraints():
+    engine = MicroEngine()
+
+    rows = engine.retrieve("districts with rent under 2500 and high traffic")
+    assert rows
+    assert all(r["Avg_Rent_Sqm_EGP"] <= 2500 for r in rows)
+    assert len(rows) == len(engine.filter_data({"max_rent": 2500}))
+
+    assert [r["District"] for r in engine.retrieve("what is the rent in Zamalek?")] == ["Zamalek"]
+
+def test_retrieve_ranks_matches_by_the_rest_of_the_query(monkeypatch):
+    engine = MicroEngine()
+    monkeypatch.setattr(engine_micro, "MICRO_CONTEXT_MAX_ROWS", 3)
+    matches = engine.filter_data({"max_rent": 3000})
+    quietest = min(matches, key=lambda r: r["Foot_Traffic_Score"])
+
+    # Without the residual text, the lowest-traffic match would be cut; the number in it ranks that row first
+    rows = engine.retrieve(f"rent under 3000 with traffic near {int(quietest['Foot_Traffic_Score'])}")
+    assert len(rows) == 3 and rows[0]["District"] == quietest["District"]
+    # Nothing left to rank by: busiest first
+    rows = engine.retrieve("rent under 3000")
+    assert [r["District"] for r in rows] == [r["District"] for r in sorted(matches, key=lambda r: -r["Foot_Traffic_Score"])[:3]]
+
+def test_retrieve_falls_back_to_vector_search():
+    engine = MicroEngine()
+    assert engine.retrieve("cheap rent high traffic") == engine.search("cheap rent high traffic")
+    # Constraints that match nothing also fall back
+    assert engine.retrieve("rent under 10") == engine.search("rent under 10")
@@ -0,0 +1,54 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from test_llm_cache import make_orchestrator
+
+ANSWER = "Maadi rent averages 2,900 EGP per sqm [Source: FS_LOC_011]"
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_context_arrives_before_generation():
+    orch = make_orchestrator(ANSWER, delay=0.5)
+    events = orch.stream_query("Rent in Maadi")
+
+    start = time.perf_counter()
+    event, payload = next(events)
+    first_event = time.perf_counter() - start
+
+    assert event == "context"
+    assert payload["intent"] == "MICRO"
+    assert payload["data_context"]["micro"]
+    # Time-to-first-event is retrieval only, not generation
+    assert first_event < 0.25
+
+    rest = list(events)
+    assert rest[-1] == ("done", {})
+    tokens = [text for name, text in rest if name == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == ANSWER
+
+def test_streamed_answer_is_cached():
+    orch = make_orchestrator(ANSWER)
+    list(orch.stream_query("Rent in Maadi"))
+    replay = [text for name, text in orch.stream_query("Rent in Maadi") if name == "token"]
+    assert replay == [ANSWER]
+    assert orch.model.calls == 1
+
+def test_stream_endpoint_emits_sse(monkeypatch, signed_in):
+    monkeypatch.setattr(main, "orchestrator", make_orchestrator(ANSWER))
+    response = TestClient(main.app).post("/api/query/stream", json={"text": "Rent in Maadi"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [name for name, _ in events][:2] == ["context", "token"]
+    assert events[-1][0] == "done"
+    assert "".join(data for name, data in events if name == "token") == ANSWER
@@ -0,0 +1,136 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import orchestrator as orchestrator_module
+from scenario import ELASTICITIES, SHOCKS, ScenarioEngine, parse_shocks
+from test_llm_cache import make_orchestrator
+
+MACRO_SUMMARY = {
+    "inflation": {"latest_value": 20.0, "latest_year": "2023", "trend": []},
+    "lending_rate": {"latest_value": 12.0, "latest_year": "2023", "trend": []},
+}
+
+def make_engine():
+    df = pd.DataFrame({
+        "District": ["Maadi", "Zamalek", "Dokki"],
+        "Avg_Rent_Sqm_EGP": [2000.0, 3000.0, np.nan],
+        "Foot_Traffic_Score": [1500.0, 2500.0, 1800.0],
+        "Competitor_Density": ["High", "Low", "Medium"],
+    })
+    return ScenarioEngine(df, MACRO_SUMMARY)
+
+def test_parse_shocks_reads_deltas_and_levels():
+    assert parse_shocks("What if inflation hits 40%?") == ({}, {"inflation": 40.0})
+    assert parse_shocks("inflation +5% and the EGP devalues 20%") == ({"inflation": 5.0, "exchange_rate": 20.0}, {})
+    assert parse_shocks("interest rates cut by 200 bps") == ({"lending_rate": -2.0}, {})
+    assert parse_shocks("inflation in 2025 for Maadi") == ({}, {})
+    assert parse_shocks("What if inflation is 40%?") == ({}, {"inflation": 40.0})
+    assert parse_shocks("inflation of 40%") == ({}, {"inflation": 40.0})
+    assert parse_shocks("an inflation rise of 5%") == ({"inflation": 5.0}, {})
+    assert parse_shocks("rates are cut by 150 bps") == ({"lending_rate": -1.5}, {})
+    assert parse_shocks("a devaluation of 20%") == ({"exchange_rate": 20.0}, {})
+
+def test_parse_shocks_ignores_lookalikes():
+    assert parse_shocks("What if rent growth drops 5%?") == ({}, {})
+    assert parse_shocks("the pound trades at 50 to the dollar") == ({}, {})
+    assert parse_shocks("exchange rate hits 50") == ({}, {})  # a level with no baseline to shock from
+    assert parse_shocks("What if inflation is high and rent rises 5%?") == ({}, {})
+    assert parse_shocks("exchange rates rise 10%") == ({"exchange_rate": 10.0}, {})
+    assert parse_shocks("interest in Maadi grows 10%") == ({}, {})
+
+def test_run_applies_regime_scaled_elasticities_and_pass_through():
+    engine = make_engine()
+    result = engine.run({"inflation": 5})
+    # Inflation at 20% is twice the reference level, so its elasticities double
+    rent = ELASTICITIES["Avg_Rent_Sqm_EGP"]["inflation"] * 2 * 5
+    rows = {r["District"]: r for r in result["rows"]}
+    assert rows["Maadi"]["Avg_Rent_Sqm_EGP_change_pct"] == pytest.approx(rent * 0.85)  # High competition
+    assert rows["Zamalek"]["Avg_Rent_Sqm_EGP_change_pct"] == pytest.approx(rent * 1.2)
+    assert rows["Dokki"]["Avg_Rent_Sqm_EGP_projected"] is None
+    assert rows["Maadi"]["Foot_Traffic_Score_change_pct"] == pytest.approx(ELASTICITIES["Foot_Traffic_Score"]["inflation"] * 2 * 5)
+    assert result["assumptions"]["shocks"] == {"inflation": 5.0}
+
+    assert engine.run(levels={"inflation": 25})["rows"] == result["rows"]
+    named = engine.run({"inflation": 5}, districts=["Zamalek", "Atlantis", "Maadi"])
+    assert [r["District"] for r in named["rows"]] == ["Zamalek", "Maadi"]
+    assert named["summary"] == result["summary"]
+    with pytest.raises(ValueError):
+        engine.run({"unemployment": 1})
+    with pytest.raises(ValueError):
+        engine.run(levels={"exchange_rate": 60})  # no current level to shock from
+
+def test_grid_matches_single_runs_and_floors_at_zero():
+    engine = make_engine()
+    grid = engine.grid({"inflation": [0, 5], "lending_rate": [-2, 2, -500]})
+    assert grid["scenarios"] == 6
+    row = next(r for r in grid["rows"] if r["inflation"] == 5 and r["lending_rate"] == 2)
+    single = engine.run({"inflation": 5, "lending_rate": 2})
+    assert row["Avg_Rent_Sqm_EGP_change_pct"] == pytest.approx(single["summary"]["Avg_Rent_Sqm_EGP"]["change_pct"], abs=1e-3)
+
+    # A huge rate move would push some values negative; they stop at zero instead
+    floored = next(r for r in grid["rows"] if r["inflation"] == 0 and r["lending_rate"] == -500)
+    assert floored["Foot_Traffic_Score_projected_mean"] >= 0
+    with pytest.raises(ValueError):
+        engine.grid({"inflation": list(range(1000)), "lending_rate": list(range(1000))})
+
+def test_ten_thousand_scenario_sweep_within_a_second():
+    engine = make_engine()
+    axes = {"inflation": list(np.linspace(-5, 20, 25)), "lending_rate": list(np.linspace(-5, 5, 20)), "exchange_rate": list(np.linspace(0, 50, 20))}
+    start = time.perf_counter()
+    grid = engine.grid(axes)
+    assert grid["scenarios"] == 10_000
+    assert time.perf_counter() - start < 1.0
+
+def test_monte_carlo_percentiles_match_sampled_projections():
+    engine = make_engine()
+    distributions = {"inflation": {"mean": 5, "std": 3}, "exchange_rate": {"low": 0, "high": 30}}
+    result = engine.monte_carlo(distributions, samples=5000, seed=7)
+    assert result == {**engine.monte_carlo(distributions, samples=5000, seed=7), "seconds": result["seconds"]}
+
+    rng = np.random.default_rng(7)
+    scenarios = np.zeros((5000, len(SHOCKS)))
+    scenarios[:, SHOCKS.index("inflation")] = rng.normal(5, 3, 5000)
+    scenarios[:, SHOCKS.index("exchange_rate")] = rng.uniform(0, 30, 5000)
+    projected = engine.project(engine.column_change(scenarios))
+    maadi = result["rows"][0]
+    for p in (5, 50, 95):
+        assert maadi[f"Avg_Rent_Sqm_EGP_p{p}"] == pytest.approx(np.percentile(projected[:, 0, 0], p), abs=1e-3)
+    assert maadi["Avg_Rent_Sqm_EGP_p5"] < maadi["Avg_Rent_Sqm_EGP_p50"] < maadi["Avg_Rent_Sqm_EGP_p95"]
+
+def test_simulation_mode_narrates_computed_projection(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.macro_engine, "get_macro_summary", lambda: MACRO_SUMMARY)
+    orch = make_orchestrator("Projected table")
+    result = orch.process_query("What if inflation hits 30% for rent in Maadi?", simulation_mode=True)
+
+    scenario = result["data_context"]["scenario"]
+    assert scenario["assumptions"]["shocks"] == {"inflation": 10.0}
+    # Only the district the question is about, however many the table has
+    assert [r["District"] for r in scenario["rows"]] == ["Maadi"]
+    assert "Maadi |" in orch.model.prompts[0]
+    assert "SCENARIO DATA" in orch.model.prompts[0]
+    assert "Use ONLY the projections in SCENARIO DATA" in orch.model.prompts[0]
+
+    # A different shock is a different answer, however similar the wording
+    orch.process_query("What if inflation hits 35% for rent in Maadi?", simulation_mode=True)
+    assert orch.model.calls == 2
+
+def test_scenario_endpoints(monkeypatch, signed_in):
+    engine = make_engine()
+    monkeypatch.setattr(main, "orchestrator", SimpleNamespace(scenario_engine=lambda: engine))
+    client = TestClient(main.app)
+    response = client.post("/api/scenario", json={"shocks": {"inflation": 5}})
+    assert response.status_code == 200 and len(response.json()["rows"]) == 3
+
+    response = client.post("/api/scenario/grid", json={"axes": {"inflation": [0, 5, 10]}})
+    assert response.json()["scenarios"] == 3
+
+    response = client.post("/api/scenario/monte-carlo", json={"distributions": {"inflation": {"mean": 5, "std": 1}}, "samples": 100, "seed": 1})
+    assert set(response.json()["rows"][0]) >= {"Avg_Rent_Sqm_EGP_p5", "Avg_Rent_Sqm_EGP_p95"}
+
+    assert client.post("/api/scenario", json={"shocks": {"unemployment": 1}}).status_code == 400
@@ -0,0 +1,78 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from snapshot import ColumnarSnapshot
+
+def write_source(path, rows=5):
+    df = pd.DataFrame({
+        "District": [f"D{i % 3}" for i in range(rows)],
+        "Value": np.arange(rows, dtype=float),
+        "Year": [2025] * rows,
+        "Source_Verified": [i % 2 == 0 for i in range(rows)],
+        "Source_ID": [None if i % 2 else f"SRC-{i}" for i in range(rows)],
+    })
+    df.to_csv(path, index=False)
+    return pd.read_csv(path)
+
+def test_round_trip_preserves_values_and_dtypes(tmp_path):
+    source = tmp_path / "data.csv"
+    df = write_source(source)
+    snapshot = ColumnarSnapshot(str(source), root=str(tmp_path / "snap"))
+    snapshot.save({"raw": df})
+
+    loaded = snapshot.load()["raw"]
+    pd.testing.assert_frame_equal(loaded, df, check_dtype=False)
+    assert loaded["Value"].dtype == np.float64
+    assert loaded["Source_Verified"].dtype == bool
+
+    categorical = snapshot.load(categorical=("raw",))["raw"]
+    assert isinstance(categorical["District"].dtype, pd.CategoricalDtype)
+    assert categorical["Source_ID"].isna().sum() == df["Source_ID"].isna().sum()
+
+def test_snapshot_invalidated_when_source_changes(tmp_path):
+    source = tmp_path / "data.csv"
+    df = write_source(source)
+    snapshot = ColumnarSnapshot(str(source), root=str(tmp_path / "snap"))
+    snapshot.save({"raw": df})
+    assert snapshot.load() is not None
+
+    write_source(source, rows=8)
+    assert snapshot.load() is None
+
+def test_touched_but_unchanged_source_stays_valid(tmp_path):
+    source = tmp_path / "data.csv"
+    df = write_source(source)
+    snapshot = ColumnarSnapshot(str(source), root=str(tmp_path / "snap"))
+    snapshot.save({"raw": df})
+
+    later = time.time() + 10
+    os.utime(source, (later, later))
+    assert snapshot.is_valid()
+
+def test_extras_are_memory_mapped_and_dropped_with_the_snapshot(tmp_path):
+    source = tmp_path / "data.csv"
+    df = write_source(source)
+    snapshot = ColumnarSnapshot(str(source), root=str(tmp_path / "snap"))
+    assert snapshot.load_extras() is None
+    snapshot.save({"raw": df})
+    snapshot.save_extras({"values": np.arange(4.0)}, {"shape": (2, 2)})
+
+    arrays, objects = snapshot.load_extras()
+    assert objects == {"shape": (2, 2)}
+    assert arrays["values"].tolist() == [0.0, 1.0, 2.0, 3.0]
+    assert not arrays["values"].flags.writeable  # read-only mapping shared between processes
+
+    snapshot.save({"raw": df})
+    assert snapshot.load_extras() is None
+
+def test_categorical_codes_load_without_copy(tmp_path):
+    source = tmp_path / "data.csv"
+    df = write_source(source)
+    snapshot = ColumnarSnapshot(str(source), root=str(tmp_path / "snap"))
+    snapshot.save({"raw": df})
+
+    codes = snapshot.load(categorical=("raw",))["raw"]["District"].array._codes
+    assert isinstance(codes.base, np.memmap) or isinstance(getattr(codes.base, "base", None), np.memmap)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+import engines
+
+# Generous for CI machines; locally `import main` takes ~0.5s
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", 2.0))
+HEAVY_MODULES = ["pandas", "sklearn", "gspread", "google.generativeai"]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def test_import_main_within_budget_and_without_heavy_modules():
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    # Best of three runs, so a cold disk cache doesn't fail the test
+    results = []
+    for _ in range(3):
+        out = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    assert results[0]["loaded"] == []
+    assert min(r["elapsed"] for r in results) < IMPORT_TIME_BUDGET
+
+def test_health_is_live_and_ready_reports_warm_up():
+    import main
+
+    with TestClient(main.app) as client:
+        assert client.get("/health").json() == {"status": "healthy"}
+
+        deadline = time.time() + 60
+        response = client.get("/ready")
+        while response.status_code != 200 and time.time() < deadline:
+            assert response.status_code == 503
+            assert set(response.json()["engines"]) == {"micro", "macro", "orchestrator"}
+            time.sleep(0.1)
+            response = client.get("/ready")
+
+    body = response.json()
+    assert body["ready"] is True
+    assert all(engine["status"] == "ready" for engine in body["engines"].values())
+
+BUILDS = []
+
+def slow_engine():
+    BUILDS.append("slow")
+    time.sleep(1.0)
+    return object()
+
+def broken_engine():
+    BUILDS.append("broken")
+    raise RuntimeError("source unreachable")
+
+def test_async_handlers_wait_for_warm_up_off_the_event_loop(monkeypatch):
+    import main
+    from auth import User, get_current_user
+
+    monkeypatch.setattr(main, "orchestrator", engines.LazyEngine("orchestrator", __name__, "slow_engine"))
+    main.app.dependency_overrides[get_current_user] = lambda: User(username="t", password_hash="x")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as c:
+            query = asyncio.create_task(c.post("/api/query", json={"text": "Rent in Maadi"}))
+            start = time.perf_counter()
+            await asyncio.sleep(0.1)  # the query starts the build meanwhile
+            assert (await c.get("/health")).status_code == 200
+            health = time.perf_counter() - start
+            query.cancel()
+            return health
+
+    try:
+        assert asyncio.run(run()) < 0.5
+    finally:
+        main.app.dependency_overrides.clear()
+
+def test_failed_build_backs_off_before_retrying(monkeypatch):
+    engine = engines.LazyEngine("broken", __name__, "broken_engine")
+    BUILDS.clear()
+    for _ in range(3):
+        try:
+            engine.get()
+        except RuntimeError as e:
+            assert "source unreachable" in str(e)
+    assert BUILDS == ["broken"] and engine.status == "failed"
+
+    monkeypatch.setattr(engines, "ENGINE_RETRY_SECONDS", 0)
+    try:
+        engine.get()
+    except RuntimeError:
+        pass
+    assert BUILDS == ["broken", "broken"]
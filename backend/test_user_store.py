@@ -0,0 +1,70 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import auth
+from user_store import SqliteUserStore
+
+def user(name, industry="General"):
+    return {"username": name, "password_hash": "hash-" + name, "industry": industry}
+
+def test_migrates_legacy_json_once(tmp_path):
+    legacy = tmp_path / "users.json"
+    legacy.write_text(json.dumps({"alice": user("alice", "Retail"), "bob": user("bob")}))
+    db = str(tmp_path / "users.sqlite")
+
+    store = SqliteUserStore(db, legacy_path=str(legacy))
+    assert store.count() == 2
+    assert store.get("alice") == user("alice", "Retail")
+
+    # Changes made after the migration are not overwritten by the JSON file on reopen
+    store.upsert(user("alice", "F&B"))
+    reopened = SqliteUserStore(db, legacy_path=str(legacy))
+    assert reopened.get("alice")["industry"] == "F&B"
+    assert reopened.count() == 2
+
+def test_create_rejects_duplicates_and_upsert_updates(tmp_path):
+    store = SqliteUserStore(str(tmp_path / "users.sqlite"), legacy_path=None)
+    assert store.create(user("carol"))
+    assert not store.create(user("carol", "Retail"))
+    assert store.get("carol")["industry"] == "General"
+
+    store.upsert(user("carol", "Logistics"))
+    assert store.get("carol")["industry"] == "Logistics"
+    assert store.get("nobody") is None
+
+def test_write_cost_stays_flat_at_100k_users(tmp_path):
+    store = SqliteUserStore(str(tmp_path / "users.sqlite"), legacy_path=None)
+
+    def timed_writes(prefix, n=300):
+        start = time.perf_counter()
+        for i in range(n):
+            store.create(user(f"{prefix}{i}"))
+            store.upsert(user(f"{prefix}{i}", "Retail"))
+            store.get(f"{prefix}{i}")
+        return time.perf_counter() - start
+
+    small = timed_writes("early")
+    with store.conn:
+        store.conn.executemany(
+            "INSERT INTO users (username, password_hash, industry, updated_at) VALUES (?, ?, 'General', 0)",
+            ((f"bulk{i}", "x") for i in range(100_000)),
+        )
+    large = timed_writes("late")
+
+    assert store.count() > 100_000
+    assert large < small * 3
+
+def test_signup_login_profile_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "USER_STORE", SqliteUserStore(str(tmp_path / "users.sqlite"), legacy_path=None))
+    import main
+    client = TestClient(main.app)
+
+    token = client.post("/api/signup", json={"username": "dana", "password": "pw"}).json()["access_token"]
+    assert client.post("/api/signup", json={"username": "dana", "password": "pw"}).status_code == 400
+
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/api/profile", json={"industry": "Retail"}, headers=headers).status_code == 200
+    assert auth.USER_STORE.get("dana")["industry"] == "Retail"
+    assert client.post("/api/login", json={"username": "dana", "password": "pw"}).status_code == 200
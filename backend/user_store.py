@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# "sqlite" (default) or "json" (legacy whole-file store)
+USER_STORE_BACKEND = os.getenv("USER_STORE", "sqlite").lower()
+USER_DB_PATH = os.getenv("USER_DB_PATH", os.path.join(os.path.dirname(__file__), "users.sqlite"))
+USERS_FILE = os.path.join(os.path.dirname(__file__), "users.json")
+
+class JsonUserStore:
+    """Legacy backend: users kept in memory and the whole file rewritten on every change."""
+    def __init__(self, path=USERS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.users = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.users = json.load(f)
+
+    def get(self, username):
+        return self.users.get(username)
+
+    def create(self, user):
+        """Adds a new user; returns False if the username is taken."""
+        with self.lock:
+            if user["username"] in self.users:
+                return False
+            self.users[user["username"]] = dict(user)
+            self._save()
+        return True
+
+    def upsert(self, user):
+        with self.lock:
+            self.users[user["username"]] = dict(user)
+            self._save()
+
+    def count(self):
+        return len(self.users)
+
+    def _save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.users, f)
+
+class SqliteUserStore:
+    """
+    SQLite (WAL) user table keyed by username: lookups go through the primary key
+    index and every change is a single-row transaction, so cost does not grow with
+    the number of users. Existing users.json accounts are imported on first open.
+    """
+    def __init__(self, path=USER_DB_PATH, legacy_path=USERS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password_hash TEXT NOT NULL,
+                industry TEXT NOT NULL DEFAULT 'General',
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+        self.migrate_from_json(legacy_path)
+
+    def migrate_from_json(self, legacy_path):
+        """One-time import of the legacy users.json; later runs are no-ops."""
+        with self.lock:
+            done = self.conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if done or not legacy_path or not os.path.exists(legacy_path):
+                return 0
+            with open(legacy_path, "r") as f:
+                users = json.load(f)
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO users (username, password_hash, industry, updated_at) VALUES (?, ?, ?, ?)",
+                    [(u["username"], u["password_hash"], u.get("industry") or "General", now) for u in users.values()],
+                )
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (legacy_path,))
+        print(f"Migrated {len(users)} users from {legacy_path}")
+        return len(users)
+
+    def get(self, username):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT username, password_hash, industry FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"username": row[0], "password_hash": row[1], "industry": row[2]}
+
+    def create(self, user):
+        """Adds a new user; returns False if the username is taken."""
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO users (username, password_hash, industry, updated_at) VALUES (?, ?, ?, ?)",
+                    (user["username"], user["password_hash"], user.get("industry") or "General", time.time()),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def upsert(self, user):
+        with self.lock, self.conn:
+            self.conn.execute(
+                """INSERT INTO users (username, password_hash, industry, updated_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(username) DO UPDATE SET
+                       password_hash = excluded.password_hash,
+                       industry = excluded.industry,
+                       updated_at = excluded.updated_at""",
+                (user["username"], user["password_hash"], user.get("industry") or "General", time.time()),
+            )
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+def open_user_store(backend=USER_STORE_BACKEND):
+    if backend == "json":
+        return JsonUserStore()
+    return SqliteUserStore()
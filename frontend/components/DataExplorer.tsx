@@ -9,6 +9,9 @@ import HybridChartCard from "./data-explorer/HybridChartCard";
 import CompareView from "./data-explorer/CompareView";
 import { useDashboard } from "@/context/DashboardContext";
 
+// Largest page /api/data serves (DATA_MAX_PAGE_SIZE on the backend)
+const DATA_PAGE_LIMIT = 5000;
+
 export default function DataExplorer() {
     const { filters, setFilters, setDistricts: setContextDistricts, setMetric: setContextMetric, setIndustry: setContextIndustry, setRentRange: setContextRentRange, data, setData, loading, setLoading } = useDashboard();
     const [districts, setDistricts] = useState<string[]>([]); // List of available districts
@@ -57,11 +60,7 @@ export default function DataExplorer() {
                     if (trafficFilter > 0) apiFilters.min_traffic = trafficFilter;
                 }
 
-                const res = await api.post(
-                    "/api/data",
-                    { filters: apiFilters }
-                );
-                setData(res.data.data);
+                setData(await fetchAllPages(apiFilters));
             }
         } catch (error) {
             console.error("Failed to fetch data", error);
@@ -70,6 +69,24 @@ export default function DataExplorer() {
         }
     };
 
+    // /api/data returns one page at a time: follow next_cursor until every matching row is in.
+    // A data reload mid-way expires the cursor (410), so start over once in that case.
+    const fetchAllPages = async (apiFilters: any, retried = false): Promise<any[]> => {
+        let rows: any[] = [];
+        let cursor: string | null = null;
+        try {
+            do {
+                const res: any = await api.post("/api/data", { filters: apiFilters, limit: DATA_PAGE_LIMIT, cursor });
+                rows = rows.concat(res.data.data);
+                cursor = res.data.next_cursor;
+            } while (cursor);
+        } catch (error: any) {
+            if (error?.response?.status === 410 && !retried) return fetchAllPages(apiFilters, true);
+            throw error;
+        }
+        return rows;
+    };
+
     const toggleDistrict = (district: string) => {
         setContextDistricts(
             selectedDistricts.includes(district)